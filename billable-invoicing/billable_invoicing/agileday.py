@@ -1,23 +1,149 @@
 """AgileDay API client for fetching time entries."""
 
+import codecs
+import json
 import logging
 import os
-from datetime import datetime
-from typing import Any, Dict, List
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 
 import requests
+from requests.adapters import DEFAULT_POOLSIZE, HTTPAdapter
+
+from .cache import ProjectCache
+from .cassette import Cassette
+from .scheduler import RequestScheduler
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_API_URL = "https://sevendos.agileday.io/api/v1"
+
+# Bytes read at a time when streaming the time reporting response
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Window sizes supported for windowed time entry fetching
+FETCH_WINDOWS = ('day', 'week')
+DEFAULT_FETCH_WORKERS = 4
+
+def iter_json_array(chunks: Iterable[bytes]) -> Iterator[Any]:
+    """
+    Incrementally decode a UTF-8 JSON array, yielding its items one by one.
+    
+    Only the not yet decoded tail of the input is buffered, so memory use
+    is bounded by the chunk size and the size of a single item.
+    
+    Parameters
+    ----------
+    chunks : Iterable[bytes]
+        Consecutive pieces of the encoded JSON document
+        
+    Yields
+    ------
+    Any
+        Decoded array items
+        
+    Raises
+    ------
+    ValueError
+        If the document is not a well-formed JSON array
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    chunk_iter = iter(chunks)
+    buffer = ''
+    pos = 0
+    exhausted = False
+    started = False
+    
+    def fill() -> bool:
+        nonlocal buffer, pos, exhausted
+        for chunk in chunk_iter:
+            if chunk:
+                buffer = buffer[pos:] + text_decoder.decode(chunk)
+                pos = 0
+                return True
+        if not exhausted:
+            exhausted = True
+            buffer = buffer[pos:] + text_decoder.decode(b'', final=True)
+            pos = 0
+        return False
+    
+    while True:
+        # Skip whitespace and separators until the next value or the closing bracket
+        while True:
+            while pos < len(buffer) and (buffer[pos].isspace() or (started and buffer[pos] == ',')):
+                pos += 1
+            if pos < len(buffer):
+                break
+            if not fill():
+                raise ValueError("Unexpected end of JSON array")
+        
+        if not started:
+            if buffer[pos] != '[':
+                raise ValueError(f"Expected a JSON array, got {buffer[pos]!r}")
+            started = True
+            pos += 1
+            continue
+        
+        if buffer[pos] == ']':
+            return
+        
+        while True:
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if fill():
+                    continue
+                raise
+            # A number could continue in the next chunk, make sure it has ended
+            if end == len(buffer) and not exhausted and fill():
+                continue
+            break
+        pos = end
+        yield item
+
+
 class AgileDayClient:
     """Client for interacting with the AgileDay API."""
     
-    def __init__(self):
-        """Initialize the AgileDay API client using token from environment variable."""
-        self.api_url = "https://sevendos.agileday.io/api/v1"
+    def __init__(
+        self,
+        project_cache: Optional[ProjectCache] = None,
+        refresh_cache: bool = False,
+        scheduler: Optional[RequestScheduler] = None,
+        cassette: Optional[Cassette] = None,
+        api_url: Optional[str] = None
+    ):
+        """
+        Initialize the AgileDay API client using token from environment variable.
+        
+        Parameters
+        ----------
+        project_cache : Optional[ProjectCache], optional
+            Persistent project cache shared between runs, defaults to None
+        refresh_cache : bool, optional
+            Refetch every project instead of serving it from the persistent
+            cache, defaults to False
+        scheduler : Optional[RequestScheduler], optional
+            Scheduler pacing and retrying all API requests, defaults to a
+            scheduler with default limits
+        cassette : Optional[Cassette], optional
+            Cassette recording or replaying all API traffic, defaults to None.
+            No token is needed when replaying.
+        api_url : Optional[str], optional
+            Base URL of the API, defaults to the AGILEDAY_API_URL environment
+            variable or the production API
+        """
+        self.api_url = (api_url or os.getenv("AGILEDAY_API_URL") or DEFAULT_API_URL).rstrip('/')
+        logger.debug("Using AgileDay API at %s", self.api_url)
         self.api_key = os.getenv("AGILEDAY_TOKEN")
         if not self.api_key:
-            raise ValueError("AGILEDAY_TOKEN environment variable is not set")
+            if cassette is None or not cassette.replaying:
+                raise ValueError("AGILEDAY_TOKEN environment variable is not set")
+            # Replayed requests never reach the API, any token will do
+            self.api_key = "replay"
         
         # Remove any whitespace from token
         self.api_key = self.api_key.strip()
@@ -37,8 +163,22 @@ class AgileDayClient:
             "User-Agent": "billable_invoicing/0.1.0"
         })
         
-        # Cache for project data
+        # Size of the session connection pool (requests default)
+        self._pool_size = DEFAULT_POOLSIZE
+        
+        # Cache for project data, shared by concurrent project fetches
         self._project_cache: Dict[str, Dict[str, Any]] = {}
+        self._project_cache_lock = threading.Lock()
+        self.project_cache = project_cache
+        self.refresh_cache = refresh_cache
+        
+        # Every request goes through the scheduler for rate limiting and retries
+        self.scheduler = scheduler or RequestScheduler()
+        
+        # Optional record/replay of all API traffic, with the token masked
+        self.cassette = cassette
+        if cassette and cassette.mask_headers is None:
+            cassette.mask_headers = self._mask_headers
     
     def _mask_headers(self, headers: Dict[str, str]) -> Dict[str, str]:
         """Mask sensitive information in headers for logging."""
@@ -47,14 +187,85 @@ class AgileDayClient:
             for k, v in headers.items()
         }
     
-    def get_time_entries(
+    def _get(self, url: str, **kwargs: Any) -> requests.Response:
+        """
+        Send a GET request through the request scheduler.
+        
+        Parameters
+        ----------
+        url : str
+            URL to request
+        **kwargs : Any
+            Keyword arguments for ``requests.Session.get``
+            
+        Returns
+        -------
+        requests.Response
+            API response
+        """
+        send = self.cassette.wrap(self.session.get) if self.cassette else self.session.get
+        return self.scheduler.request(send, url, **kwargs)
+    
+    def close(self) -> None:
+        """Close the session and finish the cassette and project cache, if any."""
+        if self.cassette:
+            self.cassette.close()
+        if self.project_cache:
+            self.project_cache.close()
+        self.session.close()
+    
+    def _split_date_range(
         self,
         start_date: datetime,
         end_date: datetime,
-        status: str = "Submitted"
-    ) -> List[Dict[str, Any]]:
+        fetch_window: str
+    ) -> List[Tuple[datetime, datetime]]:
         """
-        Fetch time entries from AgileDay.
+        Split an inclusive date range into day or week windows.
+        
+        Week windows are aligned to ISO weeks (Monday to Sunday) and clipped
+        to the requested range.
+        
+        Parameters
+        ----------
+        start_date : datetime
+            Start date of the range
+        end_date : datetime
+            End date of the range
+        fetch_window : str
+            Window size, either "day" or "week"
+            
+        Returns
+        -------
+        List[Tuple[datetime, datetime]]
+            Inclusive (start, end) pairs covering the whole range
+        """
+        if fetch_window not in FETCH_WINDOWS:
+            raise ValueError(
+                f"Invalid fetch window: {fetch_window}. Expected one of {', '.join(FETCH_WINDOWS)}"
+            )
+        
+        windows: List[Tuple[datetime, datetime]] = []
+        current = start_date
+        while current.date() <= end_date.date():
+            if fetch_window == 'day':
+                window_end = current
+            else:
+                window_end = current + timedelta(days=6 - current.weekday())
+            window_end = min(window_end, end_date)
+            windows.append((current, window_end))
+            current = window_end + timedelta(days=1)
+        return windows
+    
+    def _request_time_entries(
+        self,
+        start_date: datetime,
+        end_date: datetime,
+        status: str,
+        stream: bool = False
+    ) -> requests.Response:
+        """
+        Send a single time reporting request for a date range.
         
         Parameters
         ----------
@@ -62,13 +273,15 @@ class AgileDayClient:
             Start date for time entries
         end_date : datetime
             End date for time entries
-        status : str, optional
-            Status of entries to fetch, defaults to "Submitted"
+        status : str
+            Status of entries to fetch
+        stream : bool, optional
+            Leave the response body unread for incremental decoding, defaults to False
             
         Returns
         -------
-        List[Dict[str, Any]]
-            List of time entries matching the criteria
+        requests.Response
+            Successful API response
         """
         url = f'{self.api_url}/time_reporting'
         params = {
@@ -77,17 +290,11 @@ class AgileDayClient:
             'status': status
         }
         
-        logger.info(
-            "Fetching time entries between %s and %s with status %s",
-            start_date.date(),
-            end_date.date(),
-            status
-        )
         logger.debug("Making GET request to %s with params %s", url, params)
         logger.debug("Request headers: %s", self._mask_headers(dict(self.session.headers)))
         
         try:
-            response = self.session.get(url, params=params)
+            response = self._get(url, params=params, stream=stream)
             if response.status_code == 404:
                 logger.error(
                     "API endpoint not found. Response: %s",
@@ -99,11 +306,7 @@ class AgileDayClient:
                     response.text
                 )
             response.raise_for_status()
-            
-            entries = response.json()
-            logger.debug("Retrieved %d time entries", len(entries))
-            
-            return entries
+            return response
         except requests.exceptions.RequestException as e:
             logger.error(
                 "API request failed: %s\nResponse: %s\nRequest URL: %s\nRequest Headers: %s",
@@ -114,10 +317,221 @@ class AgileDayClient:
             )
             raise
     
+    def _fetch_time_entries(
+        self,
+        start_date: datetime,
+        end_date: datetime,
+        status: str
+    ) -> List[Dict[str, Any]]:
+        """
+        Fetch time entries for a date range with a single API request.
+        
+        Parameters
+        ----------
+        start_date : datetime
+            Start date for time entries
+        end_date : datetime
+            End date for time entries
+        status : str
+            Status of entries to fetch
+            
+        Returns
+        -------
+        List[Dict[str, Any]]
+            List of time entries matching the criteria
+        """
+        response = self._request_time_entries(start_date, end_date, status)
+        entries = response.json()
+        logger.debug(
+            "Retrieved %d time entries between %s and %s",
+            len(entries),
+            start_date.date(),
+            end_date.date()
+        )
+        return entries
+    
+    def iter_time_entries(
+        self,
+        start_date: datetime,
+        end_date: datetime,
+        status: str = "Submitted",
+        chunk_size: int = STREAM_CHUNK_SIZE
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Stream time entries from AgileDay one at a time.
+        
+        The response body is read in chunks and decoded incrementally, so
+        neither the raw body nor the full list of entries is held in memory.
+        
+        Parameters
+        ----------
+        start_date : datetime
+            Start date for time entries
+        end_date : datetime
+            End date for time entries
+        status : str, optional
+            Status of entries to fetch, defaults to "Submitted"
+        chunk_size : int, optional
+            Number of bytes read from the response at a time, defaults to 64 KiB
+            
+        Yields
+        ------
+        Dict[str, Any]
+            Time entries in the order returned by the API
+        """
+        logger.info(
+            "Streaming time entries between %s and %s with status %s",
+            start_date.date(),
+            end_date.date(),
+            status
+        )
+        response = self._request_time_entries(start_date, end_date, status, stream=True)
+        count = 0
+        with response:
+            for entry in iter_json_array(response.iter_content(chunk_size=chunk_size)):
+                count += 1
+                yield entry
+        logger.debug("Streamed %d time entries", count)
+    
+    def get_time_entries(
+        self,
+        start_date: datetime,
+        end_date: datetime,
+        status: str = "Submitted",
+        fetch_window: Optional[str] = None,
+        fetch_workers: int = DEFAULT_FETCH_WORKERS
+    ) -> List[Dict[str, Any]]:
+        """
+        Fetch time entries from AgileDay.
+        
+        By default the whole range is fetched with one request. When
+        ``fetch_window`` is given, the range is split into day or week windows
+        that are fetched concurrently on a bounded worker pool sharing this
+        client's session. The results are merged in window order and
+        deduplicated by ``timeEntryId``.
+        
+        Parameters
+        ----------
+        start_date : datetime
+            Start date for time entries
+        end_date : datetime
+            End date for time entries
+        status : str, optional
+            Status of entries to fetch, defaults to "Submitted"
+        fetch_window : Optional[str], optional
+            Window size ("day" or "week") for windowed fetching, defaults to None
+        fetch_workers : int, optional
+            Maximum number of concurrent window requests, defaults to 4
+            
+        Returns
+        -------
+        List[Dict[str, Any]]
+            List of time entries matching the criteria
+        """
+        logger.info(
+            "Fetching time entries between %s and %s with status %s",
+            start_date.date(),
+            end_date.date(),
+            status
+        )
+        
+        if not fetch_window:
+            entries = self._fetch_time_entries(start_date, end_date, status)
+            logger.debug("Retrieved %d time entries", len(entries))
+            return entries
+        
+        if fetch_workers < 1:
+            raise ValueError(f"fetch_workers must be at least 1, got {fetch_workers}")
+        
+        windows = self._split_date_range(start_date, end_date, fetch_window)
+        workers = min(fetch_workers, len(windows)) or 1
+        self._ensure_pool_size(workers)
+        logger.info(
+            "Fetching %d %s windows with %d workers",
+            len(windows),
+            fetch_window,
+            workers
+        )
+        
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='agileday-fetch') as executor:
+            results = list(executor.map(
+                lambda window: self._fetch_time_entries(window[0], window[1], status),
+                windows
+            ))
+        
+        # Merge windows in order, dropping entries returned by more than one window
+        entries: List[Dict[str, Any]] = []
+        seen_ids: set[str] = set()
+        duplicates = 0
+        for window_entries in results:
+            for entry in window_entries:
+                entry_id = entry.get('timeEntryId')
+                if entry_id:
+                    if entry_id in seen_ids:
+                        duplicates += 1
+                        continue
+                    seen_ids.add(entry_id)
+                entries.append(entry)
+        
+        logger.debug(
+            "Retrieved %d time entries from %d windows (%d duplicates dropped)",
+            len(entries),
+            len(windows),
+            duplicates
+        )
+        return entries
+    
+    def _ensure_pool_size(self, workers: int) -> None:
+        """
+        Make sure the session connection pool can serve all workers at once.
+        
+        Parameters
+        ----------
+        workers : int
+            Number of threads that will share the session
+        """
+        if workers > self._pool_size:
+            adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+            self.session.mount('https://', adapter)
+            self.session.mount('http://', adapter)
+            self._pool_size = workers
+    
+    def _get_cached_project(self, project_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a project in the in-memory cache, then in the persistent cache.
+        
+        Parameters
+        ----------
+        project_id : str
+            ID of the project
+            
+        Returns
+        -------
+        Optional[Dict[str, Any]]
+            Project details, or None if the project has to be fetched
+        """
+        with self._project_cache_lock:
+            cached = self._project_cache.get(project_id)
+        if cached is not None:
+            return cached
+        
+        if self.project_cache and not self.refresh_cache:
+            record = self.project_cache.get(project_id)
+            if record and self.project_cache.is_fresh(record):
+                logger.debug("Serving project %s from persistent cache", project_id)
+                with self._project_cache_lock:
+                    self._project_cache[project_id] = record.data
+                return record.data
+        return None
+    
     def get_project(self, project_id: str) -> Dict[str, Any]:
         """
         Fetch project details from AgileDay, with caching.
         
+        Projects are served from memory or, within its TTL, from the persistent
+        project cache. Stale persistent entries are revalidated with their
+        ETag or Last-Modified value when the API provided one.
+        
         Parameters
         ----------
         project_id : str
@@ -128,12 +542,108 @@ class AgileDayClient:
         Dict[str, Any]
             Project details
         """
-        if project_id not in self._project_cache:
-            url = f'{self.api_url}/project/id/{project_id}'
-            logger.debug("Fetching project details from %s", url)
-            
-            response = self.session.get(url)
+        cached = self._get_cached_project(project_id)
+        if cached is not None:
+            return cached
+        
+        record = None
+        if self.project_cache and not self.refresh_cache:
+            record = self.project_cache.get(project_id)
+        
+        url = f'{self.api_url}/project/id/{project_id}'
+        headers: Dict[str, str] = {}
+        recording = self.cassette is not None and not self.cassette.replaying
+        if record and not recording:
+            # Stale entry, ask the API whether it has changed. Recordings always
+            # store the full project, so they replay without the cache.
+            if record.etag:
+                headers['If-None-Match'] = record.etag
+            if record.last_modified:
+                headers['If-Modified-Since'] = record.last_modified
+        logger.debug("Fetching project details from %s", url)
+        
+        response = self._get(url, headers=headers)
+        if record and response.status_code == 304:
+            logger.debug("Project %s not modified, revalidated cache entry", project_id)
+            self.project_cache.touch(project_id)
+            project = record.data
+        else:
             response.raise_for_status()
-            self._project_cache[project_id] = response.json()
+            project = response.json()
+            if self.project_cache:
+                self.project_cache.put(
+                    project_id,
+                    project,
+                    etag=response.headers.get('ETag'),
+                    last_modified=response.headers.get('Last-Modified')
+                )
+        
+        with self._project_cache_lock:
+            self._project_cache[project_id] = project
+        return project
+    
+    def get_projects(
+        self,
+        project_ids: Iterable[str],
+        workers: int = DEFAULT_FETCH_WORKERS
+    ) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Exception]]:
+        """
+        Fetch details for many projects concurrently, with caching.
+        
+        Cached projects are served without a request. The remaining ones are
+        fetched on a bounded worker pool sharing this client's session.
+        A failing project does not stop the others; its exception is
+        returned instead.
+        
+        Parameters
+        ----------
+        project_ids : Iterable[str]
+            IDs of the projects to fetch
+        workers : int, optional
+            Maximum number of concurrent project requests, defaults to 4
+            
+        Returns
+        -------
+        Tuple[Dict[str, Dict[str, Any]], Dict[str, Exception]]
+            Tuple containing:
+            - Dictionary of project details keyed by project ID
+            - Dictionary of fetch errors keyed by project ID
+        """
+        if workers < 1:
+            raise ValueError(f"workers must be at least 1, got {workers}")
+        
+        unique_ids = list(dict.fromkeys(project_ids))
+        projects: Dict[str, Dict[str, Any]] = {}
+        failures: Dict[str, Exception] = {}
+        
+        for project_id in unique_ids:
+            cached = self._get_cached_project(project_id)
+            if cached is not None:
+                projects[project_id] = cached
+        missing_ids = [project_id for project_id in unique_ids if project_id not in projects]
+        
+        logger.info(
+            "Fetching %d projects (%d cached) with up to %d workers",
+            len(missing_ids),
+            len(projects),
+            workers
+        )
+        if not missing_ids:
+            return projects, failures
+        
+        workers = min(workers, len(missing_ids))
+        self._ensure_pool_size(workers)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='agileday-project') as executor:
+            futures = {
+                project_id: executor.submit(self.get_project, project_id)
+                for project_id in missing_ids
+            }
+            for project_id, future in futures.items():
+                try:
+                    projects[project_id] = future.result()
+                except Exception as e:
+                    failures[project_id] = e
         
-        return self._project_cache[project_id] 
\ No newline at end of file
+        if failures:
+            logger.warning("Failed to fetch %d of %d projects", len(failures), len(unique_ids))
+        return projects, failures
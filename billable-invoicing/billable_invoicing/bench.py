@@ -0,0 +1,85 @@
+"""Reference implementations the benchmark commands compare against."""
+
+import logging
+from typing import Any, Dict, Tuple
+
+from .diagnostics import INTERNAL_RATE_NOT_FOUND, NO_HOURLY_RATE_FOUND, MissingRateCollector
+from .time_entry import TimeEntry
+
+logger = logging.getLogger(__name__)
+
+
+def per_entry_rate(
+    entry: TimeEntry,
+    project_id: str,
+    customer_info: Dict[str, Any],
+    internal_rates: Dict[Tuple[str, str], float],
+    missing_rates: MissingRateCollector,
+    entry_count: int = 1
+) -> float:
+    """Resolve the hourly rate of a single entry without a compiled table.
+
+    This is how rates were resolved before ``RateResolver``: the customer
+    settings are read again for every entry, and every miss builds its
+    message and is added to ``missing_rates``. ``bench-rates`` checks and
+    times the compiled table against it.
+
+    Parameters
+    ----------
+    entry : TimeEntry
+        Parsed time entry
+    project_id : str
+        Project ID
+    customer_info : Dict[str, Any]
+        Customer information
+    internal_rates : Dict[Tuple[str, str], float]
+        Internal rates by project ID and task
+    missing_rates : MissingRateCollector
+        Missing rates of this run
+    entry_count : int, optional
+        Number of entries priced with this rate, defaults to 1
+
+    Returns
+    -------
+    float
+        Hour rate to use
+    """
+    hour_rates_type = customer_info.get('hour_rates', '').lower().strip()
+    task_name = entry.project_task
+    client_name = customer_info.get('Client', 'Unknown')
+    service_name = customer_info.get('Service name', 'Unknown Service')
+
+    if hour_rates_type == 'internal':
+        # Try to get rate from internal rates
+        rate = internal_rates.get((project_id, task_name))
+        if rate is not None:
+            return rate
+
+        # If not found, report it in missing_from_rates.txt
+        warning_msg = (
+            f"Internal rate not found - Client: {client_name}, Service: {service_name}, "
+            f"Task: {task_name}, Project ID: {project_id}"
+        )
+        logger.debug(warning_msg)
+        missing_rates.add(
+            INTERNAL_RATE_NOT_FOUND, project_id, task_name,
+            client=client_name, service=service_name, count=entry_count
+        )
+
+    # Use AgileDay rate from taskHourlyPrice
+    task_rate = entry.task_hourly_price
+    if task_rate is not None:
+        return task_rate
+
+    # Report it in missing_from_rates.txt if it's an internal rate case
+    warning_msg = (
+        f"No hourly rate found - Client: {client_name}, Service: {service_name}, "
+        f"Task: {task_name}, Project ID: {project_id}"
+    )
+    logger.debug(warning_msg)
+    missing_rates.add(
+        NO_HOURLY_RATE_FOUND, project_id, task_name,
+        client=client_name, service=service_name, count=entry_count,
+        in_report=hour_rates_type == 'internal'
+    )
+    return 0.0
@@ -0,0 +1,201 @@
+"""Persistent on-disk caches for AgileDay data."""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROJECT_TTL_SECONDS = 7 * 24 * 60 * 60
+DEFAULT_PROJECT_MAX_ENTRIES = 5000
+
+
+def default_cache_dir() -> Path:
+    """Return the default cache directory for billable_invoicing.
+
+    Returns
+    -------
+    Path
+        ``$XDG_CACHE_HOME/billable_invoicing``, or ``~/.cache/billable_invoicing``
+        when XDG_CACHE_HOME is not set
+    """
+    base = os.getenv("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "billable_invoicing"
+
+
+@dataclass
+class CachedProject:
+    """A project record stored in the persistent cache."""
+    project_id: str
+    data: Dict[str, Any]
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fetched_at: float
+
+
+class ProjectCache:
+    """SQLite-backed project cache with per-entry TTL and size-bounded eviction.
+
+    Entries older than the TTL are not discarded; they are kept so that the
+    client can revalidate them with ``If-None-Match`` / ``If-Modified-Since``.
+    When the cache holds more than ``max_entries`` records, the least recently
+    used ones are evicted.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Path,
+        ttl_seconds: int = DEFAULT_PROJECT_TTL_SECONDS,
+        max_entries: int = DEFAULT_PROJECT_MAX_ENTRIES
+    ):
+        """Open or create the project cache.
+
+        Parameters
+        ----------
+        cache_dir : Path
+            Directory where the cache database is stored
+        ttl_seconds : int, optional
+            Time in seconds a cached project is served without revalidation
+        max_entries : int, optional
+            Maximum number of projects kept in the cache
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        self.path = cache_dir / "projects.sqlite3"
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS projects (
+                project_id TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._connection.commit()
+        logger.debug("Using project cache %s", self.path)
+
+    def get(self, project_id: str) -> Optional[CachedProject]:
+        """Look up a project, fresh or stale.
+
+        Parameters
+        ----------
+        project_id : str
+            ID of the project
+
+        Returns
+        -------
+        Optional[CachedProject]
+            Cached record, or None if the project is not cached
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT data, etag, last_modified, fetched_at FROM projects WHERE project_id = ?",
+                (project_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._connection.execute(
+                "UPDATE projects SET accessed_at = ? WHERE project_id = ?",
+                (time.time(), project_id)
+            )
+            self._connection.commit()
+
+        data, etag, last_modified, fetched_at = row
+        return CachedProject(project_id, json.loads(data), etag, last_modified, fetched_at)
+
+    def is_fresh(self, record: CachedProject) -> bool:
+        """Check whether a cached record is still within its TTL.
+
+        Parameters
+        ----------
+        record : CachedProject
+            Cached record to check
+
+        Returns
+        -------
+        bool
+            True if the record can be served without revalidation
+        """
+        return time.time() - record.fetched_at < self.ttl_seconds
+
+    def put(
+        self,
+        project_id: str,
+        data: Dict[str, Any],
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None
+    ) -> None:
+        """Store a freshly fetched project and evict old entries if needed.
+
+        Parameters
+        ----------
+        project_id : str
+            ID of the project
+        data : Dict[str, Any]
+            Project details as returned by the API
+        etag : Optional[str], optional
+            ETag response header, if any
+        last_modified : Optional[str], optional
+            Last-Modified response header, if any
+        """
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                """
+                INSERT OR REPLACE INTO projects
+                    (project_id, data, etag, last_modified, fetched_at, accessed_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (project_id, json.dumps(data), etag, last_modified, now, now)
+            )
+            self._evict()
+            self._connection.commit()
+
+    def touch(self, project_id: str) -> None:
+        """Mark a revalidated project as fresh again.
+
+        Parameters
+        ----------
+        project_id : str
+            ID of the project
+        """
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "UPDATE projects SET fetched_at = ?, accessed_at = ? WHERE project_id = ?",
+                (now, now, project_id)
+            )
+            self._connection.commit()
+
+    def _evict(self) -> None:
+        """Delete the least recently used projects beyond ``max_entries``."""
+        (count,) = self._connection.execute("SELECT COUNT(*) FROM projects").fetchone()
+        excess = count - self.max_entries
+        if excess > 0:
+            self._connection.execute(
+                """
+                DELETE FROM projects WHERE project_id IN (
+                    SELECT project_id FROM projects ORDER BY accessed_at ASC LIMIT ?
+                )
+                """,
+                (excess,)
+            )
+            logger.debug("Evicted %d projects from cache", excess)
+
+    def close(self) -> None:
+        """Close the cache database."""
+        with self._lock:
+            self._connection.close()
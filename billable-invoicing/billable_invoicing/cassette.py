@@ -0,0 +1,217 @@
+"""Record and replay AgileDay API traffic."""
+
+import base64
+import gzip
+import json
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Optional
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+logger = logging.getLogger(__name__)
+
+CASSETTE_MODES = ('record', 'replay')
+
+# Request headers that make a request conditional, so that it may be answered with 304
+CONDITIONAL_HEADERS = ('If-None-Match', 'If-Modified-Since')
+
+
+class Cassette:
+    """Gzip-compressed JSON-lines recording of API requests and responses.
+
+    In record mode every request is sent to the API and the interaction is
+    appended to the cassette. In replay mode requests are answered from the
+    cassette without touching the network. Interactions are matched by
+    method and full URL including query parameters; repeated requests to the
+    same URL are replayed in recording order. A recorded 304 Not Modified
+    only answers a conditional request, as an unconditional one has no
+    cached copy to fall back on.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        mode: str,
+        latency: float = 0.0,
+        mask_headers: Optional[Callable[[Dict[str, str]], Dict[str, str]]] = None
+    ):
+        """Open a cassette for recording or replaying.
+
+        Parameters
+        ----------
+        path : Path
+            Cassette file, conventionally with a ``.jsonl.gz`` suffix
+        mode : str
+            Either "record" or "replay"
+        latency : float, optional
+            Seconds each replayed response is delayed by, defaults to 0
+        mask_headers : Optional[Callable[[Dict[str, str]], Dict[str, str]]], optional
+            Function masking sensitive request headers before they are recorded
+
+        Raises
+        ------
+        ValueError
+            If the mode is unknown or the cassette to replay does not exist
+        """
+        if mode not in CASSETTE_MODES:
+            raise ValueError(f"Invalid cassette mode: {mode}. Expected one of {', '.join(CASSETTE_MODES)}")
+
+        self.path = Path(path)
+        self.mode = mode
+        self.latency = latency
+        self.mask_headers = mask_headers
+        self._lock = threading.Lock()
+        self._interactions: Dict[str, Deque[Dict[str, Any]]] = defaultdict(deque)
+        self._file = None
+
+        if mode == 'record':
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = gzip.open(self.path, 'wt', encoding='utf-8')
+            logger.info("Recording AgileDay traffic to %s", self.path)
+        else:
+            if not self.path.is_file():
+                raise ValueError(f"Cassette file not found: {self.path}")
+            count = 0
+            with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    interaction = json.loads(line)
+                    self._interactions[self._key(interaction['method'], interaction['url'])].append(interaction)
+                    count += 1
+            logger.info("Replaying %d recorded interactions from %s", count, self.path)
+
+    @property
+    def replaying(self) -> bool:
+        """Whether requests are served from the cassette."""
+        return self.mode == 'replay'
+
+    @staticmethod
+    def _key(method: str, url: str) -> str:
+        """Build the lookup key of an interaction."""
+        return f"{method.upper()} {url}"
+
+    @staticmethod
+    def _prepared_url(url: str, params: Optional[Dict[str, Any]]) -> str:
+        """Return the URL a request would be sent to, query string included."""
+        return requests.Request('GET', url, params=params).prepare().url
+
+    def wrap(self, send: Callable[..., requests.Response]) -> Callable[..., requests.Response]:
+        """Wrap a GET function so that it records to or replays from this cassette.
+
+        Parameters
+        ----------
+        send : Callable[..., requests.Response]
+            Function performing the real request, e.g. ``session.get``
+
+        Returns
+        -------
+        Callable[..., requests.Response]
+            Function with the same signature as ``send``
+        """
+        def get(url: str, **kwargs: Any) -> requests.Response:
+            if self.replaying:
+                return self._replay(url, kwargs.get('params'), kwargs.get('headers'))
+            response = send(url, **kwargs)
+            self._record(url, kwargs, response)
+            return response
+        return get
+
+    def _record(self, url: str, kwargs: Dict[str, Any], response: requests.Response) -> None:
+        """Append an interaction to the cassette.
+
+        Parameters
+        ----------
+        url : str
+            Requested URL without query parameters
+        kwargs : Dict[str, Any]
+            Keyword arguments the request was sent with
+        response : requests.Response
+            Response to record; its body is read into memory
+        """
+        request_headers = dict(response.request.headers) if response.request else {}
+        if self.mask_headers:
+            request_headers = self.mask_headers(request_headers)
+        interaction = {
+            'method': 'GET',
+            'url': self._prepared_url(url, kwargs.get('params')),
+            'request_headers': request_headers,
+            'status': response.status_code,
+            'reason': response.reason,
+            'headers': dict(response.headers),
+            'body': base64.b64encode(response.content).decode('ascii')
+        }
+        with self._lock:
+            self._file.write(json.dumps(interaction) + "\n")
+
+    def _replay(
+        self,
+        url: str,
+        params: Optional[Dict[str, Any]],
+        headers: Optional[Dict[str, str]] = None
+    ) -> requests.Response:
+        """Serve a request from the cassette.
+
+        Parameters
+        ----------
+        url : str
+            Requested URL without query parameters
+        params : Optional[Dict[str, Any]]
+            Query parameters of the request
+        headers : Optional[Dict[str, str]]
+            Headers of the request; without conditional headers, recorded
+            304 responses are skipped
+
+        Returns
+        -------
+        requests.Response
+            Recorded response
+
+        Raises
+        ------
+        requests.exceptions.ConnectionError
+            If the cassette has no recording for the request
+        """
+        full_url = self._prepared_url(url, params)
+        key = self._key('GET', full_url)
+        conditional = any(name in CaseInsensitiveDict(headers or {}) for name in CONDITIONAL_HEADERS)
+        with self._lock:
+            recordings = self._interactions.get(key) or deque()
+            usable = [
+                position for position, recorded in enumerate(recordings)
+                if conditional or recorded['status'] != 304
+            ]
+            if not usable:
+                raise requests.exceptions.ConnectionError(f"No recorded interaction for {key}")
+            interaction = recordings[usable[0]]
+            # Keep the last usable recording so that further identical requests still succeed
+            if len(usable) > 1:
+                del recordings[usable[0]]
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        response = requests.Response()
+        response.status_code = interaction['status']
+        response.reason = interaction.get('reason')
+        response.headers = CaseInsensitiveDict(interaction['headers'])
+        # The recorded body is already decoded, drop transfer-related headers
+        response.headers.pop('Content-Encoding', None)
+        response.headers.pop('Transfer-Encoding', None)
+        response._content = base64.b64decode(interaction['body'])
+        # Lets streaming callers use iter_content on the in-memory body
+        response._content_consumed = True
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response.url = full_url
+        return response
+
+    def close(self) -> None:
+        """Finish the cassette, flushing any recorded interactions."""
+        if self._file is not None:
+            with self._lock:
+                self._file.close()
+                self._file = None
+            logger.info("Wrote cassette %s", self.path)
@@ -1,17 +1,33 @@
 """Command line interface for the billable invoicing system."""
 
 import csv
+import itertools
 import logging
 import os
 import sys
-from datetime import datetime
+import tempfile
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import date, datetime
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Set
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 import click
 from dateutil import parser
 
-from .agileday import AgileDayClient
+from .agileday import DEFAULT_FETCH_WORKERS, FETCH_WINDOWS, AgileDayClient
+from .bench import per_entry_rate
+from .cache import DEFAULT_PROJECT_TTL_SECONDS, ProjectCache, default_cache_dir
+from .cassette import Cassette
+from .diagnostics import MissingRateCollector
+from .entry_store import DEFAULT_SYNC_TRAILING_DAYS, TimeEntryStore
+from .monthly_cubes import DEFAULT_SETTLE_DAYS, MonthlyCubeStore
+from .rate_resolver import RateResolver
+from .reference_data import ReferenceDataStore
+from .scheduler import DEFAULT_RATE_LIMIT, RequestScheduler
+from .standin import DEFAULT_PAGE_SIZE, StandInServer
+from .synthetic import SyntheticDataset
+from .time_entry import TimeEntry, parse_time_entries
 from .transformer import TimeEntryTransformer
 from .utilization_transformer import UtilizationTransformer
 from .workday_transformer import WorkdayTransformer
@@ -23,14 +39,18 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+SUMMARY_ENGINES = ('python', 'pandas')
+
 def configure_logging(verbose: bool) -> None:
     """Configure logging level based on verbosity."""
     if verbose:
         logging.getLogger().setLevel(logging.DEBUG)
         logger.debug("Debug logging enabled")
 
-def validate_date(ctx: click.Context, param: click.Parameter, value: str) -> datetime:
+def validate_date(ctx: click.Context, param: click.Parameter, value: Optional[str]) -> Optional[datetime]:
     """Validate and parse date string."""
+    if value is None:
+        return None
     try:
         return parser.parse(value)
     except ValueError as e:
@@ -48,6 +68,64 @@ def get_all_field_names(entries: List[Dict[str, Any]]) -> Set[str]:
         field_names.update(str(key) for key in entry.keys())
     return field_names
 
+def open_cassette(
+    record: Optional[str],
+    replay: Optional[str],
+    replay_latency: float
+) -> Optional[Cassette]:
+    """Open the cassette selected with --record or --replay, if any."""
+    if record and replay:
+        raise click.UsageError("--record and --replay cannot be used together")
+    if record:
+        return Cassette(Path(record), 'record')
+    if replay:
+        return Cassette(Path(replay), 'replay', latency=replay_latency)
+    return None
+
+def create_transformer(engine: str) -> TimeEntryTransformer:
+    """Create the transformer of the selected summary engine."""
+    if engine == 'pandas':
+        # pandas is only imported when the engine is selected
+        from .pandas_transformer import PandasTimeEntryTransformer
+        return PandasTimeEntryTransformer()
+    return TimeEntryTransformer()
+
+def fetch_time_entries(
+    client: AgileDayClient,
+    start_date: datetime,
+    end_date: datetime,
+    status: str,
+    fetch_window: Optional[str],
+    fetch_workers: int,
+    store_dir: Optional[Path],
+    sync_trailing_days: int,
+    sync_final_status: Tuple[str, ...]
+) -> List[Dict[str, Any]]:
+    """Fetch time entries directly from AgileDay or through the local entry store."""
+    if store_dir is None:
+        return client.get_time_entries(
+            start_date,
+            end_date,
+            status,
+            fetch_window=fetch_window,
+            fetch_workers=fetch_workers
+        )
+    
+    store = TimeEntryStore(store_dir)
+    try:
+        return store.sync(
+            client,
+            start_date,
+            end_date,
+            status,
+            trailing_days=sync_trailing_days,
+            final_statuses=set(sync_final_status) or None,
+            fetch_window=fetch_window,
+            fetch_workers=fetch_workers
+        )
+    finally:
+        store.close()
+
 @cli.command()
 @click.option(
     '--company',
@@ -94,6 +172,105 @@ def get_all_field_names(entries: List[Dict[str, Any]]) -> Set[str]:
     default='Submitted',
     help='Status of entries to fetch (default: Submitted)'
 )
+@click.option(
+    '--fetch-window',
+    type=click.Choice(FETCH_WINDOWS),
+    default=None,
+    help='Fetch the date range in concurrent day or week windows (default: single request)'
+)
+@click.option(
+    '--fetch-workers',
+    type=click.IntRange(min=1),
+    default=DEFAULT_FETCH_WORKERS,
+    help=f'Number of concurrent window and project requests (default: {DEFAULT_FETCH_WORKERS})'
+)
+@click.option(
+    '--rate-limit',
+    type=click.FloatRange(min=0, min_open=True),
+    default=DEFAULT_RATE_LIMIT,
+    help=f'Maximum AgileDay requests per second (default: {DEFAULT_RATE_LIMIT:g})'
+)
+@click.option(
+    '--sync',
+    is_flag=True,
+    help='Serve entries from the local entry store, refetching only days that may have changed'
+)
+@click.option(
+    '--sync-trailing-days',
+    type=click.IntRange(min=0),
+    default=DEFAULT_SYNC_TRAILING_DAYS,
+    help=f'With --sync, always refetch days this close to today (default: {DEFAULT_SYNC_TRAILING_DAYS})'
+)
+@click.option(
+    '--sync-final-status',
+    multiple=True,
+    help='With --sync, refetch days holding entries whose status is not one of these (repeatable)'
+)
+@click.option(
+    '--cache-dir',
+    type=click.Path(file_okay=False, dir_okay=True, writable=True),
+    default=str(default_cache_dir()),
+    help='Directory for the persistent AgileDay cache (default: ~/.cache/billable_invoicing)'
+)
+@click.option(
+    '--cache-ttl',
+    type=click.FloatRange(min=0),
+    default=DEFAULT_PROJECT_TTL_SECONDS / 3600,
+    help=f'Hours a cached project is used without revalidation (default: {DEFAULT_PROJECT_TTL_SECONDS // 3600})'
+)
+@click.option(
+    '--no-cache',
+    is_flag=True,
+    help='Do not read or write the persistent project cache or reference data snapshots'
+)
+@click.option(
+    '--refresh-cache',
+    is_flag=True,
+    help='Refetch all projects and overwrite the persistent project cache'
+)
+@click.option(
+    '--filtered-csv/--no-filtered-csv',
+    default=True,
+    help='Write filtered_hours.csv in the background while the invoice is built (default: on)'
+)
+@click.option(
+    '--engine',
+    type=click.Choice(SUMMARY_ENGINES),
+    default='python',
+    help='Engine computing the project summaries; pandas is faster on large months (default: python)'
+)
+@click.option(
+    '--workers',
+    type=click.IntRange(min=1),
+    default=1,
+    help='Number of processes the invoice groups are built in; the result is the same (default: 1)'
+)
+@click.option(
+    '--incremental/--no-incremental',
+    default=False,
+    help='Rebuild only the invoice groups whose inputs changed since the last run of the result file (default: off)'
+)
+@click.option(
+    '--api-url',
+    default=None,
+    help='Base URL of the AgileDay API, e.g. a local stand-in server (default: AGILEDAY_API_URL or production)'
+)
+@click.option(
+    '--record',
+    type=click.Path(dir_okay=False, writable=True),
+    help='Record all AgileDay traffic to a cassette file (e.g., agileday.jsonl.gz)'
+)
+@click.option(
+    '--replay',
+    type=click.Path(exists=True, dir_okay=False, readable=True),
+    help='Answer AgileDay requests from a recorded cassette instead of the API'
+)
+@click.option(
+    '--replay-latency',
+    type=click.FloatRange(min=0),
+    default=0.0,
+    help='With --replay, delay each replayed response by this many seconds (default: 0)'
+)
 @click.option(
     '-v', '--verbose',
     is_flag=True,
@@ -108,6 +285,24 @@ def fetch_hours(
     start_date: datetime,
     end_date: datetime,
     status: str,
+    fetch_window: Optional[str],
+    fetch_workers: int,
+    rate_limit: float,
+    sync: bool,
+    sync_trailing_days: int,
+    sync_final_status: Tuple[str, ...],
+    cache_dir: str,
+    cache_ttl: float,
+    no_cache: bool,
+    refresh_cache: bool,
+    filtered_csv: bool,
+    engine: str,
+    workers: int,
+    incremental: bool,
+    api_url: Optional[str],
+    record: Optional[str],
+    replay: Optional[str],
+    replay_latency: float,
     verbose: bool
 ) -> None:
     """Fetch time entries from AgileDay and save raw data to CSV."""
@@ -129,12 +324,30 @@ def fetch_hours(
     
     # Track failed entries
     failed_entries: List[Dict[str, Any]] = []
+    client: Optional[AgileDayClient] = None
+    filtered_entries: Optional[List[TimeEntry]] = None
+    csv_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='filtered-csv')
+    filtered_csv_write: Optional[Future] = None
     
     try:
         # Initialize clients
-        client = AgileDayClient()
-        transformer = TimeEntryTransformer()
-        workday_transformer = WorkdayTransformer()
+        project_cache = None
+        if not no_cache:
+            project_cache = ProjectCache(Path(cache_dir), ttl_seconds=int(cache_ttl * 3600))
+        client = AgileDayClient(
+            project_cache=project_cache,
+            refresh_cache=refresh_cache,
+            scheduler=RequestScheduler(
+                rate_limit=rate_limit,
+                initial_concurrency=fetch_workers,
+                max_concurrency=fetch_workers
+            ),
+            cassette=open_cassette(record, replay, replay_latency),
+            api_url=api_url
+        )
+        transformer = create_transformer(engine)
+        reference_data = ReferenceDataStore(None if no_cache else Path(cache_dir))
+        workday_transformer = WorkdayTransformer(reference_data, workers=workers, incremental=incremental)
         
         # Verify input files are readable
         customer_data_path = Path(customer_data)
@@ -148,78 +361,83 @@ def fetch_hours(
         if not os.access(rates_file_path, os.R_OK):
             raise ValueError(f"Rates file is not readable: {rates_file}")
             
-        # Fetch entries and project data
-        entries = client.get_time_entries(start_date, end_date, status)
+        # Fetch entries and project data, parsing each entry once
+        entries = parse_time_entries(fetch_time_entries(
+            client,
+            start_date,
+            end_date,
+            status,
+            fetch_window,
+            fetch_workers,
+            Path(cache_dir) if sync else None,
+            sync_trailing_days,
+            sync_final_status
+        ))
         
         # Write unfiltered data for debugging
         transformer.transform_to_csv(entries, raw_output)
         logger.info("Wrote %d raw entries to %s", len(entries), raw_output)
         
+        # Compute counts, project IDs and all summaries in a single pass
+        rollups = transformer.aggregate(entries)
+        
         # Log some stats about the raw data
-        external_count = sum(1 for e in entries if e.get('projectType') == 'External')
-        billable_count = sum(1 for e in entries if e.get('billable'))
         logger.info(
             "Raw data stats: %d total entries, %d external projects, %d billable entries",
-            len(entries),
-            external_count,
-            billable_count
+            rollups.total_count,
+            rollups.external_count,
+            rollups.billable_count
         )
         
         # Build project data cache
-        project_data: Dict[str, Dict[str, Any]] = {}
-        project_ids = {entry['projectId'] for entry in entries if entry.get('projectId')}
+        project_ids = rollups.project_ids
         logger.info("Found %d unique projects", len(project_ids))
         
-        for project_id in project_ids:
-            try:
-                project = client.get_project(project_id)
-                project_data[project_id] = project
-                if verbose:
-                    logger.debug(
-                        "Project %s: type=%s, company=%s",
-                        project_id,
-                        project.get('type'),
-                        project.get('company', {}).get('name')
-                    )
-            except Exception as e:
-                logger.warning("Failed to fetch project %s: %s", project_id, e)
-                # Add entries with failed project fetch to failed entries
-                failed_entries.extend([
-                    {**entry, 'error': f"Failed to fetch project data: {str(e)}"}
-                    for entry in entries
-                    if entry.get('projectId') == project_id
-                ])
+        project_data, project_failures = client.get_projects(project_ids, workers=fetch_workers)
+        if verbose:
+            for project_id, project in project_data.items():
+                logger.debug(
+                    "Project %s: type=%s, company=%s",
+                    project_id,
+                    project.get('type'),
+                    project.get('company', {}).get('name')
+                )
+        
+        for project_id, error in project_failures.items():
+            logger.warning("Failed to fetch project %s: %s", project_id, error)
+            # Add entries with failed project fetch to failed entries
+            failed_entries.extend([
+                {**entry.to_dict(), 'error': f"Failed to fetch project data: {str(error)}"}
+                for entry in entries
+                if entry.project_id == project_id
+            ])
+        client.scheduler.log_stats()
         
         # First show summary for the specified company (informational)
         try:
-            filtered_entries = transformer.filter_entries(entries, company, project_data)
+            filtered_entries, filtered_rollup = rollups.filtered(project_data)
             logger.info("\nSummary for company: %s", company)
             logger.info("-" * 80)
-            transformer.calculate_project_summaries(filtered_entries)
-            
-            # Save filtered data to CSV (for reference)
-            transformer.transform_to_csv(filtered_entries, filtered_output)
-            logger.info("Successfully exported %d filtered entries to %s", len(filtered_entries), filtered_output)
+            transformer.log_project_summaries(filtered_rollup.project_summaries)
             
-            # Read customer data for project validation
-            customer_data_dict = {}
-            with open(customer_data_path, 'r', newline='') as csvfile:
-                reader = csv.DictReader(csvfile)
-                for row in reader:
-                    project_id = row.get('AgileDay_projectId')
-                    if project_id:
-                        customer_data_dict[project_id] = row
+            # Save filtered data to CSV (for reference) while the rest is processed
+            if filtered_csv:
+                filtered_csv_write = csv_writer.submit(transformer.transform_to_csv, filtered_entries, filtered_output)
             
-            # Set customer data in transformer
-            transformer.set_customer_data(customer_data_dict)
+            # Set customer data for project validation in transformer
+            transformer.set_customer_data(dict(reference_data.customer_data(customer_data_path).by_project_id))
             
             # Write filtered summaries to CSV (for reference)
-            transformer.write_summaries_to_csv(filtered_entries, filtered_summary)
+            transformer.write_rollup_to_csv(
+                filtered_rollup.task_summaries,
+                filtered_rollup.projects_with_hours,
+                filtered_summary
+            )
             logger.info("Filtered project summaries written to %s", filtered_summary)
         except Exception as e:
             logger.error("Error processing filtered entries: %s", str(e))
             failed_entries.extend([
-                {**entry, 'error': f"Failed during filtering: {str(e)}"}
+                {**entry.to_dict(), 'error': f"Failed during filtering: {str(e)}"}
                 for entry in entries
             ])
         
@@ -227,24 +445,31 @@ def fetch_hours(
         try:
             logger.info("\nProcessing complete summary for all projects")
             logger.info("-" * 80)
-            transformer.calculate_project_summaries(entries)
+            complete_rollup = rollups.complete()
+            transformer.log_project_summaries(complete_rollup.project_summaries)
             
             # Write complete summaries to CSV
-            transformer.write_summaries_to_csv(entries, complete_summary)
+            transformer.write_rollup_to_csv(
+                complete_rollup.task_summaries,
+                complete_rollup.projects_with_hours,
+                complete_summary
+            )
             logger.info("Complete project summaries written to %s", complete_summary)
             
-            # Transform complete data using customer data
-            workday_transformer.transform_to_workday(
-                customer_data_path=customer_data_path,
-                raw_hours_path=filtered_output,  # Use filtered hours as input
-                rates_file_path=rates_file_path,
+            # Transform the filtered entries in memory using customer data
+            if filtered_entries is None:
+                raise ValueError("Filtered entries are not available, filtering failed")
+            workday_transformer.transform_to_workday_from_entries(
+                filtered_entries,
+                customer_data=workday_transformer.read_customer_data(customer_data_path),
+                internal_rates=workday_transformer.load_internal_rates(rates_file_path),
                 result_file_path=result_file_path
             )
             logger.info("Transformed data written to result file: %s", result_file_path)
         except Exception as e:
             logger.error("Error during workday transformation: %s", str(e), exc_info=True)
             failed_entries.extend([
-                {**entry, 'error': f"Failed during workday transformation: {str(e)}"}
+                {**entry.to_dict(), 'error': f"Failed during workday transformation: {str(e)}"}
                 for entry in entries
             ])
             raise  # Re-raise to ensure we see the full error
@@ -253,6 +478,22 @@ def fetch_hours(
         logger.error("Failed to process time entries: %s", str(e), exc_info=True)
         raise  # Re-raise to ensure we exit with error
     finally:
+        if client is not None:
+            client.close()
+        
+        # Wait for the background CSV export
+        if filtered_csv_write is not None:
+            try:
+                count = filtered_csv_write.result()
+                logger.info("Successfully exported %d filtered entries to %s", count, filtered_output)
+            except Exception as e:
+                logger.error("Failed to write filtered entries to %s: %s", filtered_output, str(e))
+                failed_entries.extend([
+                    {**entry.to_dict(), 'error': f"Failed to write filtered entries: {str(e)}"}
+                    for entry in filtered_entries or []
+                ])
+        csv_writer.shutdown()
+        
         # Write failed entries to errors.csv if any exist
         if failed_entries:
             try:
@@ -270,6 +511,185 @@ def fetch_hours(
         if failed_entries:
             sys.exit(1)
 
+@cli.command()
+@click.option(
+    '--output',
+    required=True,
+    type=click.Path(dir_okay=False, writable=True),
+    help='Path to write the raw hours CSV file (e.g., raw_hours.csv)'
+)
+@click.option(
+    '--start-date',
+    required=True,
+    callback=validate_date,
+    help='Start date for time entries (YYYY-MM-DD)'
+)
+@click.option(
+    '--end-date',
+    required=True,
+    callback=validate_date,
+    help='End date for time entries (YYYY-MM-DD)'
+)
+@click.option(
+    '--status',
+    default='Submitted',
+    help='Status of entries to fetch (default: Submitted)'
+)
+@click.option(
+    '--api-url',
+    default=None,
+    help='Base URL of the AgileDay API, e.g. a local stand-in server (default: AGILEDAY_API_URL or production)'
+)
+@click.option(
+    '--record',
+    type=click.Path(dir_okay=False, writable=True),
+    help='Record all AgileDay traffic to a cassette file (e.g., agileday.jsonl.gz)'
+)
+@click.option(
+    '--replay',
+    type=click.Path(exists=True, dir_okay=False, readable=True),
+    help='Answer AgileDay requests from a recorded cassette instead of the API'
+)
+@click.option(
+    '--replay-latency',
+    type=click.FloatRange(min=0),
+    default=0.0,
+    help='With --replay, delay each replayed response by this many seconds (default: 0)'
+)
+@click.option(
+    '-v', '--verbose',
+    is_flag=True,
+    help='Enable verbose logging'
+)
+def fetch(
+    output: str,
+    start_date: datetime,
+    end_date: datetime,
+    status: str,
+    api_url: Optional[str],
+    record: Optional[str],
+    replay: Optional[str],
+    replay_latency: float,
+    verbose: bool
+) -> None:
+    """Stream time entries from AgileDay straight to a raw hours CSV file."""
+    configure_logging(verbose)
+    
+    client: Optional[AgileDayClient] = None
+    try:
+        client = AgileDayClient(
+            cassette=open_cassette(record, replay, replay_latency),
+            api_url=api_url
+        )
+        transformer = TimeEntryTransformer()
+        
+        output_path = Path(output)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        
+        count = transformer.transform_to_csv(
+            (
+                TimeEntry.from_dict(entry)
+                for entry in client.iter_time_entries(start_date, end_date, status)
+            ),
+            output_path
+        )
+        logger.info("Wrote %d raw entries to %s", count, output_path)
+        
+    except Exception as e:
+        logger.error("Failed to fetch time entries: %s", str(e))
+        raise
+    finally:
+        if client is not None:
+            client.close()
+
+@cli.command()
+@click.option(
+    '--customer-data',
+    required=True,
+    type=click.Path(exists=True, dir_okay=False, readable=True),
+    help='Path to customer data CSV file (e.g., customer.csv)'
+)
+@click.option(
+    '--raw-hours',
+    required=True,
+    type=click.Path(exists=True, dir_okay=False, readable=True),
+    help='Path to a raw hours CSV file, e.g. written by fetch'
+)
+@click.option(
+    '--rates-file',
+    required=True,
+    type=click.Path(exists=True, dir_okay=False, readable=True),
+    help='Path to rates CSV file with internal hour rates'
+)
+@click.option(
+    '--output',
+    required=True,
+    type=click.Path(dir_okay=False, writable=True),
+    help='Path to write the Workday invoice file'
+)
+@click.option(
+    '--memory-budget',
+    type=click.FloatRange(min=0, min_open=True),
+    default=None,
+    help='Group the raw hours out of core, buffering at most this many MB of entries (default: in memory)'
+)
+@click.option(
+    '--workers',
+    type=click.IntRange(min=1),
+    default=1,
+    help='Number of processes the invoice groups are built in; the result is the same (default: 1)'
+)
+@click.option(
+    '--cache-dir',
+    type=click.Path(file_okay=False, dir_okay=True, writable=True),
+    default=str(default_cache_dir()),
+    help='Directory for the reference data snapshots (default: ~/.cache/billable_invoicing)'
+)
+@click.option(
+    '--no-cache',
+    is_flag=True,
+    help='Do not read or write reference data snapshots'
+)
+@click.option(
+    '-v', '--verbose',
+    is_flag=True,
+    help='Enable verbose logging'
+)
+def workday(
+    customer_data: str,
+    raw_hours: str,
+    rates_file: str,
+    output: str,
+    memory_budget: Optional[float],
+    workers: int,
+    cache_dir: str,
+    no_cache: bool,
+    verbose: bool
+) -> None:
+    """Transform a raw hours CSV file to the Workday invoice format."""
+    configure_logging(verbose)
+    
+    try:
+        output_path = Path(output)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        
+        workday_transformer = WorkdayTransformer(
+            ReferenceDataStore(None if no_cache else Path(cache_dir)),
+            workers=workers,
+            memory_budget_mb=memory_budget
+        )
+        workday_transformer.transform_to_workday(
+            customer_data_path=Path(customer_data),
+            raw_hours_path=Path(raw_hours),
+            rates_file_path=Path(rates_file),
+            result_file_path=output_path
+        )
+        logger.info("Transformed data written to result file: %s", output_path)
+        
+    except Exception as e:
+        logger.error("Failed to transform raw hours: %s", str(e))
+        raise
+
 @cli.command()
 @click.option(
     '--customer-data',
@@ -282,6 +702,17 @@ def fetch_hours(
     type=click.Path(dir_okay=False, writable=True),
     help='Path to save raw hours CSV file. Defaults to raw_hours.csv in the output directory.'
 )
+@click.option(
+    '--memory-budget',
+    type=click.FloatRange(min=0, min_open=True),
+    default=None,
+    help='Group the raw hours out of core, buffering at most this many MB of entries (default: in memory)'
+)
+@click.option(
+    '--roles-file',
+    type=click.Path(exists=True, dir_okay=False, readable=True),
+    help='CSV file with Role and Email columns mapping employees to roles (default: ROLE_EMAILS in config.py)'
+)
 @click.option(
     '--output',
     required=True,
@@ -290,9 +721,8 @@ def fetch_hours(
 )
 @click.option(
     '--start-date',
-    required=True,
     callback=validate_date,
-    help='Start date for filtering hours (YYYY-MM-DD)'
+    help='Start date for filtering hours (YYYY-MM-DD), required unless --rolling is given'
 )
 @click.option(
     '--end-date',
@@ -300,11 +730,89 @@ def fetch_hours(
     callback=validate_date,
     help='End date for filtering hours (YYYY-MM-DD)'
 )
+@click.option(
+    '--rolling',
+    type=click.IntRange(min=1),
+    default=None,
+    help='Report the trailing N calendar months up to --end-date, reusing the stored aggregates of settled months'
+)
+@click.option(
+    '--settle-days',
+    type=click.IntRange(min=0),
+    default=DEFAULT_SETTLE_DAYS,
+    help=f'With --rolling, store a month only once it ended more than this many days ago (default: {DEFAULT_SETTLE_DAYS})'
+)
+@click.option(
+    '--rebuild-months',
+    is_flag=True,
+    help='With --rolling, fetch the stored months again and replace them'
+)
 @click.option(
     '--status',
     default='Submitted',
     help='Status of entries to fetch (default: Submitted)'
 )
+@click.option(
+    '--fetch-window',
+    type=click.Choice(FETCH_WINDOWS),
+    default=None,
+    help='Fetch the date range in concurrent day or week windows (default: single request)'
+)
+@click.option(
+    '--fetch-workers',
+    type=click.IntRange(min=1),
+    default=DEFAULT_FETCH_WORKERS,
+    help=f'Number of concurrent window requests with --fetch-window (default: {DEFAULT_FETCH_WORKERS})'
+)
+@click.option(
+    '--rate-limit',
+    type=click.FloatRange(min=0, min_open=True),
+    default=DEFAULT_RATE_LIMIT,
+    help=f'Maximum AgileDay requests per second (default: {DEFAULT_RATE_LIMIT:g})'
+)
+@click.option(
+    '--sync',
+    is_flag=True,
+    help='Serve entries from the local entry store, refetching only days that may have changed'
+)
+@click.option(
+    '--sync-trailing-days',
+    type=click.IntRange(min=0),
+    default=DEFAULT_SYNC_TRAILING_DAYS,
+    help=f'With --sync, always refetch days this close to today (default: {DEFAULT_SYNC_TRAILING_DAYS})'
+)
+@click.option(
+    '--sync-final-status',
+    multiple=True,
+    help='With --sync, refetch days holding entries whose status is not one of these (repeatable)'
+)
+@click.option(
+    '--cache-dir',
+    type=click.Path(file_okay=False, dir_okay=True, writable=True),
+    default=str(default_cache_dir()),
+    help='Directory for the persistent AgileDay cache, the monthly aggregates and the reference data snapshots (default: ~/.cache/billable_invoicing)'
+)
+@click.option(
+    '--api-url',
+    default=None,
+    help='Base URL of the AgileDay API, e.g. a local stand-in server (default: AGILEDAY_API_URL or production)'
+)
+@click.option(
+    '--record',
+    type=click.Path(dir_okay=False, writable=True),
+    help='Record all AgileDay traffic to a cassette file (e.g., agileday.jsonl.gz)'
+)
+@click.option(
+    '--replay',
+    type=click.Path(exists=True, dir_okay=False, readable=True),
+    help='Answer AgileDay requests from a recorded cassette instead of the API'
+)
+@click.option(
+    '--replay-latency',
+    type=click.FloatRange(min=0),
+    default=0.0,
+    help='With --replay, delay each replayed response by this many seconds (default: 0)'
+)
 @click.option(
     '-v', '--verbose',
     is_flag=True,
@@ -313,19 +821,61 @@ def fetch_hours(
 def util(
     customer_data: str,
     raw_hours: Optional[str],
+    memory_budget: Optional[float],
+    roles_file: Optional[str],
     output: str,
-    start_date: datetime,
+    start_date: Optional[datetime],
     end_date: datetime,
+    rolling: Optional[int],
+    settle_days: int,
+    rebuild_months: bool,
     status: str,
+    fetch_window: Optional[str],
+    fetch_workers: int,
+    rate_limit: float,
+    sync: bool,
+    sync_trailing_days: int,
+    sync_final_status: Tuple[str, ...],
+    cache_dir: str,
+    api_url: Optional[str],
+    record: Optional[str],
+    replay: Optional[str],
+    replay_latency: float,
     verbose: bool
 ) -> None:
     """Transform time entries to utilization metrics."""
     configure_logging(verbose)
+    if rolling is not None and start_date is not None:
+        raise click.UsageError("--start-date cannot be used with --rolling")
+    if rolling is None and start_date is None:
+        raise click.UsageError("Missing option '--start-date'")
+    if rolling is None and rebuild_months:
+        raise click.UsageError("--rebuild-months can only be used with --rolling")
+    if rolling is not None and (memory_budget is not None or raw_hours):
+        raise click.UsageError("--memory-budget and --raw-hours cannot be used with --rolling")
+    if memory_budget is not None and (sync or fetch_window):
+        raise click.UsageError(
+            "--memory-budget streams the entries in a single request and cannot be used with --sync or --fetch-window"
+        )
     
+    client: Optional[AgileDayClient] = None
     try:
         # Initialize clients
-        client = AgileDayClient()
-        transformer = UtilizationTransformer()
+        client = AgileDayClient(
+            scheduler=RequestScheduler(
+                rate_limit=rate_limit,
+                initial_concurrency=fetch_workers,
+                max_concurrency=fetch_workers
+            ),
+            cassette=open_cassette(record, replay, replay_latency),
+            api_url=api_url
+        )
+        transformer = UtilizationTransformer(
+            client,
+            reference_data=ReferenceDataStore(Path(cache_dir)),
+            memory_budget_mb=memory_budget,
+            roles_file=Path(roles_file) if roles_file else None
+        )
         
         # Verify input files exist and are readable
         customer_data_path = Path(customer_data)
@@ -338,6 +888,36 @@ def util(
         output_path = Path(output)
         output_path.parent.mkdir(parents=True, exist_ok=True)
         
+        if rolling is not None:
+            def fetch_month(month_start: date, month_end: date) -> List[TimeEntry]:
+                return parse_time_entries(fetch_time_entries(
+                    client,
+                    datetime.combine(month_start, datetime.min.time()),
+                    datetime.combine(month_end, datetime.min.time()),
+                    status,
+                    fetch_window,
+                    fetch_workers,
+                    Path(cache_dir) if sync else None,
+                    sync_trailing_days,
+                    sync_final_status
+                ))
+            
+            transformer.transform_rolling_utilization(
+                customer_data_path=customer_data_path,
+                result_file_path=output_path,
+                end_date=end_date.date(),
+                months=rolling,
+                store=MonthlyCubeStore(Path(cache_dir) / "utilization"),
+                fetch_hours=fetch_month,
+                # Months fetched from a stand-in server or a cassette are not reused for AgileDay
+                context='\n'.join([status, client.api_url, str(Path(replay).resolve()) if replay else '']),
+                settle_days=settle_days,
+                rebuild=rebuild_months
+            )
+            client.scheduler.log_stats()
+            logger.info("Successfully wrote utilization data to %s", output)
+            return
+        
         # Determine where to save raw hours
         if raw_hours:
             raw_hours_path = Path(raw_hours)
@@ -347,12 +927,36 @@ def util(
         
         # Fetch data from AgileDay
         logger.info("Fetching time entries from AgileDay...")
-        entries = client.get_time_entries(start_date, end_date, status)
-        logger.info("Fetched %d time entries from AgileDay", len(entries))
-        
-        # Write raw data to CSV
-        transformer.transform_to_csv(entries, raw_hours_path)
-        logger.info("Wrote raw entries to %s", raw_hours_path)
+        if memory_budget is not None:
+            # Stream the entries straight to the raw hours file, which is then grouped out of core
+            count = TimeEntryTransformer().transform_to_csv(
+                (
+                    TimeEntry.from_dict(entry)
+                    for entry in client.iter_time_entries(start_date, end_date, status)
+                ),
+                raw_hours_path
+            )
+            logger.info("Streamed %d time entries from AgileDay to %s", count, raw_hours_path)
+            client.scheduler.log_stats()
+        else:
+            entries = parse_time_entries(fetch_time_entries(
+                client,
+                start_date,
+                end_date,
+                status,
+                fetch_window,
+                fetch_workers,
+                Path(cache_dir) if sync else None,
+                sync_trailing_days,
+                sync_final_status
+            ))
+            logger.info("Fetched %d time entries from AgileDay", len(entries))
+            client.scheduler.log_stats()
+            
+            # Write raw data to CSV
+            transformer.transform_to_csv(entries, raw_hours_path)
+            logger.info("Wrote raw entries to %s", raw_hours_path)
+            del entries
         
         # Transform to utilization
         transformer.transform_to_utilization(
@@ -368,6 +972,382 @@ def util(
     except Exception as e:
         logger.error("Failed to process utilization data: %s", str(e))
         raise
+    finally:
+        if client is not None:
+            client.close()
+
+@cli.command('serve-agileday')
+@click.option(
+    '--host',
+    default='127.0.0.1',
+    help='Interface to listen on (default: 127.0.0.1)'
+)
+@click.option(
+    '--port',
+    type=click.IntRange(min=0),
+    default=8080,
+    help='Port to listen on (default: 8080)'
+)
+@click.option(
+    '--seed',
+    type=int,
+    default=0,
+    help='Seed of the synthetic data (default: 0)'
+)
+@click.option(
+    '--employees',
+    type=click.IntRange(min=1),
+    default=50,
+    help='Number of synthetic employees (default: 50)'
+)
+@click.option(
+    '--customers',
+    type=click.IntRange(min=1),
+    default=10,
+    help='Number of synthetic customers (default: 10)'
+)
+@click.option(
+    '--projects-per-customer',
+    type=click.IntRange(min=1),
+    default=3,
+    help='Number of projects per customer (default: 3)'
+)
+@click.option(
+    '--entries-per-day',
+    type=click.IntRange(min=1),
+    default=2,
+    help='Time entries per employee and working day (default: 2)'
+)
+@click.option(
+    '--latency',
+    type=click.FloatRange(min=0),
+    default=0.0,
+    help='Seconds added to every response (default: 0)'
+)
+@click.option(
+    '--error-rate',
+    type=click.FloatRange(min=0, max=1),
+    default=0.0,
+    help='Share of requests answered with 503 and Retry-After (default: 0)'
+)
+@click.option(
+    '--page-size',
+    type=click.IntRange(min=1),
+    default=DEFAULT_PAGE_SIZE,
+    help=f'Time entries written per response chunk (default: {DEFAULT_PAGE_SIZE})'
+)
+@click.option(
+    '--fixtures-dir',
+    type=click.Path(file_okay=False, dir_okay=True, writable=True),
+    help='Write a matching customer.csv and rates.csv to this directory'
+)
+@click.option(
+    '-v', '--verbose',
+    is_flag=True,
+    help='Enable verbose logging'
+)
+def serve_agileday(
+    host: str,
+    port: int,
+    seed: int,
+    employees: int,
+    customers: int,
+    projects_per_customer: int,
+    entries_per_day: int,
+    latency: float,
+    error_rate: float,
+    page_size: int,
+    fixtures_dir: Optional[str],
+    verbose: bool
+) -> None:
+    """Serve synthetic data from a local stand-in for the AgileDay API."""
+    configure_logging(verbose)
+    
+    dataset = SyntheticDataset(
+        seed=seed,
+        employees=employees,
+        customers=customers,
+        projects_per_customer=projects_per_customer,
+        entries_per_day=entries_per_day
+    )
+    if fixtures_dir:
+        fixtures_path = Path(fixtures_dir)
+        fixtures_path.mkdir(parents=True, exist_ok=True)
+        dataset.write_customer_csv(fixtures_path / "customer.csv")
+        dataset.write_rates_csv(fixtures_path / "rates.csv")
+    
+    server = StandInServer(
+        dataset,
+        host=host,
+        port=port,
+        latency=latency,
+        error_rate=error_rate,
+        page_size=page_size
+    )
+    logger.info("Run commands with --api-url %s and any AGILEDAY_TOKEN", server.api_url)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Stopping stand-in AgileDay API")
+    finally:
+        server.stop()
+
+@cli.command('bench-summaries')
+@click.option(
+    '--entries',
+    'entry_count',
+    type=click.IntRange(min=1),
+    default=1_000_000,
+    help='Number of synthetic time entries to summarize (default: 1000000)'
+)
+@click.option(
+    '--seed',
+    type=int,
+    default=0,
+    help='Seed of the synthetic data (default: 0)'
+)
+@click.option(
+    '--employees',
+    type=click.IntRange(min=1),
+    default=2000,
+    help='Number of synthetic employees (default: 2000)'
+)
+@click.option(
+    '--customers',
+    type=click.IntRange(min=1),
+    default=40,
+    help='Number of synthetic customers (default: 40)'
+)
+@click.option(
+    '--output-path',
+    type=click.Path(file_okay=False, dir_okay=True, writable=True),
+    help='Keep the summary CSVs of each engine in this directory (default: temporary directory)'
+)
+@click.option(
+    '-v', '--verbose',
+    is_flag=True,
+    help='Enable verbose logging'
+)
+def bench_summaries(
+    entry_count: int,
+    seed: int,
+    employees: int,
+    customers: int,
+    output_path: Optional[str],
+    verbose: bool
+) -> None:
+    """Compare the summary engines on synthetic time entries.
+    
+    Runs the summary steps of fetch-hours with every engine, checks that
+    the CSV files are byte-identical and reports the timings.
+    """
+    configure_logging(verbose)
+    
+    dataset = SyntheticDataset(seed=seed, employees=employees, customers=customers)
+    logger.info("Generating %d synthetic time entries", entry_count)
+    entries = parse_time_entries(itertools.islice(
+        dataset.iter_time_entries(date(2024, 1, 1), date.max),
+        entry_count
+    ))
+    project_data = {
+        project.project_id: dataset.get_project(project.project_id)
+        for project in dataset.projects
+    }
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        output_dir = Path(output_path or temp_dir)
+        timings: Dict[str, float] = {}
+        outputs: Dict[str, List[bytes]] = {}
+        for engine in SUMMARY_ENGINES:
+            engine_dir = output_dir / engine
+            engine_dir.mkdir(parents=True, exist_ok=True)
+            transformer = create_transformer(engine)
+            
+            # Keep the summary tables out of the output unless asked for
+            summary_loggers = [
+                logging.getLogger(TimeEntryTransformer.__module__),
+                logging.getLogger(type(transformer).__module__)
+            ]
+            levels = [summary_logger.level for summary_logger in summary_loggers]
+            if not verbose:
+                for summary_logger in summary_loggers:
+                    summary_logger.setLevel(logging.WARNING)
+            try:
+                started = time.perf_counter()
+                rollups = transformer.aggregate(entries)
+                _, filtered_rollup = rollups.filtered(project_data)
+                complete_rollup = rollups.complete()
+                for rollup, name in (
+                    (filtered_rollup, "filtered_hours_summary.csv"),
+                    (complete_rollup, "complete_hours_summary.csv")
+                ):
+                    transformer.log_project_summaries(rollup.project_summaries)
+                    transformer.write_rollup_to_csv(
+                        rollup.task_summaries,
+                        rollup.projects_with_hours,
+                        engine_dir / name
+                    )
+                timings[engine] = time.perf_counter() - started
+            finally:
+                for summary_logger, level in zip(summary_loggers, levels):
+                    summary_logger.setLevel(level)
+            
+            outputs[engine] = [
+                (engine_dir / name).read_bytes()
+                for name in ("filtered_hours_summary.csv", "complete_hours_summary.csv")
+            ]
+            logger.info("Engine %-8s %8.3f s", engine, timings[engine])
+        
+        baseline = SUMMARY_ENGINES[0]
+        for engine in SUMMARY_ENGINES[1:]:
+            if outputs[engine] != outputs[baseline]:
+                raise click.ClickException(f"Summary CSVs of the {engine} engine differ from the {baseline} engine")
+            logger.info(
+                "Engine %s is %.2fx the speed of %s on %d entries, output identical",
+                engine,
+                timings[baseline] / timings[engine],
+                baseline,
+                len(entries)
+            )
+
+
+@cli.command('bench-rates')
+@click.option(
+    '--entries',
+    'entry_count',
+    type=click.IntRange(min=1),
+    default=1_000_000,
+    help='Number of synthetic time entries to price (default: 1000000)'
+)
+@click.option(
+    '--seed',
+    type=int,
+    default=0,
+    help='Seed of the synthetic data (default: 0)'
+)
+@click.option(
+    '--employees',
+    type=click.IntRange(min=1),
+    default=2000,
+    help='Number of synthetic employees (default: 2000)'
+)
+@click.option(
+    '--customers',
+    type=click.IntRange(min=1),
+    default=40,
+    help='Number of synthetic customers (default: 40)'
+)
+@click.option(
+    '-v', '--verbose',
+    is_flag=True,
+    help='Enable verbose logging'
+)
+def bench_rates(
+    entry_count: int,
+    seed: int,
+    employees: int,
+    customers: int,
+    verbose: bool
+) -> None:
+    """Compare rate resolution strategies on synthetic time entries.
+    
+    Prices every entry of an active customer project with the uncompiled
+    resolver and with the compiled rate table, then prices the same
+    entries once per project task as fetch-hours does. Checks that all
+    strategies agree and reports the cost per entry, and per task group
+    for the batched strategy.
+    """
+    configure_logging(verbose)
+    
+    dataset = SyntheticDataset(seed=seed, employees=employees, customers=customers)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        customer_path = Path(temp_dir) / "customer.csv"
+        rates_path = Path(temp_dir) / "rates.csv"
+        dataset.write_customer_csv(customer_path)
+        dataset.write_rates_csv(rates_path)
+        reference_data = ReferenceDataStore(None)
+        customer_data = dict(reference_data.customer_data(customer_path).active_by_project_id)
+        internal_rates = dict(reference_data.rates(rates_path).rates)
+    
+    logger.info("Generating %d synthetic time entries", entry_count)
+    entries = [
+        entry for entry in parse_time_entries(itertools.islice(
+            dataset.iter_time_entries(date(2024, 1, 1), date.max),
+            entry_count
+        ))
+        if entry.project_id in customer_data
+    ]
+    if not entries:
+        raise click.ClickException("No synthetic entries belong to active customer projects")
+    
+    # Task groups as built by fetch-hours: first entry and entry count per task
+    task_groups: Dict[str, Dict[str, List[Any]]] = {}
+    for entry in entries:
+        tasks = task_groups.setdefault(entry.project_id, {})
+        task = tasks.get(entry.project_task)
+        if task is None:
+            tasks[entry.project_task] = [entry, 1]
+        else:
+            task[1] += 1
+    
+    task_count = sum(len(tasks) for tasks in task_groups.values())
+    timings: Dict[str, float] = {}
+    
+    reference_missing = MissingRateCollector()
+    started = time.perf_counter()
+    reference = [
+        per_entry_rate(entry, entry.project_id, customer_data[entry.project_id], internal_rates, reference_missing)
+        for entry in entries
+    ]
+    timings['per-entry'] = time.perf_counter() - started
+    
+    resolver = RateResolver(customer_data, internal_rates, MissingRateCollector())
+    started = time.perf_counter()
+    compiled = [resolver.rate(entry, entry.project_id) for entry in entries]
+    timings['compiled'] = time.perf_counter() - started
+    
+    resolver = RateResolver(customer_data, internal_rates, MissingRateCollector())
+    started = time.perf_counter()
+    batched = {
+        project_id: resolver.price_tasks(project_id, [tuple(task) for task in tasks.values()])
+        for project_id, tasks in task_groups.items()
+    }
+    timings['batched'] = time.perf_counter() - started
+    
+    if compiled != reference:
+        raise click.ClickException("Compiled rates differ from the per-entry rates")
+    expected_missing = MissingRateCollector()
+    for project_id, tasks in task_groups.items():
+        for (first_entry, count), rate in zip(tasks.values(), batched[project_id]):
+            expected = per_entry_rate(
+                first_entry, project_id, customer_data[project_id], internal_rates, expected_missing, count
+            )
+            if rate != expected:
+                raise click.ClickException(
+                    f"Batched rate of {project_id}/{first_entry.project_task} differs from the per-entry rate"
+                )
+    
+    logger.info(
+        "Priced %d entries of %d project tasks, %d missing rates",
+        len(entries), task_count, len(reference_missing)
+    )
+    for strategy in ('per-entry', 'compiled'):
+        logger.info(
+            "Strategy %-9s %8.3f s %8.1f ns/entry",
+            strategy, timings[strategy], timings[strategy] / len(entries) * 1e9
+        )
+    logger.info(
+        "Strategy %-9s %8.3f s %8.1f ns/task group",
+        'batched', timings['batched'], timings['batched'] / task_count * 1e9
+    )
+    logger.info(
+        "Compiled is %.2fx the speed of per-entry, rates identical",
+        timings['per-entry'] / timings['compiled']
+    )
+    logger.info(
+        "Batched prices %d task groups in %.1f%% of the time per-entry takes for %d entries",
+        task_count, timings['batched'] / timings['per-entry'] * 100, len(entries)
+    )
 
 if __name__ == '__main__':
     cli() 
\ No newline at end of file
@@ -0,0 +1,135 @@
+"""Run-scoped collection of missing-rate diagnostics."""
+
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+INTERNAL_RATE_NOT_FOUND = "Internal rate not found"
+NO_HOURLY_RATE_FOUND = "No hourly rate found"
+
+
+@dataclass
+class MissingRate:
+    """A missing rate of one project task, with the number of entries it affects."""
+    kind: str
+    project_id: str
+    task: str
+    client: str
+    service: str
+    count: int
+    in_report: bool
+
+    def describe(self) -> str:
+        """Describe the miss in the missing_from_rates.txt format."""
+        return (
+            f"{self.kind} - Client: {self.client}, "
+            f"Service: {self.service}, Task: {self.task}, "
+            f"Project ID: {self.project_id}"
+        )
+
+
+class MissingRateCollector:
+    """Collect missing rates during a run and report them once at the end.
+
+    Misses are deduplicated by kind, project and task, and counted. At the
+    end of the run ``log_summary`` logs one warning per kind and
+    ``write_report`` writes the sorted ``missing_from_rates.txt``.
+    """
+
+    def __init__(self):
+        """Create an empty collector."""
+        self._misses: Dict[Tuple[str, str, str], MissingRate] = {}
+
+    def __len__(self) -> int:
+        return len(self._misses)
+
+    def add(
+        self,
+        kind: str,
+        project_id: str,
+        task: str,
+        client: str,
+        service: str,
+        count: int = 1,
+        in_report: bool = True
+    ) -> None:
+        """Record a missing rate.
+
+        Parameters
+        ----------
+        kind : str
+            What is missing, e.g. ``INTERNAL_RATE_NOT_FOUND``
+        project_id : str
+            AgileDay project ID
+        task : str
+            Project task name
+        client : str
+            Client name, used in messages
+        service : str
+            Service name, used in messages
+        count : int, optional
+            Number of entries affected, defaults to 1
+        in_report : bool, optional
+            Include the miss in missing_from_rates.txt, defaults to True;
+            misses that are not reported are only logged
+        """
+        key = (kind, project_id, task)
+        miss = self._misses.get(key)
+        if miss is None:
+            self._misses[key] = MissingRate(kind, project_id, task, client, service, count, in_report)
+        else:
+            miss.count += count
+            miss.in_report = miss.in_report or in_report
+
+    def merge(self, other: 'MissingRateCollector') -> None:
+        """Add the misses of another collector, e.g. one of a worker process.
+
+        Parameters
+        ----------
+        other : MissingRateCollector
+            Collector to merge into this one
+        """
+        for miss in other._misses.values():
+            self.add(
+                miss.kind, miss.project_id, miss.task, miss.client, miss.service,
+                count=miss.count, in_report=miss.in_report
+            )
+
+    def misses(self) -> List[MissingRate]:
+        """Return the misses sorted by kind, client, service, task and project."""
+        return sorted(
+            self._misses.values(),
+            key=lambda miss: (miss.kind, miss.client, miss.service, miss.task, miss.project_id)
+        )
+
+    def log_summary(self) -> None:
+        """Log one warning per kind of miss, listing the project tasks."""
+        by_kind: Dict[str, List[MissingRate]] = {}
+        for miss in self.misses():
+            by_kind.setdefault(miss.kind, []).append(miss)
+        for kind, misses in by_kind.items():
+            logger.warning(
+                "%s for %d project tasks (%d entries):\n%s",
+                kind,
+                len(misses),
+                sum(miss.count for miss in misses),
+                "\n".join(f"{miss.describe()} ({miss.count} entries)" for miss in misses)
+            )
+
+    def write_report(self, path: Path) -> None:
+        """Write the reported misses, sorted, one per line.
+
+        An empty file is written when nothing is missing.
+
+        Parameters
+        ----------
+        path : Path
+            Report file, usually missing_from_rates.txt in the output directory
+        """
+        with path.open('w') as f:
+            for miss in self.misses():
+                if miss.in_report:
+                    f.write(f"{miss.describe()} ({miss.count} entries)\n")
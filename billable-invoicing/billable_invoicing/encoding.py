@@ -0,0 +1,188 @@
+"""Encoding detection for the CSV input files."""
+
+import codecs
+import logging
+import mmap
+from pathlib import Path
+from typing import NamedTuple, Set, TextIO, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# Byte order marks and the encodings they identify
+BOMS = (
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+
+# Size of the slices of a memory-mapped file checked at a time
+SNIFF_CHUNK_SIZE = 1024 * 1024
+
+# Bytes 0x80-0x9F are printable characters in cp1252, e.g. the euro sign
+# and curly quotes, and C1 control characters in latin1. These five are
+# undefined in cp1252, so only latin1 can decode them.
+_C1_BYTES = bytes(range(0x80, 0xA0))
+_NOT_C1_BYTES = bytes(byte for byte in range(256) if byte not in _C1_BYTES)
+_CP1252_UNDEFINED = frozenset(b'\x81\x8d\x8f\x90\x9d')
+
+
+class EncodingGuess(NamedTuple):
+    """Encoding picked for a file and why."""
+    encoding: str
+    reason: str
+
+
+def _bom_encoding(head: bytes) -> EncodingGuess:
+    """Return the encoding of a byte order mark at the start of ``head``."""
+    for bom, encoding in BOMS:
+        if head.startswith(bom):
+            return EncodingGuess(encoding, f"{encoding} byte order mark")
+    return EncodingGuess('', '')
+
+
+def _legacy_encoding(c1_bytes: Set[int]) -> EncodingGuess:
+    """Pick cp1252 or latin1 for content that is not UTF-8.
+
+    Parameters
+    ----------
+    c1_bytes : Set[int]
+        Distinct bytes in the range 0x80-0x9F found in the content
+
+    Returns
+    -------
+    EncodingGuess
+        cp1252 if it defines all of the bytes, latin1 otherwise
+    """
+    if c1_bytes and not c1_bytes & _CP1252_UNDEFINED:
+        return EncodingGuess('cp1252', "not UTF-8, has cp1252 punctuation bytes")
+    return EncodingGuess('latin1', "not UTF-8")
+
+
+def sniff_encoding(content: Union[bytes, mmap.mmap]) -> EncodingGuess:
+    """Pick the encoding of file content from its bytes.
+
+    A byte order mark decides the encoding. Otherwise the content is
+    checked for valid UTF-8 in slices of ``SNIFF_CHUNK_SIZE`` bytes, so a
+    memory-mapped file is never copied whole. Content that is not UTF-8 is
+    cp1252 when its bytes 0x80-0x9F are all defined in cp1252, and latin1
+    otherwise, which decodes any byte.
+
+    Parameters
+    ----------
+    content : Union[bytes, mmap.mmap]
+        File content
+
+    Returns
+    -------
+    EncodingGuess
+        Encoding to decode the content with and the reason for it
+    """
+    guess = _bom_encoding(bytes(content[:4]))
+    if guess.encoding:
+        return guess
+
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    is_utf8 = True
+    is_ascii = True
+    c1_bytes: Set[int] = set()
+    for offset in range(0, len(content), SNIFF_CHUNK_SIZE):
+        chunk = content[offset:offset + SNIFF_CHUNK_SIZE]
+        if chunk.isascii() and not decoder.getstate()[0]:
+            continue
+        is_ascii = False
+        c1_bytes.update(chunk.translate(None, _NOT_C1_BYTES))
+        if is_utf8:
+            try:
+                decoder.decode(chunk)
+            except UnicodeDecodeError:
+                is_utf8 = False
+    if is_utf8:
+        try:
+            decoder.decode(b'', final=True)
+        except UnicodeDecodeError:
+            is_utf8 = False
+
+    if is_ascii:
+        return EncodingGuess('utf-8', "ASCII only")
+    if is_utf8:
+        return EncodingGuess('utf-8', "valid UTF-8")
+    return _legacy_encoding(c1_bytes)
+
+
+def decode_bytes(content: bytes, path: Path) -> Tuple[str, str]:
+    """Decode file content read into memory, decoding it only once.
+
+    Content without a byte order mark is decoded as UTF-8 straight away,
+    which also tells whether it is valid UTF-8. Only content that is not
+    is decoded a second time, as cp1252 or latin1 as ``sniff_encoding``
+    would pick.
+
+    Parameters
+    ----------
+    content : bytes
+        File content
+    path : Path
+        File path, used in the log
+
+    Returns
+    -------
+    Tuple[str, str]
+        Decoded text and the encoding used
+    """
+    guess = _bom_encoding(content[:4])
+    if guess.encoding:
+        text = content.decode(guess.encoding)
+    elif content.isascii():
+        guess = EncodingGuess('utf-8', "ASCII only")
+        text = content.decode('ascii')
+    else:
+        try:
+            text = content.decode('utf-8')
+            guess = EncodingGuess('utf-8', "valid UTF-8")
+        except UnicodeDecodeError:
+            guess = _legacy_encoding(set(content.translate(None, _NOT_C1_BYTES)))
+            text = content.decode(guess.encoding)
+    logger.info("Reading %s as %s (%s)", path, guess.encoding, guess.reason)
+    return text, guess.encoding
+
+
+def detect_file_encoding(path: Path) -> str:
+    """Pick the encoding of a file without reading it into memory.
+
+    The file is memory-mapped and checked with ``sniff_encoding``, and the
+    decision is logged.
+
+    Parameters
+    ----------
+    path : Path
+        Path of the file
+
+    Returns
+    -------
+    str
+        Encoding to open the file with
+    """
+    with open(path, 'rb') as f:
+        if f.seek(0, 2) == 0:
+            guess = EncodingGuess('utf-8', "empty file")
+        else:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as content:
+                guess = sniff_encoding(content)
+    logger.info("Reading %s as %s (%s)", path, guess.encoding, guess.reason)
+    return guess.encoding
+
+
+def open_text(path: Path) -> TextIO:
+    """Open a CSV file for reading in its detected encoding.
+
+    Parameters
+    ----------
+    path : Path
+        Path of the file
+
+    Returns
+    -------
+    TextIO
+        File opened with ``newline=''`` for the csv module
+    """
+    return open(path, 'r', newline='', encoding=detect_file_encoding(path))
@@ -0,0 +1,298 @@
+"""Local store of AgileDay time entries for incremental syncing."""
+
+import datetime
+import json
+import logging
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from .agileday import DEFAULT_FETCH_WORKERS, AgileDayClient
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SYNC_TRAILING_DAYS = 7
+
+
+class TimeEntryStore:
+    """SQLite-backed store of time entries keyed by ``timeEntryId``.
+
+    The store remembers which days it has fetched for each status query.
+    A sync refetches only days that could still change and serves all other
+    days locally:
+
+    - days that have never been fetched
+    - days within ``trailing_days`` of today
+    - days holding an entry whose status is not one of ``final_statuses``
+
+    A refetched day replaces everything stored for it, so entries deleted in
+    AgileDay disappear from the store as well.
+    """
+
+    def __init__(self, cache_dir: Path):
+        """Open or create the entry store.
+
+        Parameters
+        ----------
+        cache_dir : Path
+            Directory where the store database is kept
+        """
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        self.path = cache_dir / "time_entries.sqlite3"
+        self._connection = sqlite3.connect(self.path)
+        self._connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                status_query TEXT NOT NULL,
+                time_entry_id TEXT,
+                date TEXT NOT NULL,
+                status TEXT,
+                data TEXT NOT NULL,
+                UNIQUE (status_query, time_entry_id)
+            );
+            CREATE INDEX IF NOT EXISTS entries_by_day ON entries (status_query, date);
+            CREATE TABLE IF NOT EXISTS synced_days (
+                status_query TEXT NOT NULL,
+                date TEXT NOT NULL,
+                synced_at TEXT NOT NULL,
+                PRIMARY KEY (status_query, date)
+            );
+            """
+        )
+        self._connection.commit()
+        logger.debug("Using time entry store %s", self.path)
+
+    def _days_to_refetch(
+        self,
+        days: List[datetime.date],
+        status: str,
+        trailing_days: int,
+        final_statuses: Optional[Set[str]]
+    ) -> List[datetime.date]:
+        """Select the days of a range that have to be fetched from AgileDay.
+
+        Parameters
+        ----------
+        days : List[datetime.date]
+            All days of the requested range
+        status : str
+            Status query the entries are fetched with
+        trailing_days : int
+            Number of most recent days that are always refetched
+        final_statuses : Optional[Set[str]]
+            Entry statuses considered final, or None to skip the status check
+
+        Returns
+        -------
+        List[datetime.date]
+            Days to refetch, in ascending order
+        """
+        first, last = days[0].isoformat(), days[-1].isoformat()
+        synced = {
+            row[0] for row in self._connection.execute(
+                "SELECT date FROM synced_days WHERE status_query = ? AND date BETWEEN ? AND ?",
+                (status, first, last)
+            )
+        }
+        unsettled: Set[str] = set()
+        if final_statuses:
+            placeholders = ", ".join("?" for _ in final_statuses)
+            unsettled = {
+                row[0] for row in self._connection.execute(
+                    f"""
+                    SELECT DISTINCT date FROM entries
+                    WHERE status_query = ? AND date BETWEEN ? AND ?
+                    AND (status IS NULL OR status NOT IN ({placeholders}))
+                    """,
+                    (status, first, last, *sorted(final_statuses))
+                )
+            }
+        trailing_start = datetime.date.today() - datetime.timedelta(days=trailing_days)
+
+        return [
+            day for day in days
+            if day.isoformat() not in synced
+            or day.isoformat() in unsettled
+            or day >= trailing_start
+        ]
+
+    def _store_days(
+        self,
+        days: Iterable[datetime.date],
+        status: str,
+        entries: List[Dict[str, Any]]
+    ) -> None:
+        """Replace the stored entries of the given days with freshly fetched ones.
+
+        Parameters
+        ----------
+        days : Iterable[datetime.date]
+            Days the entries were fetched for
+        status : str
+            Status query the entries were fetched with
+        entries : List[Dict[str, Any]]
+            Entries returned by AgileDay for those days
+        """
+        day_keys = [day.isoformat() for day in days]
+        synced_at = datetime.datetime.now().isoformat(timespec='seconds')
+        with self._connection:
+            self._connection.executemany(
+                "DELETE FROM entries WHERE status_query = ? AND date = ?",
+                [(status, day) for day in day_keys]
+            )
+            self._connection.executemany(
+                """
+                INSERT OR REPLACE INTO entries (status_query, time_entry_id, date, status, data)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                [
+                    (
+                        status,
+                        entry.get('timeEntryId'),
+                        entry.get('date', ''),
+                        entry.get('status'),
+                        json.dumps(entry)
+                    )
+                    for entry in entries
+                ]
+            )
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO synced_days (status_query, date, synced_at) VALUES (?, ?, ?)",
+                [(status, day, synced_at) for day in day_keys]
+            )
+
+    def get_entries(
+        self,
+        start_date: datetime.date,
+        end_date: datetime.date,
+        status: str
+    ) -> List[Dict[str, Any]]:
+        """Read stored entries for a date range.
+
+        Parameters
+        ----------
+        start_date : datetime.date
+            First day of the range (inclusive)
+        end_date : datetime.date
+            Last day of the range (inclusive)
+        status : str
+            Status query the entries were fetched with
+
+        Returns
+        -------
+        List[Dict[str, Any]]
+            Stored entries ordered by date, in the order AgileDay returned them
+        """
+        rows = self._connection.execute(
+            """
+            SELECT data FROM entries
+            WHERE status_query = ? AND date BETWEEN ? AND ?
+            ORDER BY date, seq
+            """,
+            (status, start_date.isoformat(), end_date.isoformat())
+        )
+        return [json.loads(data) for (data,) in rows]
+
+    def sync(
+        self,
+        client: AgileDayClient,
+        start_date: datetime.datetime,
+        end_date: datetime.datetime,
+        status: str = "Submitted",
+        trailing_days: int = DEFAULT_SYNC_TRAILING_DAYS,
+        final_statuses: Optional[Set[str]] = None,
+        fetch_window: Optional[str] = None,
+        fetch_workers: int = DEFAULT_FETCH_WORKERS
+    ) -> List[Dict[str, Any]]:
+        """Bring the store up to date for a range and return its entries.
+
+        Parameters
+        ----------
+        client : AgileDayClient
+            Client used to refetch changed days
+        start_date : datetime.datetime
+            Start date for time entries
+        end_date : datetime.datetime
+            End date for time entries
+        status : str, optional
+            Status of entries to fetch, defaults to "Submitted"
+        trailing_days : int, optional
+            Number of most recent days that are always refetched, defaults to 7
+        final_statuses : Optional[Set[str]], optional
+            Entry statuses considered final; days with other statuses are
+            refetched. Defaults to None, which skips the status check
+        fetch_window : Optional[str], optional
+            Window size passed to ``AgileDayClient.get_time_entries``
+        fetch_workers : int, optional
+            Worker count passed to ``AgileDayClient.get_time_entries``
+
+        Returns
+        -------
+        List[Dict[str, Any]]
+            All entries of the range, served from the store
+        """
+        first_day, last_day = start_date.date(), end_date.date()
+        days = [
+            first_day + datetime.timedelta(days=offset)
+            for offset in range((last_day - first_day).days + 1)
+        ]
+        if not days:
+            return []
+
+        stale_days = self._days_to_refetch(days, status, trailing_days, final_statuses)
+        logger.info(
+            "Entry store sync: %d of %d days need refetching",
+            len(stale_days),
+            len(days)
+        )
+
+        for run_start, run_end in self._consecutive_runs(stale_days):
+            entries = client.get_time_entries(
+                datetime.datetime.combine(run_start, datetime.time.min),
+                datetime.datetime.combine(run_end, datetime.time.min),
+                status,
+                fetch_window=fetch_window,
+                fetch_workers=fetch_workers
+            )
+            run_days = [
+                run_start + datetime.timedelta(days=offset)
+                for offset in range((run_end - run_start).days + 1)
+            ]
+            self._store_days(run_days, status, entries)
+            logger.debug(
+                "Stored %d entries for %s to %s",
+                len(entries),
+                run_start,
+                run_end
+            )
+
+        entries = self.get_entries(first_day, last_day, status)
+        logger.info("Serving %d time entries from the entry store", len(entries))
+        return entries
+
+    @staticmethod
+    def _consecutive_runs(days: List[datetime.date]) -> List[Tuple[datetime.date, datetime.date]]:
+        """Collapse sorted days into inclusive runs of consecutive days.
+
+        Parameters
+        ----------
+        days : List[datetime.date]
+            Days in ascending order
+
+        Returns
+        -------
+        List[Tuple[datetime.date, datetime.date]]
+            Inclusive (first, last) pairs
+        """
+        runs: List[Tuple[datetime.date, datetime.date]] = []
+        for day in days:
+            if runs and day - runs[-1][1] == datetime.timedelta(days=1):
+                runs[-1] = (runs[-1][0], day)
+            else:
+                runs.append((day, day))
+        return runs
+
+    def close(self) -> None:
+        """Close the store database."""
+        self._connection.close()
@@ -0,0 +1,310 @@
+"""Out-of-core grouping of time entries by project and task."""
+
+import heapq
+import logging
+import pickle
+import struct
+import tempfile
+from pathlib import Path
+from types import TracebackType
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Mapping, Optional, Sized, Tuple, Type
+
+from .time_entry import TimeEntry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MEMORY_BUDGET_MB = 256
+
+# Estimated memory of a buffered entry on top of its pickled size: the
+# tuple holding it, the bytes object and the list slot
+ENTRY_OVERHEAD_BYTES = 200
+
+# Maximum number of runs merged at once, so merging never holds more files open
+MERGE_FAN_IN = 64
+
+# Merged file record header: sequence number and pickled entry length
+_RECORD_HEADER = struct.Struct('<QI')
+
+# Run file key header: UTF-8 lengths of the project ID and task, which
+# follow it and precede the record header and pickled entry
+_RUN_KEY_HEADER = struct.Struct('<II')
+
+# Buffered run record: (project ID, task, sequence number, pickled entry)
+RunRecord = Tuple[str, str, int, bytes]
+
+
+class ProjectEntries(Iterable[TimeEntry], Sized):
+    """Entries of one project, read back from the merged file on demand.
+
+    The entries are stored sorted by task. Iterating merges the task
+    groups back into the order the entries were added in, so consumers
+    see the same sequence as with an in-memory list. Only one entry per
+    task is held in memory while iterating, and the object is small enough
+    to be sent to worker processes.
+    """
+
+    __slots__ = ('path', 'project_id', 'task_runs', 'count')
+
+    def __init__(self, path: Path, project_id: str, task_runs: List[Tuple[str, int, int]], count: int):
+        """Create the view.
+
+        Parameters
+        ----------
+        path : Path
+            Path of the merged file
+        project_id : str
+            AgileDay project ID
+        task_runs : List[Tuple[str, int, int]]
+            Task name, file offset and entry count of each task group
+        count : int
+            Number of entries of the project
+        """
+        self.path = path
+        self.project_id = project_id
+        self.task_runs = task_runs
+        self.count = count
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self) -> Iterator[TimeEntry]:
+        readers = [self._read(offset, count) for _, offset, count in self.task_runs]
+        for _, entry in heapq.merge(*readers, key=lambda record: record[0]):
+            yield entry
+
+    def _read(self, offset: int, count: int) -> Iterator[Tuple[int, TimeEntry]]:
+        """Read a task group as (sequence number, entry) pairs."""
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            for _ in range(count):
+                sequence, size = _RECORD_HEADER.unpack(f.read(_RECORD_HEADER.size))
+                yield sequence, pickle.loads(f.read(size))
+
+
+class ExternalGrouping(Mapping[str, ProjectEntries]):
+    """Group time entries by project with bounded memory.
+
+    Entries are added one at a time and buffered, pickled, until the
+    buffer reaches the memory budget. The buffer is then sorted by project
+    ID, task and arrival order and spilled to a temporary run file. ``finish``
+    k-way-merges the runs into one file sorted the same way and indexes the
+    offset of every (project, task) group. At most ``MERGE_FAN_IN`` runs
+    are merged at once; more runs are first merged in passes into fewer,
+    longer runs. The grouping is then a mapping from project ID to
+    ``ProjectEntries``, in order of first appearance, like the
+    ``defaultdict(list)`` it replaces. Memory use is bounded by the budget
+    plus the index.
+
+    Use it as a context manager, or call ``close``, to remove the
+    temporary files::
+
+        with ExternalGrouping(memory_budget_mb=256) as hours_by_project:
+            for entry in entries:
+                hours_by_project.add(entry)
+            hours_by_project.finish()
+    """
+
+    def __init__(self, memory_budget_mb: float = DEFAULT_MEMORY_BUDGET_MB, temp_dir: Optional[Path] = None):
+        """Create the grouping.
+
+        Parameters
+        ----------
+        memory_budget_mb : float, optional
+            Maximum size of the sort buffer in megabytes, defaults to
+            ``DEFAULT_MEMORY_BUDGET_MB``
+        temp_dir : Optional[Path]
+            Directory for the temporary files, defaults to the system
+            temporary directory
+        """
+        self.memory_budget_mb = memory_budget_mb
+        self.memory_budget = int(memory_budget_mb * 1024 * 1024)
+        self._temp_dir = tempfile.TemporaryDirectory(prefix='billable-invoicing-', dir=temp_dir)
+        self._buffer: List[RunRecord] = []
+        self._buffer_bytes = 0
+        self._runs: List[Path] = []
+        self._run_files = 0
+        self._first_seen: Dict[str, int] = {}
+        self._projects: Dict[str, ProjectEntries] = {}
+        self._finished = False
+        self.entry_count = 0
+
+    def __enter__(self) -> 'ExternalGrouping':
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType]
+    ) -> None:
+        self.close()
+
+    def add(self, entry: TimeEntry) -> None:
+        """Add an entry, spilling the buffer when it is full.
+
+        Parameters
+        ----------
+        entry : TimeEntry
+            Parsed time entry with a project ID
+        """
+        if self._finished:
+            raise ValueError("Cannot add entries to a finished grouping")
+        blob = pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL)
+        self._first_seen.setdefault(entry.project_id, self.entry_count)
+        self._buffer.append((entry.project_id, entry.project_task, self.entry_count, blob))
+        self.entry_count += 1
+        self._buffer_bytes += len(blob) + ENTRY_OVERHEAD_BYTES
+        if self._buffer_bytes >= self.memory_budget:
+            self._spill()
+
+    def _spill(self) -> None:
+        """Sort the buffer and write it as a run file."""
+        self._buffer.sort()
+        run = self._write_run(self._buffer)
+        logger.debug("Spilled %d entries (%d bytes) to %s", len(self._buffer), self._buffer_bytes, run)
+        self._runs.append(run)
+        self._buffer = []
+        self._buffer_bytes = 0
+
+    def _write_run(self, records: Iterable[RunRecord]) -> Path:
+        """Write sorted records to a new run file.
+
+        Each record is the key header, the UTF-8 project ID and task, and
+        the entry as in the merged file, so entries are pickled only once.
+        """
+        run = Path(self._temp_dir.name) / f"run-{self._run_files:05d}.bin"
+        self._run_files += 1
+        with run.open('wb') as f:
+            for project_id, task, sequence, blob in records:
+                project_bytes = project_id.encode('utf-8')
+                task_bytes = task.encode('utf-8')
+                f.write(_RUN_KEY_HEADER.pack(len(project_bytes), len(task_bytes)))
+                f.write(project_bytes)
+                f.write(task_bytes)
+                f.write(_RECORD_HEADER.pack(sequence, len(blob)))
+                f.write(blob)
+        return run
+
+    @staticmethod
+    def _read_run(run: Path) -> Iterator[RunRecord]:
+        """Read the records of a run file in order."""
+        with run.open('rb') as f:
+            while True:
+                header = f.read(_RUN_KEY_HEADER.size)
+                if not header:
+                    return
+                project_size, task_size = _RUN_KEY_HEADER.unpack(header)
+                project_id = f.read(project_size).decode('utf-8')
+                task = f.read(task_size).decode('utf-8')
+                sequence, size = _RECORD_HEADER.unpack(f.read(_RECORD_HEADER.size))
+                yield project_id, task, sequence, f.read(size)
+
+    def _merge_runs(self, runs: List[Path]) -> Iterator[RunRecord]:
+        """Merge runs in passes of at most ``MERGE_FAN_IN`` runs.
+
+        Runs are merged into longer runs until at most ``MERGE_FAN_IN`` are
+        left, and the records of those are merged as they are read. Each
+        run file is removed once it has been merged.
+        """
+        passes = 0
+        while len(runs) > MERGE_FAN_IN:
+            merged_runs = []
+            for start in range(0, len(runs), MERGE_FAN_IN):
+                batch = runs[start:start + MERGE_FAN_IN]
+                if len(batch) == 1:
+                    merged_runs.append(batch[0])
+                    continue
+                merged_runs.append(self._write_run(heapq.merge(*(self._read_run(run) for run in batch))))
+                for run in batch:
+                    run.unlink()
+            runs = merged_runs
+            passes += 1
+        if passes:
+            logger.debug("Merged the runs in %d passes into %d runs", passes, len(runs))
+        yield from heapq.merge(*(self._read_run(run) for run in runs))
+        for run in runs:
+            run.unlink()
+
+    def finish(self) -> 'ExternalGrouping':
+        """Merge the runs into the grouped file and build the index.
+
+        Returns
+        -------
+        ExternalGrouping
+            This grouping, ready to be read
+        """
+        if self._finished:
+            return self
+        if self._runs:
+            if self._buffer:
+                self._spill()
+            records: Iterable[RunRecord] = self._merge_runs(self._runs)
+        else:
+            # Everything fit in the budget, merge straight from memory
+            self._buffer.sort()
+            records = self._buffer
+
+        merged = Path(self._temp_dir.name) / "grouped.bin"
+        task_runs: Dict[str, List[Tuple[str, int, int]]] = {}
+        with merged.open('wb') as f:
+            self._write_merged(f, records, task_runs)
+
+        self._buffer = []
+        self._buffer_bytes = 0
+        for project_id in self._first_seen:
+            runs = task_runs[project_id]
+            self._projects[project_id] = ProjectEntries(
+                merged, project_id, runs, sum(count for _, _, count in runs)
+            )
+        self._finished = True
+        logger.info(
+            "Grouped %d entries of %d projects out of core in %d sorted runs (budget %g MB)",
+            self.entry_count,
+            len(self._projects),
+            len(self._runs),
+            self.memory_budget_mb
+        )
+        return self
+
+    @staticmethod
+    def _write_merged(
+        f: BinaryIO,
+        records: Iterable[RunRecord],
+        task_runs: Dict[str, List[Tuple[str, int, int]]]
+    ) -> None:
+        """Write sorted records and index the start and size of each task group."""
+        current: Optional[Tuple[str, str]] = None
+        offset = 0
+        count = 0
+        for project_id, task, sequence, blob in records:
+            if (project_id, task) != current:
+                if current is not None:
+                    task_runs.setdefault(current[0], []).append((current[1], offset, count))
+                current = (project_id, task)
+                offset = f.tell()
+                count = 0
+            f.write(_RECORD_HEADER.pack(sequence, len(blob)))
+            f.write(blob)
+            count += 1
+        if current is not None:
+            task_runs.setdefault(current[0], []).append((current[1], offset, count))
+
+    def _check_finished(self) -> None:
+        if not self._finished:
+            raise ValueError("Call finish() before reading the grouping")
+
+    def __getitem__(self, project_id: str) -> ProjectEntries:
+        self._check_finished()
+        return self._projects[project_id]
+
+    def __iter__(self) -> Iterator[str]:
+        self._check_finished()
+        return iter(self._projects)
+
+    def __len__(self) -> int:
+        self._check_finished()
+        return len(self._projects)
+
+    def close(self) -> None:
+        """Remove the temporary files."""
+        self._temp_dir.cleanup()
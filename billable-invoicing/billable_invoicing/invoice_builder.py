@@ -0,0 +1,473 @@
+"""Build Workday invoices from time entries in a single pass."""
+
+import datetime
+import logging
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from .diagnostics import MissingRateCollector
+from .rate_resolver import RateResolver
+from .time_entry import TimeEntry
+
+logger = logging.getLogger(__name__)
+
+# Namespace of the ConnectIDs, which are uuid5 of the period and invoice group
+CONNECT_ID_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "https://orangit.fi/billing/workday/connect-id")
+
+
+def connect_id(period: str, group_key: str) -> str:
+    """Return the deterministic ConnectID of an invoice.
+
+    Parameters
+    ----------
+    period : str
+        Invoicing period, e.g. "2025-03"
+    group_key : str
+        Invoice group, ``Group invoice`` or ``Invoice Info A2 Ext Id``
+
+    Returns
+    -------
+    str
+        The same ConnectID for the same period and group on every run
+    """
+    return str(uuid.uuid5(CONNECT_ID_NAMESPACE, f"{period}/{group_key}"))
+
+
+def invoice_group_key(customer_info: Dict[str, Any]) -> str:
+    """Return the invoice group of a customer project.
+
+    Parameters
+    ----------
+    customer_info : Dict[str, Any]
+        Customer information
+
+    Returns
+    -------
+    str
+        ``Group invoice`` or, when that is empty, ``Invoice Info A2 Ext Id``
+    """
+    return customer_info.get('Group invoice') or customer_info.get('Invoice Info A2 Ext Id', '')
+
+
+@dataclass
+class InvoiceLine:
+    """Billable hours of one project task on an invoice."""
+    project_id: str
+    project_name: str
+    task: str
+    hours: float
+    rate: float
+    amount: float
+    customer_info: Dict[str, Any]
+
+
+@dataclass
+class Invoice:
+    """An invoice for one invoice group.
+
+    ``lines`` are in processing order, by project and then task. ``rows``
+    are the lines with a non-zero amount, the ones written as R rows,
+    ordered by the first appearance of their task name in the group and
+    then by project. ``customer_info`` is the customer row of the group's
+    first line.
+    """
+    group_key: str
+    connect_id: str
+    customer_info: Dict[str, Any]
+    lines: List[InvoiceLine] = field(default_factory=list)
+    rows: List[InvoiceLine] = field(default_factory=list)
+    hours: float = 0.0
+    amount: float = 0.0
+
+
+@dataclass
+class InvoiceBatch:
+    """All invoices of a run with their totals."""
+    invoices: List[Invoice]
+    processed_project_ids: Set[str]
+    line_count: int
+    row_count: int
+    total_hours: float
+    total_amount: float
+    first_day: Optional[datetime.date]
+    last_day: Optional[datetime.date]
+
+
+class InvoiceBuilder:
+    """Filter, price, group and total billable hours in one traversal.
+
+    For each active customer project the billable entries are filtered by
+    the project's ``included_hours`` setting and summed per task. The tasks
+    of a project are priced in one batch by the rate resolver, and each
+    becomes an ``InvoiceLine`` that is added to
+    the invoice of its group, keyed by ``Group invoice`` or, when that is
+    empty, ``Invoice Info A2 Ext Id``. Line, invoice and batch totals are
+    accumulated as the lines are created, so the result file and the
+    summaries all use the same numbers.
+    """
+
+    def __init__(self, rate_resolver: RateResolver, period: str):
+        """Create the builder.
+
+        Parameters
+        ----------
+        rate_resolver : RateResolver
+            Rate table compiled from the same customer data
+        period : str
+            Invoicing period the ConnectIDs are derived from, e.g. "2025-03"
+        """
+        self.rate_resolver = rate_resolver
+        self.period = period
+
+    def build(
+        self,
+        hours_by_project: Dict[str, List[TimeEntry]],
+        customer_data: Dict[str, Dict[str, Any]]
+    ) -> InvoiceBatch:
+        """Build the invoices.
+
+        Parameters
+        ----------
+        hours_by_project : Dict[str, List[TimeEntry]]
+            Time entries grouped by project ID
+        customer_data : Dict[str, Dict[str, Any]]
+            Active customer data keyed by AgileDay project ID
+
+        Returns
+        -------
+        InvoiceBatch
+            Invoices in order of their first line, with totals
+        """
+        invoices: Dict[str, Invoice] = {}
+        processed_project_ids: Set[str] = set()
+        projects_without_hours: List[str] = []
+        line_count = 0
+        first_day: Optional[datetime.date] = None
+        last_day: Optional[datetime.date] = None
+
+        for project_id, customer_info in customer_data.items():
+            project_hours = hours_by_project.get(project_id)
+            if not project_hours:
+                projects_without_hours.append(
+                    f"Project: {customer_info.get('projectName', 'Unknown')} "
+                    f"(ID: {project_id})"
+                )
+                continue
+
+            # Filter hours based on included_hours setting: 'All' includes all
+            # billable hours, 'Orangit' only hours from Orangit Oy
+            included_hours = customer_info.get('included_hours', '').strip()
+            include_mode = included_hours.lower()
+            if include_mode not in ('all', 'orangit'):
+                logger.warning(
+                    "Unknown included_hours value '%s' for project - Client: %s, Service: %s (ID: %s)",
+                    included_hours,
+                    customer_info.get('Client', 'Unknown'),
+                    customer_info.get('Service name', 'Unknown Service'),
+                    project_id
+                )
+            only_orangit = include_mode == 'orangit'
+
+            # Sum hours per task: task name -> [first entry, hours, entry count]
+            tasks: Dict[str, List[Any]] = {}
+            for entry in project_hours:
+                if not entry.billable:
+                    continue
+
+                # Track first and last day
+                entry_date = entry.date
+                if entry_date:
+                    if first_day is None or entry_date < first_day:
+                        first_day = entry_date
+                    if last_day is None or entry_date > last_day:
+                        last_day = entry_date
+                elif entry.get('date'):
+                    logger.warning(f"Invalid date format in entry: {entry.get('date')}")
+
+                if include_mode == 'all' or (
+                    only_orangit and entry.employee_company.lower() == 'orangit oy'
+                ):
+                    task = tasks.get(entry.project_task)
+                    if task is None:
+                        tasks[entry.project_task] = [entry, entry.hours_from_minutes, 1]
+                    else:
+                        task[1] += entry.hours_from_minutes
+                        task[2] += 1
+
+            logger.debug(
+                "Client: %s, Service: %s (ID: %s), included_hours: %s, entries: %d, tasks: %d",
+                customer_info.get('Client', 'Unknown'),
+                customer_info.get('Service name', 'Unknown Service'),
+                project_id,
+                included_hours,
+                len(project_hours),
+                len(tasks)
+            )
+
+            if not tasks:
+                logger.warning(
+                    "No matching hours after filtering - Client: %s, Service: %s (ID: %s), included_hours: %s",
+                    customer_info.get('Client', 'Unknown'),
+                    customer_info.get('Service name', 'Unknown Service'),
+                    project_id,
+                    included_hours
+                )
+                continue
+
+            group_key = invoice_group_key(customer_info)
+            task_groups = list(tasks.items())
+            rates = self.rate_resolver.price_tasks(
+                project_id, [(first_entry, entry_count) for _, (first_entry, _, entry_count) in task_groups]
+            )
+            processed_project_ids.add(project_id)
+            for (task_name, (first_entry, hours, _)), rate in zip(task_groups, rates):
+                line = InvoiceLine(
+                    project_id=project_id,
+                    project_name=first_entry.project_name,
+                    task=task_name,
+                    hours=hours,
+                    rate=rate,
+                    amount=hours * rate,
+                    customer_info=customer_info
+                )
+                line_count += 1
+                if not group_key:
+                    continue
+                invoice = invoices.get(group_key)
+                if invoice is None:
+                    invoice = invoices[group_key] = Invoice(
+                        group_key=group_key,
+                        connect_id=connect_id(self.period, group_key),
+                        customer_info=customer_info
+                    )
+                invoice.lines.append(line)
+                invoice.hours += line.hours
+                invoice.amount += line.amount
+
+        if projects_without_hours:
+            logger.warning(
+                "No hours found for %d active projects:\n%s",
+                len(projects_without_hours),
+                "\n".join(projects_without_hours)
+            )
+        logger.info("Processed %d billable entries for active customers", line_count)
+
+        for invoice in invoices.values():
+            # Order the rows by task name, then project
+            task_rows: Dict[str, List[InvoiceLine]] = {}
+            for line in invoice.lines:
+                if line.amount != 0:
+                    task_rows.setdefault(line.task, []).append(line)
+            invoice.rows = [line for lines in task_rows.values() for line in lines]
+
+        batch = make_batch(list(invoices.values()), processed_project_ids, first_day, last_day)
+        logger.info(f"Total hours calculation - Found {batch.line_count} entries with {batch.total_hours:.2f} total hours")
+        return batch
+
+
+def make_batch(
+    invoices: List[Invoice],
+    processed_project_ids: Set[str],
+    first_day: Optional[datetime.date],
+    last_day: Optional[datetime.date]
+) -> InvoiceBatch:
+    """Total finished invoices into a batch, in the given order.
+
+    Parameters
+    ----------
+    invoices : List[Invoice]
+        Invoices with their rows
+    processed_project_ids : Set[str]
+        Projects with at least one line
+    first_day : Optional[datetime.date]
+        First day with billable hours
+    last_day : Optional[datetime.date]
+        Last day with billable hours
+
+    Returns
+    -------
+    InvoiceBatch
+        The invoices with their totals
+    """
+    line_count = 0
+    row_count = 0
+    total_hours = 0.0
+    total_amount = 0.0
+    for invoice in invoices:
+        line_count += len(invoice.lines)
+        row_count += len(invoice.rows)
+        total_hours += invoice.hours
+        total_amount += invoice.amount
+    return InvoiceBatch(
+        invoices=invoices,
+        processed_project_ids=processed_project_ids,
+        line_count=line_count,
+        row_count=row_count,
+        total_hours=total_hours,
+        total_amount=total_amount,
+        first_day=first_day,
+        last_day=last_day
+    )
+
+
+def shard_customer_data(
+    customer_data: Dict[str, Dict[str, Any]],
+    hours_by_project: Dict[str, List[TimeEntry]],
+    shard_count: int
+) -> List[Dict[str, Dict[str, Any]]]:
+    """Split the customer projects into shards of whole invoice groups.
+
+    Groups are assigned, largest first by entry count, to the shard with
+    the fewest entries so far. Every shard keeps the projects in their
+    original order, and the assignment only depends on the input.
+
+    Parameters
+    ----------
+    customer_data : Dict[str, Dict[str, Any]]
+        Active customer data keyed by AgileDay project ID
+    hours_by_project : Dict[str, List[TimeEntry]]
+        Time entries grouped by project ID
+    shard_count : int
+        Maximum number of shards
+
+    Returns
+    -------
+    List[Dict[str, Dict[str, Any]]]
+        Non-empty customer data shards
+    """
+    # Invoice group -> [entry count, first position, project IDs]
+    groups: Dict[str, List[Any]] = {}
+    for position, (project_id, customer_info) in enumerate(customer_data.items()):
+        group = groups.setdefault(invoice_group_key(customer_info), [0, position, []])
+        group[0] += len(hours_by_project.get(project_id, ()))
+        group[2].append(project_id)
+
+    loads = [0] * shard_count
+    shard_of: Dict[str, int] = {}
+    for entry_count, _, project_ids in sorted(groups.values(), key=lambda group: (-group[0], group[1])):
+        shard = loads.index(min(loads))
+        loads[shard] += entry_count
+        for project_id in project_ids:
+            shard_of[project_id] = shard
+
+    shards: List[Dict[str, Dict[str, Any]]] = [{} for _ in range(shard_count)]
+    for project_id, customer_info in customer_data.items():
+        shards[shard_of[project_id]][project_id] = customer_info
+    return [shard for shard in shards if shard]
+
+
+def _build_shard(
+    hours_by_project: Dict[str, List[TimeEntry]],
+    customer_data: Dict[str, Dict[str, Any]],
+    internal_rates: Dict[Tuple[str, str], float],
+    period: str
+) -> Tuple[InvoiceBatch, MissingRateCollector]:
+    """Build the invoices of one shard in a worker process."""
+    missing_rates = MissingRateCollector()
+    rate_resolver = RateResolver(customer_data, internal_rates, missing_rates)
+    batch = InvoiceBuilder(rate_resolver, period).build(hours_by_project, customer_data)
+    return batch, missing_rates
+
+
+def merge_batches(
+    batches: Sequence[InvoiceBatch],
+    customer_data: Dict[str, Dict[str, Any]]
+) -> InvoiceBatch:
+    """Merge shard batches into the batch a serial build would return.
+
+    Invoices are ordered by the position of the project of their first
+    line in the customer data, which is the serial order, and the totals
+    are summed again in that order.
+
+    Parameters
+    ----------
+    batches : Sequence[InvoiceBatch]
+        Batches built from shards of the customer data
+    customer_data : Dict[str, Dict[str, Any]]
+        The complete customer data the shards were split from
+
+    Returns
+    -------
+    InvoiceBatch
+        Merged batch
+    """
+    position = {project_id: index for index, project_id in enumerate(customer_data)}
+    invoices = sorted(
+        (invoice for batch in batches for invoice in batch.invoices),
+        key=lambda invoice: position[invoice.lines[0].project_id]
+    )
+    first_days = [batch.first_day for batch in batches if batch.first_day]
+    last_days = [batch.last_day for batch in batches if batch.last_day]
+    return make_batch(
+        invoices,
+        set().union(*(batch.processed_project_ids for batch in batches)),
+        min(first_days) if first_days else None,
+        max(last_days) if last_days else None
+    )
+
+
+def build_invoices(
+    hours_by_project: Dict[str, List[TimeEntry]],
+    customer_data: Dict[str, Dict[str, Any]],
+    internal_rates: Dict[Tuple[str, str], float],
+    missing_rates: MissingRateCollector,
+    period: str,
+    workers: int = 1
+) -> InvoiceBatch:
+    """Build the invoices, optionally sharded across worker processes.
+
+    With more than one worker the invoice groups are split into shards,
+    each built by ``InvoiceBuilder`` in a process pool, and the shards are
+    merged back in the serial order. ConnectIDs do not depend on the
+    process building the invoice, so the result is the same as a serial
+    build.
+
+    Parameters
+    ----------
+    hours_by_project : Dict[str, List[TimeEntry]]
+        Time entries grouped by project ID
+    customer_data : Dict[str, Dict[str, Any]]
+        Active customer data keyed by AgileDay project ID
+    internal_rates : Dict[Tuple[str, str], float]
+        Internal rates keyed by project ID and task name
+    missing_rates : MissingRateCollector
+        Missing rates of this run
+    period : str
+        Invoicing period the ConnectIDs are derived from, e.g. "2025-03"
+    workers : int, optional
+        Number of worker processes, defaults to 1 (build in this process)
+
+    Returns
+    -------
+    InvoiceBatch
+        Invoices in order of their first line, with totals
+    """
+    shards = shard_customer_data(customer_data, hours_by_project, workers) if workers > 1 else []
+    if len(shards) <= 1:
+        rate_resolver = RateResolver(customer_data, internal_rates, missing_rates)
+        return InvoiceBuilder(rate_resolver, period).build(hours_by_project, customer_data)
+
+    logger.info("Building invoices in %d worker processes", len(shards))
+    with ProcessPoolExecutor(max_workers=len(shards)) as pool:
+        futures = [
+            pool.submit(
+                _build_shard,
+                {project_id: hours_by_project[project_id] for project_id in shard if project_id in hours_by_project},
+                shard,
+                {key: rate for key, rate in internal_rates.items() if key[0] in shard},
+                period
+            )
+            for shard in shards
+        ]
+        results = [future.result() for future in futures]
+
+    for _, shard_missing_rates in results:
+        missing_rates.merge(shard_missing_rates)
+    batch = merge_batches([shard_batch for shard_batch, _ in results], customer_data)
+    logger.info(
+        "Merged %d invoices with %d entries and %.2f total hours from %d shards",
+        len(batch.invoices), batch.line_count, batch.total_hours, len(shards)
+    )
+    return batch
@@ -0,0 +1,311 @@
+"""Per-group fingerprints for incremental invoice regeneration."""
+
+import datetime
+import functools
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .diagnostics import MissingRate
+from .invoice_builder import Invoice, InvoiceLine, invoice_group_key
+from .time_entry import TimeEntry
+
+logger = logging.getLogger(__name__)
+
+FINGERPRINT_VERSION = 1
+
+# Modules whose code decides how invoice groups are built and rendered
+BUILD_MODULES = (
+    'diagnostics',
+    'invoice_builder',
+    'invoice_cache',
+    'rate_resolver',
+    'time_entry',
+    'workday_file',
+    'workday_transformer',
+)
+
+
+@functools.lru_cache(maxsize=1)
+def build_code_digest() -> str:
+    """Digest the source of ``BUILD_MODULES``.
+
+    Part of every fingerprint, so cached groups are rebuilt after any
+    change to the rate or rendering logic, without bumping
+    ``FINGERPRINT_VERSION`` by hand.
+
+    Returns
+    -------
+    str
+        SHA-256 of the module sources
+    """
+    digest = hashlib.sha256()
+    package_dir = Path(__file__).parent
+    for module in BUILD_MODULES:
+        digest.update(module.encode('utf-8') + b"\0")
+        digest.update((package_dir / f"{module}.py").read_bytes())
+    return digest.hexdigest()
+
+
+@dataclass
+class GroupFingerprint:
+    """Hash of everything an invoice group is built from."""
+    group_key: str
+    project_ids: List[str]
+    fingerprint: str
+    first_day: Optional[datetime.date]
+    last_day: Optional[datetime.date]
+
+
+@dataclass
+class CachedGroup:
+    """An invoice group as built by an earlier run.
+
+    ``invoice`` is None for groups without invoice lines, including the
+    projects without an invoice group. ``rendered_rows`` are the fields of
+    the invoice's R rows as written to the result file.
+    """
+    fingerprint: str
+    invoice: Optional[Invoice]
+    rendered_rows: List[List[str]] = field(default_factory=list)
+    processed_project_ids: List[str] = field(default_factory=list)
+    misses: List[MissingRate] = field(default_factory=list)
+
+
+def fingerprint_groups(
+    hours_by_project: Dict[str, List[TimeEntry]],
+    customer_data: Dict[str, Dict[str, Any]],
+    internal_rates: Dict[Tuple[str, str], float],
+    context: str
+) -> Dict[str, GroupFingerprint]:
+    """Fingerprint the inputs of every invoice group.
+
+    The fingerprint of a group covers, for each of its projects in order,
+    the customer row, the internal rates of the project and the fields of
+    its entries that invoicing reads, plus ``context`` and the digest of the
+    invoice building code. Any change to them changes the fingerprint; changes to other entry fields, e.g. the
+    description, do not. The first and last day with billable hours are
+    collected in the same pass.
+
+    Parameters
+    ----------
+    hours_by_project : Dict[str, List[TimeEntry]]
+        Time entries grouped by project ID
+    customer_data : Dict[str, Dict[str, Any]]
+        Active customer data keyed by AgileDay project ID
+    internal_rates : Dict[Tuple[str, str], float]
+        Internal rates keyed by project ID and task name
+    context : str
+        Settings shared by all groups that change the output, e.g. the
+        invoicing period
+
+    Returns
+    -------
+    Dict[str, GroupFingerprint]
+        Fingerprints by invoice group, in order of first project
+    """
+    rates_by_project: Dict[str, List[Tuple[str, float]]] = {}
+    for (project_id, task), rate in internal_rates.items():
+        rates_by_project.setdefault(project_id, []).append((task, rate))
+
+    hashers: Dict[str, Any] = {}
+    groups: Dict[str, GroupFingerprint] = {}
+    for project_id, customer_info in customer_data.items():
+        group_key = invoice_group_key(customer_info)
+        group = groups.get(group_key)
+        if group is None:
+            group = groups[group_key] = GroupFingerprint(group_key, [], '', None, None)
+            hashers[group_key] = hashlib.sha256(
+                f"{FINGERPRINT_VERSION}\0{build_code_digest()}\0{context}\0{group_key}".encode('utf-8')
+            )
+        group.project_ids.append(project_id)
+        hasher = hashers[group_key]
+        hasher.update(b"\0project\0")
+        hasher.update(json.dumps([project_id, sorted(customer_info.items())]).encode('utf-8'))
+        hasher.update(repr(sorted(rates_by_project.get(project_id, ()))).encode('utf-8'))
+        for entry in hours_by_project.get(project_id, ()):
+            hasher.update(repr((
+                entry.billable,
+                entry.date,
+                entry.project_task,
+                entry.project_name,
+                entry.employee_company,
+                entry.minutes,
+                entry.task_hourly_price
+            )).encode('utf-8'))
+            if entry.billable and entry.date:
+                if group.first_day is None or entry.date < group.first_day:
+                    group.first_day = entry.date
+                if group.last_day is None or entry.date > group.last_day:
+                    group.last_day = entry.date
+
+    for group_key, group in groups.items():
+        group.fingerprint = hashers[group_key].hexdigest()
+    return groups
+
+
+class InvoiceCache:
+    """Fingerprints and built invoices of a result file's invoice groups.
+
+    The cache is a JSON file next to the result file. It holds, per
+    invoice group, the fingerprint of the group's inputs, the invoice lines
+    and the rendered R rows, so a rerun only rebuilds the groups whose
+    fingerprint changed. Customer rows are not stored; they are taken from
+    the current customer data, which the fingerprint covers.
+    """
+
+    def __init__(self, path: Path):
+        """Create the cache.
+
+        Parameters
+        ----------
+        path : Path
+            Path of the fingerprint file
+        """
+        self.path = Path(path)
+
+    @classmethod
+    def for_result_file(cls, result_file_path: Path) -> 'InvoiceCache':
+        """Return the cache of a result file, e.g. ``result.fingerprints.json``.
+
+        Parameters
+        ----------
+        result_file_path : Path
+            Path of the Workday result file
+
+        Returns
+        -------
+        InvoiceCache
+            Cache stored next to the result file
+        """
+        result_file_path = Path(result_file_path)
+        return cls(result_file_path.with_name(f"{result_file_path.stem}.fingerprints.json"))
+
+    def load(self, customer_data: Dict[str, Dict[str, Any]]) -> Dict[str, CachedGroup]:
+        """Load the groups of the previous run.
+
+        A missing, unreadable or outdated file is treated as empty.
+
+        Parameters
+        ----------
+        customer_data : Dict[str, Dict[str, Any]]
+            Active customer data keyed by AgileDay project ID, the customer
+            rows of the invoices are taken from it
+
+        Returns
+        -------
+        Dict[str, CachedGroup]
+            Cached groups by invoice group
+        """
+        try:
+            with self.path.open('r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable invoice fingerprints %s: %s", self.path, str(e))
+            return {}
+        if data.get('version') != FINGERPRINT_VERSION:
+            logger.info("Ignoring invoice fingerprints %s of another version", self.path)
+            return {}
+
+        groups: Dict[str, CachedGroup] = {}
+        for group_key, group in data.get('groups', {}).items():
+            invoice = None
+            if group.get('invoice') is not None:
+                invoice = self._invoice_from_json(group_key, group['invoice'], customer_data)
+                if invoice is None:
+                    continue
+            groups[group_key] = CachedGroup(
+                fingerprint=group['fingerprint'],
+                invoice=invoice,
+                rendered_rows=group.get('rendered_rows', []),
+                processed_project_ids=group.get('processed_project_ids', []),
+                misses=[MissingRate(*miss) for miss in group.get('misses', [])]
+            )
+        logger.debug("Loaded fingerprints of %d invoice groups from %s", len(groups), self.path)
+        return groups
+
+    def save(self, groups: Dict[str, CachedGroup]) -> None:
+        """Write the groups of this run atomically.
+
+        Parameters
+        ----------
+        groups : Dict[str, CachedGroup]
+            Groups by invoice group
+        """
+        data = {
+            'version': FINGERPRINT_VERSION,
+            'groups': {
+                group_key: {
+                    'fingerprint': group.fingerprint,
+                    'invoice': self._invoice_to_json(group.invoice) if group.invoice else None,
+                    'rendered_rows': group.rendered_rows,
+                    'processed_project_ids': group.processed_project_ids,
+                    'misses': [
+                        [miss.kind, miss.project_id, miss.task, miss.client, miss.service, miss.count, miss.in_report]
+                        for miss in group.misses
+                    ]
+                }
+                for group_key, group in groups.items()
+            }
+        }
+        try:
+            fd, temp_name = tempfile.mkstemp(dir=self.path.parent, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(data, f)
+                os.replace(temp_name, self.path)
+            except BaseException:
+                os.unlink(temp_name)
+                raise
+        except OSError as e:
+            logger.warning("Could not write invoice fingerprints %s: %s", self.path, str(e))
+            return
+        logger.debug("Wrote fingerprints of %d invoice groups to %s", len(groups), self.path)
+
+    @staticmethod
+    def _invoice_to_json(invoice: Invoice) -> Dict[str, Any]:
+        """Serialize an invoice without its customer rows."""
+        positions = {id(line): index for index, line in enumerate(invoice.lines)}
+        return {
+            'connect_id': invoice.connect_id,
+            'hours': invoice.hours,
+            'amount': invoice.amount,
+            'lines': [
+                [line.project_id, line.project_name, line.task, line.hours, line.rate, line.amount]
+                for line in invoice.lines
+            ],
+            # Rows are a reordered subset of the lines
+            'rows': [positions[id(line)] for line in invoice.rows]
+        }
+
+    @staticmethod
+    def _invoice_from_json(
+        group_key: str,
+        data: Dict[str, Any],
+        customer_data: Dict[str, Dict[str, Any]]
+    ) -> Optional[Invoice]:
+        """Rebuild a cached invoice with the current customer rows."""
+        lines = []
+        for project_id, project_name, task, hours, rate, amount in data['lines']:
+            customer_info = customer_data.get(project_id)
+            if customer_info is None:
+                return None
+            lines.append(InvoiceLine(project_id, project_name, task, hours, rate, amount, customer_info))
+        if not lines:
+            return None
+        return Invoice(
+            group_key=group_key,
+            connect_id=data['connect_id'],
+            customer_info=lines[0].customer_info,
+            lines=lines,
+            rows=[lines[index] for index in data['rows']],
+            hours=data['hours'],
+            amount=data['amount']
+        )
@@ -0,0 +1,208 @@
+"""Monthly utilization cubes persisted between runs."""
+
+import datetime
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from .utilization_cube import UtilizationCube
+
+logger = logging.getLogger(__name__)
+
+# Bump when the file layout or the cube semantics change so that old months are rebuilt
+CUBE_FILE_VERSION = 1
+
+# Days after the end of a month during which late hours are still expected
+DEFAULT_SETTLE_DAYS = 14
+
+# Stored in place of a missing first or last day
+_NO_DAY = -1
+
+
+def month_key(day: datetime.date) -> str:
+    """Return the month of a date as ``YYYY-MM``."""
+    return day.strftime('%Y-%m')
+
+
+def trailing_months(end_date: datetime.date, count: int) -> List[Tuple[datetime.date, datetime.date]]:
+    """Return the first and last day of the months of a rolling report.
+
+    Parameters
+    ----------
+    end_date : datetime.date
+        Last day of the report
+    count : int
+        Number of calendar months, including the month of ``end_date``
+
+    Returns
+    -------
+    List[Tuple[datetime.date, datetime.date]]
+        Oldest month first; the last month ends at ``end_date``
+    """
+    months: List[Tuple[datetime.date, datetime.date]] = []
+    month_end = end_date
+    for _ in range(count):
+        month_start = month_end.replace(day=1)
+        months.append((month_start, month_end))
+        month_end = month_start - datetime.timedelta(days=1)
+    months.reverse()
+    return months
+
+
+def is_settled(month_end: datetime.date, today: datetime.date, settle_days: int) -> bool:
+    """Return whether the hours of a month are final enough to store.
+
+    Parameters
+    ----------
+    month_end : datetime.date
+        Last day of the month in the report
+    today : datetime.date
+        Date of the run
+    settle_days : int
+        Days after the end of a month during which its hours may still change
+
+    Returns
+    -------
+    bool
+        True when ``month_end`` is the last day of its calendar month and
+        more than ``settle_days`` days before ``today``
+    """
+    complete = (month_end + datetime.timedelta(days=1)).day == 1
+    return complete and (today - month_end).days > settle_days
+
+
+class MonthlyCubeStore:
+    """Utilization cubes of settled months, one ``.npz`` file per month.
+
+    A month is stored as ``utilization-YYYY-MM.npz`` with the cube arrays
+    and labels, and with the context it was built in, e.g. a digest of
+    the customer data, roles and API source. A stored month is only used
+    when the context matches, so changing the inputs rebuilds it. Callers
+    only store months whose hours have settled, see ``is_settled``.
+    """
+
+    def __init__(self, directory: Path):
+        """Create the store.
+
+        Parameters
+        ----------
+        directory : Path
+            Directory of the month files, created when the first month is
+            saved
+        """
+        self.directory = Path(directory)
+
+    def path(self, month: str) -> Path:
+        """Return the file of a month, e.g. ``utilization-2025-03.npz``."""
+        return self.directory / f"utilization-{month}.npz"
+
+    def load(self, month: str, context: str) -> Optional[UtilizationCube]:
+        """Load a stored month.
+
+        A missing, unreadable or outdated file is treated as missing.
+
+        Parameters
+        ----------
+        month : str
+            Month as ``YYYY-MM``
+        context : str
+            Context the month must have been built in
+
+        Returns
+        -------
+        Optional[UtilizationCube]
+            Cube of the month, or None when it has to be built
+        """
+        path = self.path(month)
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if int(data['version']) != CUBE_FILE_VERSION or str(data['context']) != context:
+                    logger.info("Ignoring stored utilization of %s built from other inputs", month)
+                    return None
+                first_day, last_day = (
+                    datetime.date.fromordinal(day) if day != _NO_DAY else None
+                    for day in data['days'].tolist()
+                )
+                return UtilizationCube(
+                    projects=data['projects'].tolist(),
+                    project_names=data['project_names'].tolist(),
+                    project_rates=data['project_rates'].tolist(),
+                    tasks=data['tasks'].tolist(),
+                    employees=data['employees'].tolist(),
+                    roles=data['roles'].tolist(),
+                    project_tasks=[tuple(pair) for pair in data['project_tasks'].tolist()],
+                    project_task_names=data['project_task_names'].tolist(),
+                    project_task_rates=data['project_task_rates'].tolist(),
+                    project=data['project'],
+                    task=data['task'],
+                    employee=data['employee'],
+                    role=data['role'],
+                    week=data['week'],
+                    billable=data['billable'],
+                    minutes=data['minutes'],
+                    euros=data['euros'],
+                    first_day=first_day,
+                    last_day=last_day
+                )
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("Ignoring unreadable stored utilization %s: %s", path, str(e))
+            return None
+
+    def save(self, month: str, context: str, cube: UtilizationCube) -> None:
+        """Write the cube of a month atomically.
+
+        Parameters
+        ----------
+        month : str
+            Month as ``YYYY-MM``
+        context : str
+            Context the month was built in
+        cube : UtilizationCube
+            Cube of the month
+        """
+        path = self.path(month)
+        arrays = {
+            'version': np.array(CUBE_FILE_VERSION),
+            'context': np.array(context),
+            'days': np.array([
+                day.toordinal() if day is not None else _NO_DAY
+                for day in (cube.first_day, cube.last_day)
+            ], dtype=np.int64),
+            'projects': np.array(cube.projects, dtype=str),
+            'project_names': np.array(cube.project_names, dtype=str),
+            'project_rates': np.array(cube.project_rates, dtype=np.float64),
+            'tasks': np.array(cube.tasks, dtype=str),
+            'employees': np.array(cube.employees, dtype=str),
+            'roles': np.array(cube.roles, dtype=str),
+            'project_tasks': np.array(cube.project_tasks, dtype=np.int32).reshape(len(cube.project_tasks), 2),
+            'project_task_names': np.array(cube.project_task_names, dtype=str),
+            'project_task_rates': np.array(cube.project_task_rates, dtype=np.float64),
+            'project': cube.project,
+            'task': cube.task,
+            'employee': cube.employee,
+            'role': cube.role,
+            'week': cube.week,
+            'billable': cube.billable,
+            'minutes': cube.minutes,
+            'euros': cube.euros
+        }
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            fd, temp_name = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    np.savez_compressed(f, **arrays)
+                os.replace(temp_name, path)
+            except BaseException:
+                os.unlink(temp_name)
+                raise
+        except OSError as e:
+            logger.warning("Could not store utilization of %s: %s", month, str(e))
+            return
+        logger.info("Stored utilization of %s (%d cells) in %s", month, len(cube), path)
@@ -0,0 +1,405 @@
+"""Columnar project summaries computed with pandas."""
+
+import logging
+from operator import attrgetter
+from typing import Any, Dict, Iterable, List, Sequence, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .time_entry import TimeEntry
+from .transformer import ProjectSummary, Rollup, SummaryAggregator, TimeEntryTransformer
+
+logger = logging.getLogger(__name__)
+
+# Frame columns holding group keys, with the TimeEntry attribute they come from
+KEY_COLUMNS: Tuple[Tuple[str, str], ...] = (
+    ('customerName', 'customer_name'),
+    ('projectName', 'project_name'),
+    ('projectTask', 'project_task'),
+    ('projectId', 'project_id'),
+)
+PROJECT_KEYS = ('customerName', 'projectName')
+TASK_KEYS = ('customerName', 'projectName', 'projectTask', 'projectId')
+
+
+def build_frame(entries: Sequence[TimeEntry]) -> pd.DataFrame:
+    """Build a DataFrame with one row per time entry.
+
+    Key columns are categorical with categories in order of first
+    appearance, so their codes can be combined into group keys cheaply.
+
+    Parameters
+    ----------
+    entries : Sequence[TimeEntry]
+        Parsed time entries
+
+    Returns
+    -------
+    pd.DataFrame
+        Columns ``customerName``, ``projectName``, ``projectTask``,
+        ``projectId``, ``billable``, ``external``, ``hours``, ``rate`` and
+        ``amount``
+    """
+    count = len(entries)
+    columns = {}
+    for column, attribute in KEY_COLUMNS:
+        values = np.fromiter(map(attrgetter(attribute), entries), dtype=object, count=count)
+        codes, uniques = pd.factorize(values)
+        columns[column] = pd.Categorical.from_codes(codes, categories=pd.Index(uniques, dtype=object))
+    columns['billable'] = np.fromiter(map(attrgetter('billable'), entries), dtype=bool, count=count)
+    columns['external'] = np.fromiter(
+        (entry.get('projectType') == 'External' for entry in entries), dtype=bool, count=count
+    )
+    columns['hours'] = np.fromiter(map(attrgetter('hours'), entries), dtype=float, count=count)
+
+    # Task rate, falling back to the opening rate, with the truthiness of TimeEntry.hourly_rate
+    task_prices = np.fromiter(map(attrgetter('task_hourly_price'), entries), dtype=object, count=count)
+    opening_prices = np.fromiter(map(attrgetter('opening_hourly_price'), entries), dtype=object, count=count)
+    rates = np.where(opening_prices.astype(bool), opening_prices, 0.0)
+    columns['rate'] = np.where(task_prices.astype(bool), task_prices, rates).astype(float)
+    frame = pd.DataFrame(columns)
+    frame['amount'] = frame['hours'] * frame['rate']
+    return frame
+
+
+def group_codes(frame: pd.DataFrame, keys: Sequence[str]) -> Tuple[np.ndarray, int]:
+    """Number the groups of the key columns in order of first appearance.
+
+    Parameters
+    ----------
+    frame : pd.DataFrame
+        Frame from ``build_frame``, or a subset of one
+    keys : Sequence[str]
+        Categorical key columns
+
+    Returns
+    -------
+    Tuple[np.ndarray, int]
+        Group code of every row, and the number of groups
+    """
+    codes = np.zeros(len(frame), dtype=np.int64)
+    size = 1
+    for key in keys:
+        column = frame[key].cat
+        # Both codes are below the row count, so the combined key cannot overflow
+        codes, uniques = pd.factorize(codes * len(column.categories) + column.codes.to_numpy())
+        size = len(uniques)
+    return codes, size
+
+
+def weighted_rate(
+    old_totals: np.ndarray,
+    amounts: np.ndarray,
+    totals: np.ndarray,
+    rates: np.ndarray
+) -> float:
+    """Replay the running weighted hourly rate over the rated rows of a group.
+
+    Returns exactly what updating the rate row by row gives, including the
+    rounding of every step.
+
+    Parameters
+    ----------
+    old_totals : np.ndarray
+        Hours of the group before each rated row
+    amounts : np.ndarray
+        Hours times rate of each rated row
+    totals : np.ndarray
+        Hours of the group including each rated row
+    rates : np.ndarray
+        Hourly rate of each rated row
+
+    Returns
+    -------
+    float
+        Hourly rate after the last rated row
+    """
+    # With a single rate, check in one step that every row keeps the running rate at it
+    rate = rates[0]
+    if (rates == rate).all() and (totals > 0).all():
+        previous = np.full(len(rates), rate)
+        previous[0] = 0.0
+        with np.errstate(all='ignore'):
+            if ((old_totals * previous + amounts) / totals == rate).all():
+                return rate.item()
+
+    hourly_rate = 0.0
+    for old_total, amount, total in zip(old_totals.tolist(), amounts.tolist(), totals.tolist()):
+        hourly_rate = (old_total * hourly_rate + amount) / total if total > 0 else 0
+    return hourly_rate
+
+
+def _present_project_ids(frame: pd.DataFrame) -> Set[str]:
+    """Return the non-empty project IDs occurring in a frame or a subset of one."""
+    project_ids = frame['projectId']
+    present = set(project_ids.cat.categories[np.unique(project_ids.cat.codes.to_numpy())])
+    present.discard('')
+    return present
+
+
+class PandasSummaryAggregator(SummaryAggregator):
+    """Rollups of a fetch-hours run computed from the DataFrame of the entries."""
+
+    def __init__(self, transformer: 'PandasTimeEntryTransformer'):
+        """Initialize empty rollups.
+
+        Parameters
+        ----------
+        transformer : PandasTimeEntryTransformer
+            Transformer holding the frames of the entry lists
+        """
+        super().__init__()
+        self._transformer = transformer
+        self._entries: Sequence[TimeEntry] = []
+
+    def consume(self, entries: Iterable[TimeEntry]) -> 'PandasSummaryAggregator':
+        """
+        Add entries to the rollups, building their frame.
+
+        Parameters
+        ----------
+        entries : Iterable[TimeEntry]
+            Parsed time entries
+
+        Returns
+        -------
+        PandasSummaryAggregator
+            The aggregator itself, for chaining
+        """
+        if self._entries:
+            entries = [*self._entries, *entries]
+        elif not isinstance(entries, Sequence):
+            entries = list(entries)
+        self._entries = entries
+
+        frame = self._transformer._get_frame(entries)
+        self.total_count = len(frame)
+        self.external_count = int(frame['external'].sum())
+        self.billable_count = int(frame['billable'].sum())
+        self.project_ids = _present_project_ids(frame)
+        return self
+
+    def complete(self) -> Rollup:
+        """
+        Return the summaries of all entries.
+
+        Returns
+        -------
+        Rollup
+            Customer/project and customer/project/task summaries of all entries
+        """
+        project_summaries, _ = self._transformer._summarize(self._entries, by_task=False)
+        task_summaries, projects_with_hours = self._transformer._summarize(self._entries, by_task=True)
+        return Rollup(project_summaries, task_summaries, projects_with_hours)
+
+    def filtered(self, project_data: Dict[str, Dict[str, Any]]) -> Tuple[List[TimeEntry], Rollup]:
+        """
+        Return the billable entries of known projects and their summaries.
+
+        Parameters
+        ----------
+        project_data : Dict[str, Dict[str, Any]]
+            Dictionary of project data keyed by project ID
+
+        Returns
+        -------
+        Tuple[List[TimeEntry], Rollup]
+            Filtered entries in their original order, and their summaries
+        """
+        filtered = self._transformer.filter_entries(self._entries, '', project_data)
+        project_summaries, _ = self._transformer._summarize(filtered, by_task=False)
+        task_summaries, projects_with_hours = self._transformer._summarize(filtered, by_task=True)
+        return filtered, Rollup(project_summaries, task_summaries, projects_with_hours)
+
+
+class PandasTimeEntryTransformer(TimeEntryTransformer):
+    """Compute project summaries with vectorised operations on one DataFrame.
+
+    Produces exactly the same summaries as ``TimeEntryTransformer``. The
+    frame is built once from the complete entry list; the list returned by
+    ``filter_entries`` is backed by a subset of it, so all summaries of a run
+    share one frame. Frames are matched to entry lists by identity, so pass
+    the same list objects and do not modify them in between.
+
+    Hours and amounts are summed per group with ``np.add.accumulate``, which
+    adds in row order like the Python loop, and the weighted hourly rate is
+    replayed over the rated rows of each group, so every value is bitwise
+    identical to the pure Python engine.
+    """
+
+    def __init__(self):
+        """Initialize the transformer with an empty frame cache."""
+        super().__init__()
+        self._frames: List[Tuple[Sequence[TimeEntry], pd.DataFrame]] = []
+
+    def _get_frame(self, entries: Iterable[TimeEntry]) -> pd.DataFrame:
+        """Return the frame of an entry list, building it on first use."""
+        for frame_entries, frame in self._frames:
+            if frame_entries is entries:
+                return frame
+        if not isinstance(entries, Sequence):
+            entries = list(entries)
+        frame = build_frame(entries)
+        logger.debug("Built summary frame of %d entries", len(frame))
+        self._remember_frame(entries, frame)
+        return frame
+
+    def _remember_frame(self, entries: Sequence[TimeEntry], frame: pd.DataFrame) -> None:
+        """Cache the frame of an entry list, keeping the complete and filtered frames."""
+        self._frames = [*self._frames[-1:], (entries, frame)]
+
+    def aggregate(self, entries: Iterable[TimeEntry]) -> PandasSummaryAggregator:
+        """
+        Compute every rollup of the entries from one DataFrame.
+
+        Parameters
+        ----------
+        entries : Iterable[TimeEntry]
+            Parsed time entries from AgileDay
+
+        Returns
+        -------
+        PandasSummaryAggregator
+            Counts, project IDs and summaries of the entries
+        """
+        return PandasSummaryAggregator(self).consume(entries)
+
+    def filter_entries(
+        self,
+        entries: Iterable[TimeEntry],
+        company: str,
+        project_data: Dict[str, Dict[str, Any]]
+    ) -> List[TimeEntry]:
+        """
+        Filter time entries based on billable status.
+
+        Entries are selected on the frame of all entries, and the frame of
+        the filtered entries is a subset of it instead of being built again.
+
+        Parameters
+        ----------
+        entries : Iterable[TimeEntry]
+            Parsed time entries from AgileDay
+        company : str
+            Unused parameter, kept for backward compatibility
+        project_data : Dict[str, Dict[str, Any]]
+            Dictionary of project data keyed by project ID
+
+        Returns
+        -------
+        List[TimeEntry]
+            Filtered list of time entries
+        """
+        if not isinstance(entries, Sequence):
+            entries = list(entries)
+        frame = self._get_frame(entries)
+
+        project_ids = frame['projectId']
+        known = (project_ids.isin(list(project_data)) & (project_ids != '')).to_numpy()
+        if logger.isEnabledFor(logging.DEBUG):
+            for index in np.flatnonzero(~known).tolist():
+                logger.debug(
+                    "Skipping entry - no project data found for ID: %s",
+                    entries[index].project_id
+                )
+
+        selected = known & frame['billable'].to_numpy()
+        filtered = [entries[index] for index in np.flatnonzero(selected).tolist()]
+        self._remember_frame(filtered, frame[selected])
+
+        logger.info(
+            "Filtered %d entries down to %d billable entries",
+            len(entries),
+            len(filtered)
+        )
+        return filtered
+
+    def _summarize(
+        self,
+        entries: Iterable[TimeEntry],
+        by_task: bool
+    ) -> Tuple[List[ProjectSummary], Set[str]]:
+        """
+        Aggregate entries into project summaries.
+
+        Parameters
+        ----------
+        entries : Iterable[TimeEntry]
+            Parsed time entries from AgileDay
+        by_task : bool
+            Group by customer, project, task and project ID instead of
+            customer and project
+
+        Returns
+        -------
+        Tuple[List[ProjectSummary], Set[str]]
+            Summaries in order of first appearance, and the IDs of the
+            projects that have entries
+        """
+        frame = self._get_frame(entries)
+        projects_with_hours = _present_project_ids(frame)
+        if frame.empty:
+            return [], projects_with_hours
+
+        codes, groups = group_codes(frame, TASK_KEYS if by_task else PROJECT_KEYS)
+
+        # Rows of each group become contiguous and keep their original order;
+        # narrow codes let numpy use a radix sort
+        if groups <= np.iinfo(np.uint16).max:
+            codes = codes.astype(np.uint16)
+        order = np.argsort(codes, kind='stable')
+        bounds = np.zeros(groups + 1, dtype=np.int64)
+        np.cumsum(np.bincount(codes, minlength=groups), out=bounds[1:])
+        first_rows = order[bounds[:-1]]
+
+        hours = frame['hours'].to_numpy()[order]
+        amounts = frame['amount'].to_numpy()[order]
+        rates = frame['rate'].to_numpy()[order]
+
+        total_hours = []
+        hourly_rates = []
+        total_amounts = []
+        for start, stop in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+            group_hours = hours[start:stop]
+            group_amounts = amounts[start:stop]
+            running_hours = np.add.accumulate(group_hours)
+            # Adding to a 0.0 start turns a sum of -0.0 into 0.0, like the Python loop
+            total_hours.append(running_hours[-1].item() + 0.0)
+            total_amounts.append(np.add.accumulate(group_amounts)[-1].item() + 0.0)
+
+            group_rates = rates[start:stop]
+            rated = group_rates > 0
+            if rated.any():
+                hourly_rates.append(weighted_rate(
+                    (running_hours - group_hours)[rated],
+                    group_amounts[rated],
+                    running_hours[rated],
+                    group_rates[rated]
+                ))
+            else:
+                hourly_rates.append(0.0)
+
+        first = frame.iloc[first_rows]
+        return [
+            ProjectSummary(
+                customerName=customer,
+                projectName=project,
+                projectTask=task,
+                projectId=project_id,
+                billable=billable,
+                totalHours=hours_total,
+                hourlyRate=hourly_rate,
+                totalAmount=amount_total
+            )
+            for customer, project, task, project_id, billable, hours_total, hourly_rate, amount_total in zip(
+                first['customerName'].tolist(),
+                first['projectName'].tolist(),
+                first['projectTask'].tolist(),
+                first['projectId'].tolist(),
+                first['billable'].tolist(),
+                total_hours,
+                hourly_rates,
+                total_amounts
+            )
+        ], projects_with_hours
@@ -0,0 +1,134 @@
+"""Hourly rate resolution compiled from customer data and rates.csv."""
+
+import logging
+from typing import Any, Dict, List, Sequence, Set, Tuple
+
+from .diagnostics import INTERNAL_RATE_NOT_FOUND, NO_HOURLY_RATE_FOUND, MissingRateCollector
+from .time_entry import TimeEntry
+
+logger = logging.getLogger(__name__)
+
+
+def uses_internal_rates(customer_info: Dict[str, Any]) -> bool:
+    """Return whether a customer project is billed with rates from rates.csv."""
+    return customer_info.get('hour_rates', '').lower().strip() == 'internal'
+
+
+class RateResolver:
+    """Rate table compiled once from the customer data and rates.csv.
+
+    The internal rates of the projects billed with internal rates are
+    compiled into a single table keyed by (project ID, task), so a task
+    with an internal rate is priced with one dict lookup, and any other
+    task with one failed lookup and the entry's ``taskHourlyPrice``. The
+    customer settings are only read again, to build messages, when a rate
+    is missing; misses are added to the run's ``MissingRateCollector``.
+    """
+
+    def __init__(
+        self,
+        customer_data: Dict[str, Dict[str, Any]],
+        internal_rates: Dict[Tuple[str, str], float],
+        missing_rates: MissingRateCollector
+    ):
+        """Compile the rate table.
+
+        Parameters
+        ----------
+        customer_data : Dict[str, Dict[str, Any]]
+            Active customer data keyed by AgileDay project ID
+        internal_rates : Dict[Tuple[str, str], float]
+            Internal rates keyed by project ID and task name
+        missing_rates : MissingRateCollector
+            Missing rates of this run
+        """
+        self.customer_data = customer_data
+        self.missing_rates = missing_rates
+        self.internal_projects: Set[str] = {
+            project_id
+            for project_id, customer_info in customer_data.items()
+            if uses_internal_rates(customer_info)
+        }
+        self.table: Dict[Tuple[str, str], float] = {
+            key: rate for key, rate in internal_rates.items() if key[0] in self.internal_projects
+        }
+        logger.debug(
+            "Compiled %d internal rates for %d projects billed with internal rates",
+            len(self.table), len(self.internal_projects)
+        )
+
+    def rate(self, entry: TimeEntry, project_id: str, entry_count: int = 1) -> float:
+        """Price an entry, or a task group through its first entry.
+
+        Parameters
+        ----------
+        entry : TimeEntry
+            Parsed time entry
+        project_id : str
+            Project ID
+        entry_count : int, optional
+            Number of entries priced with this rate, counted for missing
+            rates, defaults to 1
+
+        Returns
+        -------
+        float
+            Hour rate to use
+        """
+        rate = self.table.get((project_id, entry.project_task))
+        if rate is not None:
+            return rate
+        return self._fallback_rate(entry, project_id, entry_count)
+
+    def price_tasks(self, project_id: str, tasks: Sequence[Tuple[TimeEntry, int]]) -> List[float]:
+        """Price all task groups of a project in one batch.
+
+        Parameters
+        ----------
+        project_id : str
+            Project ID
+        tasks : Sequence[Tuple[TimeEntry, int]]
+            First entry and entry count of each task group
+
+        Returns
+        -------
+        List[float]
+            Hour rate of each task group, in the same order
+        """
+        table_get = self.table.get
+        rates = []
+        for entry, entry_count in tasks:
+            rate = table_get((project_id, entry.project_task))
+            if rate is None:
+                rate = self._fallback_rate(entry, project_id, entry_count)
+            rates.append(rate)
+        return rates
+
+    def _fallback_rate(self, entry: TimeEntry, project_id: str, entry_count: int) -> float:
+        """Use the AgileDay rate when there is no internal rate, recording misses."""
+        internal = project_id in self.internal_projects
+        customer_info = self.customer_data.get(project_id, {})
+        if internal:
+            # Report the missing internal rate in missing_from_rates.txt
+            self.missing_rates.add(
+                INTERNAL_RATE_NOT_FOUND, project_id, entry.project_task,
+                client=customer_info.get('Client', 'Unknown'),
+                service=customer_info.get('Service name', 'Unknown Service'),
+                count=entry_count
+            )
+
+        # Use AgileDay rate from taskHourlyPrice, parsed when the entry was read;
+        # invalid prices were logged then and are treated as missing
+        task_rate = entry.task_hourly_price
+        if task_rate is not None:
+            return task_rate
+
+        # Report it in missing_from_rates.txt if it's an internal rate case
+        self.missing_rates.add(
+            NO_HOURLY_RATE_FOUND, project_id, entry.project_task,
+            client=customer_info.get('Client', 'Unknown'),
+            service=customer_info.get('Service name', 'Unknown Service'),
+            count=entry_count,
+            in_report=internal
+        )
+        return 0.0
@@ -0,0 +1,289 @@
+"""Customer and rates reference data, parsed once and cached as snapshots."""
+
+import csv
+import hashlib
+import io
+import logging
+import os
+import pickle
+import tempfile
+import threading
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .cache import default_cache_dir
+from .encoding import decode_bytes
+
+logger = logging.getLogger(__name__)
+
+# Bump when the snapshot layout changes so that old snapshots are re-parsed
+SNAPSHOT_VERSION = 2
+SNAPSHOT_SUFFIX = '.pickle'
+
+@dataclass
+class CustomerData:
+    """Parsed customer.csv with indexed views.
+
+    ``rows`` holds every CSV row as read, header included, for positional
+    readers. ``records`` holds the data rows as ``csv.DictReader`` would
+    return them. The views share the record dictionaries, which must not be
+    modified.
+    """
+    fieldnames: List[str]
+    rows: List[List[str]]
+    records: List[Dict[str, Any]]
+    encoding: str
+    by_project_id: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    active_by_project_id: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    by_group_invoice: Dict[str, List[Dict[str, Any]]] = field(default_factory=dict)
+    by_account: Dict[str, List[Dict[str, Any]]] = field(default_factory=dict)
+    problems: List[str] = field(default_factory=list)
+
+
+@dataclass
+class RatesData:
+    """Parsed rates.csv: internal hourly rates keyed by (project ID, task name)."""
+    rates: Dict[Tuple[str, str], float]
+    encoding: str
+    problems: List[str] = field(default_factory=list)
+
+
+def _read_rows(text: str) -> List[List[str]]:
+    """Split decoded CSV text into rows."""
+    return list(csv.reader(io.StringIO(text, newline='')))
+
+
+def parse_customer_data(content: bytes, path: Path) -> CustomerData:
+    """Parse and validate customer.csv content.
+
+    Parameters
+    ----------
+    content : bytes
+        Raw file content
+    path : Path
+        File path, used in messages
+
+    Returns
+    -------
+    CustomerData
+        Parsed rows, records and views
+
+    Raises
+    ------
+    ValueError
+        If the file cannot be decoded or has no header row
+    """
+    text, encoding = decode_bytes(content, path)
+    rows = _read_rows(text)
+    if not rows:
+        raise ValueError(f"Customer data file is empty: {path}")
+
+    fieldnames = rows[0]
+    field_count = len(fieldnames)
+    data = CustomerData(fieldnames=fieldnames, rows=rows, records=[], encoding=encoding)
+    if 'AgileDay_projectId' not in fieldnames:
+        data.problems.append("Customer data has no AgileDay_projectId column")
+
+    group_invoice: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    account: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for line_number, row in enumerate(rows[1:], start=2):
+        # Same semantics as csv.DictReader: blank rows are skipped, missing
+        # values are None and extra values are kept under the None key
+        if not row:
+            continue
+        record: Dict[Any, Any] = dict(zip(fieldnames, row))
+        if len(row) > field_count:
+            record[None] = row[field_count:]
+        elif len(row) < field_count:
+            for name in fieldnames[len(row):]:
+                record[name] = None
+        if len(row) != field_count:
+            data.problems.append(
+                f"Customer data line {line_number} has {len(row)} values, expected {field_count}"
+            )
+        data.records.append(record)
+
+        project_id = record.get('AgileDay_projectId')
+        if project_id:
+            if project_id in data.by_project_id:
+                data.problems.append(
+                    f"Customer data line {line_number} repeats AgileDay_projectId {project_id}"
+                )
+            data.by_project_id[project_id] = record
+            if (record.get('Active') or '').lower() == 'yes':
+                data.active_by_project_id[project_id] = record
+        if record.get('Group invoice'):
+            group_invoice[record['Group invoice']].append(record)
+        if record.get('Account A2 Ext ID'):
+            account[record['Account A2 Ext ID']].append(record)
+
+    data.by_group_invoice = dict(group_invoice)
+    data.by_account = dict(account)
+    return data
+
+
+def parse_rates(content: bytes, path: Path) -> RatesData:
+    """Parse and validate rates.csv content.
+
+    Rows with fewer than three columns are ignored; rows whose rate is not a
+    number are reported as problems.
+
+    Parameters
+    ----------
+    content : bytes
+        Raw file content
+    path : Path
+        File path, used in messages
+
+    Returns
+    -------
+    RatesData
+        Parsed rates
+    """
+    text, encoding = decode_bytes(content, path)
+    data = RatesData(rates={}, encoding=encoding)
+    for row in _read_rows(text):
+        if len(row) >= 3:  # Ensure we have all required columns
+            try:
+                data.rates[(row[0].strip(), row[1].strip())] = float(row[2].strip())
+            except ValueError as e:
+                data.problems.append(f"Failed to parse rate from row {row}: {e}")
+    return data
+
+
+class ReferenceDataStore:
+    """Loads reference files once and keeps binary snapshots of the results.
+
+    Each file is read as bytes and hashed. The parsed result is looked up in
+    memory, then in a snapshot in ``cache_dir`` keyed by the resolved path
+    and the SHA-256 of the content, and only parsed when neither exists. A
+    changed file therefore gets a new snapshot and the old one is removed.
+    Without a ``cache_dir`` results are kept in memory only.
+    """
+
+    def __init__(self, cache_dir: Optional[Path] = None):
+        """Create the store.
+
+        Parameters
+        ----------
+        cache_dir : Optional[Path]
+            Directory for snapshots, defaults to None which keeps no snapshots
+        """
+        self.snapshot_dir = cache_dir / 'reference' if cache_dir is not None else None
+        self._loaded: Dict[Tuple[str, str, str], Any] = {}
+        self._lock = threading.Lock()
+
+    def customer_data(self, path: Path) -> CustomerData:
+        """Return the parsed customer data file.
+
+        Parameters
+        ----------
+        path : Path
+            Path to customer data CSV file
+
+        Returns
+        -------
+        CustomerData
+            Parsed and validated customer data
+        """
+        return self._load('customer', Path(path), parse_customer_data)
+
+    def rates(self, path: Path) -> RatesData:
+        """Return the parsed rates file.
+
+        Parameters
+        ----------
+        path : Path
+            Path to rates CSV file
+
+        Returns
+        -------
+        RatesData
+            Parsed and validated rates
+        """
+        return self._load('rates', Path(path), parse_rates)
+
+    def _snapshot_path(self, kind: str, path_key: str, digest: str) -> Path:
+        """Return the snapshot file for a path and content digest."""
+        assert self.snapshot_dir is not None
+        path_hash = hashlib.sha256(path_key.encode('utf-8')).hexdigest()[:16]
+        return self.snapshot_dir / f"{kind}-{path_hash}-{digest}-v{SNAPSHOT_VERSION}{SNAPSHOT_SUFFIX}"
+
+    def _load(self, kind: str, path: Path, parse: Any) -> Any:
+        """Return parsed data from memory, a snapshot, or by parsing the file."""
+        content = path.read_bytes()
+        path_key = str(path.resolve())
+        digest = hashlib.sha256(content).hexdigest()
+        key = (kind, path_key, digest)
+
+        with self._lock:
+            data = self._loaded.get(key)
+            if data is None:
+                data = self._read_snapshot(kind, path_key, digest)
+                if data is None:
+                    data = parse(content, path)
+                    self._write_snapshot(kind, path_key, digest, data)
+                self._loaded[key] = data
+                # Report problems once per process, also for snapshots
+                for problem in data.problems:
+                    logger.warning("%s: %s", path, problem)
+        return data
+
+    def _read_snapshot(self, kind: str, path_key: str, digest: str) -> Any:
+        """Read a snapshot, returning None when it is missing or unreadable."""
+        if self.snapshot_dir is None:
+            return None
+        snapshot = self._snapshot_path(kind, path_key, digest)
+        try:
+            with snapshot.open('rb') as f:
+                data = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning("Ignoring unreadable reference snapshot %s: %s", snapshot, str(e))
+            return None
+        logger.debug("Loaded %s reference snapshot %s", kind, snapshot)
+        return data
+
+    def _write_snapshot(self, kind: str, path_key: str, digest: str, data: Any) -> None:
+        """Write a snapshot atomically and remove snapshots of older content."""
+        if self.snapshot_dir is None:
+            return
+        snapshot = self._snapshot_path(kind, path_key, digest)
+        try:
+            self.snapshot_dir.mkdir(parents=True, exist_ok=True)
+            fd, temp_name = tempfile.mkstemp(dir=self.snapshot_dir, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(temp_name, snapshot)
+            except BaseException:
+                os.unlink(temp_name)
+                raise
+            prefix = snapshot.name.split('-', 2)[:2]
+            for old in self.snapshot_dir.glob(f"{prefix[0]}-{prefix[1]}-*{SNAPSHOT_SUFFIX}"):
+                if old != snapshot:
+                    old.unlink(missing_ok=True)
+        except OSError as e:
+            logger.warning("Could not write reference snapshot %s: %s", snapshot, str(e))
+            return
+        logger.debug("Wrote %s reference snapshot %s", kind, snapshot)
+
+
+_default_store: Optional[ReferenceDataStore] = None
+
+
+def default_store() -> ReferenceDataStore:
+    """Return the shared store, with snapshots in the default cache directory.
+
+    Returns
+    -------
+    ReferenceDataStore
+        Process-wide store
+    """
+    global _default_store
+    if _default_store is None:
+        _default_store = ReferenceDataStore(default_cache_dir())
+    return _default_store
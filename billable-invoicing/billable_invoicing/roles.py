@@ -0,0 +1,123 @@
+"""Employee role lookup by email address."""
+
+import csv
+import hashlib
+import json
+import logging
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping
+
+from .encoding import open_text
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ROLE = 'Engineer'
+
+# Order of the roles in reports
+ROLE_ORDER = ('Backoffice', 'Service Lead', 'Team Lead', DEFAULT_ROLE)
+
+
+class RoleIndex:
+    """Map employee email addresses to roles in constant time.
+
+    The mapping is indexed once by case-folded email, so a lookup costs
+    one dict access whatever the size of the roster. Lookups of the raw
+    email are memoised as well, which skips case folding for the addresses
+    that repeat on every entry. Emails listed under several roles get the
+    first role, and unknown emails the default role.
+    """
+
+    def __init__(self, role_emails: Mapping[str, Iterable[str]], default_role: str = DEFAULT_ROLE):
+        """Index a role mapping.
+
+        Parameters
+        ----------
+        role_emails : Mapping[str, Iterable[str]]
+            Email addresses by role, like ``config.ROLE_EMAILS``
+        default_role : str, optional
+            Role of emails not in the mapping, defaults to "Engineer"
+        """
+        self.default_role = default_role
+        self._by_email: Dict[str, str] = {}
+        for role, emails in role_emails.items():
+            for email in emails:
+                self._by_email.setdefault(email.strip().casefold(), role)
+        self._memo: Dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._by_email)
+
+    def digest(self) -> str:
+        """Return a digest of the mapping, e.g. to tell when stored results are outdated.
+
+        Returns
+        -------
+        str
+            SHA-256 of the indexed emails, their roles and the default role
+        """
+        content = json.dumps([self.default_role, sorted(self._by_email.items())])
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+    @classmethod
+    def from_config(cls) -> 'RoleIndex':
+        """Index ``ROLE_EMAILS`` of the local ``config.py``.
+
+        Returns
+        -------
+        RoleIndex
+            Index of the configured roles
+        """
+        # config.py is not in version control, only needed without a roles file
+        from .config import ROLE_EMAILS
+        return cls(ROLE_EMAILS)
+
+    @classmethod
+    def from_file(cls, path: Path) -> 'RoleIndex':
+        """Index a roles CSV file with ``Role`` and ``Email`` columns.
+
+        Parameters
+        ----------
+        path : Path
+            Path to the roles file, one email address per row
+
+        Returns
+        -------
+        RoleIndex
+            Index of the roles in the file
+
+        Raises
+        ------
+        ValueError
+            If the file does not have ``Role`` and ``Email`` columns
+        """
+        role_emails: Dict[str, List[str]] = {}
+        with open_text(path) as csvfile:
+            reader = csv.DictReader(csvfile)
+            if not reader.fieldnames or not {'Role', 'Email'} <= set(reader.fieldnames):
+                raise ValueError(f"Roles file {path} must have Role and Email columns")
+            for row in reader:
+                role = (row.get('Role') or '').strip()
+                email = (row.get('Email') or '').strip()
+                if role and email:
+                    role_emails.setdefault(role, []).append(email)
+        index = cls(role_emails)
+        logger.info("Loaded %d role emails for %d roles from %s", len(index), len(role_emails), path)
+        return index
+
+    def role(self, email: str) -> str:
+        """Return the role of an email address.
+
+        Parameters
+        ----------
+        email : str
+            Email address of the employee, in any case
+
+        Returns
+        -------
+        str
+            Role of the employee
+        """
+        role = self._memo.get(email)
+        if role is None:
+            role = self._memo[email] = self._by_email.get(email.casefold(), self.default_role)
+        return role
@@ -0,0 +1,311 @@
+"""Rate-limit-aware request scheduling for the AgileDay API."""
+
+import email.utils
+import logging
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RATE_LIMIT = 10.0
+DEFAULT_MAX_CONCURRENCY = 16
+DEFAULT_MAX_RETRIES = 5
+
+# Responses that mean the API wants us to slow down
+THROTTLE_STATUSES = frozenset({429, 503})
+# Responses worth retrying
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class RequestScheduler:
+    """Schedule API requests within the rate the tenant allows.
+
+    Combines three mechanisms:
+
+    - a token bucket limiting the request rate, paused entirely while a
+      ``Retry-After`` period is in effect
+    - an AIMD concurrency limit that grows by roughly one slot per round of
+      successful requests and is halved whenever the API throttles us
+    - retries of throttled, failed and dropped requests with jittered
+      exponential backoff
+
+    The scheduler is thread-safe and is meant to be shared by all threads
+    using one ``AgileDayClient``.
+    """
+
+    def __init__(
+        self,
+        rate_limit: float = DEFAULT_RATE_LIMIT,
+        burst: Optional[int] = None,
+        initial_concurrency: int = 4,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        backoff_base: float = 0.5,
+        backoff_cap: float = 30.0,
+        decrease_factor: float = 0.5
+    ):
+        """Initialize the scheduler.
+
+        Parameters
+        ----------
+        rate_limit : float, optional
+            Sustained requests per second, defaults to 10
+        burst : Optional[int], optional
+            Token bucket size, defaults to the rate limit rounded up
+        initial_concurrency : int, optional
+            Starting concurrency limit, defaults to 4
+        max_concurrency : int, optional
+            Upper bound for the concurrency limit, defaults to 16
+        max_retries : int, optional
+            Retries per request before giving up, defaults to 5
+        backoff_base : float, optional
+            Backoff in seconds before the first retry, defaults to 0.5
+        backoff_cap : float, optional
+            Maximum backoff in seconds, defaults to 30
+        decrease_factor : float, optional
+            Factor the concurrency limit is multiplied by on throttling, defaults to 0.5
+        """
+        if rate_limit <= 0:
+            raise ValueError(f"rate_limit must be positive, got {rate_limit}")
+
+        self.rate_limit = rate_limit
+        self.burst = burst or max(1, int(rate_limit + 0.999))
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.decrease_factor = decrease_factor
+
+        self._condition = threading.Condition()
+        self._tokens = float(self.burst)
+        self._last_refill = time.monotonic()
+        self._paused_until = 0.0
+        self._limit = float(min(max(1, initial_concurrency), self.max_concurrency))
+        self._in_flight = 0
+
+        self._requests = 0
+        self._retries = 0
+        self._throttles = 0
+        self._errors = 0
+        self._peak_in_flight = 0
+
+    @property
+    def concurrency_limit(self) -> int:
+        """Current number of requests allowed in flight."""
+        return max(1, int(self._limit))
+
+    def _acquire(self) -> None:
+        """Wait for a concurrency slot and a rate token."""
+        with self._condition:
+            while self._in_flight >= self.concurrency_limit:
+                self._condition.wait()
+            self._in_flight += 1
+            self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+
+        while True:
+            with self._condition:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                else:
+                    elapsed = now - self._last_refill
+                    self._tokens = min(self.burst, self._tokens + elapsed * self.rate_limit)
+                    self._last_refill = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate_limit
+            time.sleep(wait)
+
+    def _release(self, throttled: bool, succeeded: bool) -> None:
+        """Free a concurrency slot and adapt the limit to the outcome.
+
+        Parameters
+        ----------
+        throttled : bool
+            Whether the API asked us to slow down
+        succeeded : bool
+            Whether the request completed without a retryable failure
+        """
+        with self._condition:
+            self._in_flight -= 1
+            if throttled:
+                self._limit = max(1.0, self._limit * self.decrease_factor)
+            elif succeeded:
+                self._limit = min(float(self.max_concurrency), self._limit + 1 / self._limit)
+            self._condition.notify_all()
+
+    def _pause(self, seconds: float) -> None:
+        """Stop handing out rate tokens for a while.
+
+        Parameters
+        ----------
+        seconds : float
+            Length of the pause
+        """
+        with self._condition:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+
+    def _backoff(self, attempt: int) -> float:
+        """Return a jittered exponential backoff delay for a retry attempt.
+
+        Parameters
+        ----------
+        attempt : int
+            Zero-based retry attempt
+
+        Returns
+        -------
+        float
+            Delay in seconds
+        """
+        ceiling = min(self.backoff_cap, self.backoff_base * 2 ** attempt)
+        return random.uniform(ceiling / 2, ceiling)
+
+    @staticmethod
+    def _retry_after(response: requests.Response) -> Optional[float]:
+        """Parse the Retry-After header of a response.
+
+        Parameters
+        ----------
+        response : requests.Response
+            Throttled or failed response
+
+        Returns
+        -------
+        Optional[float]
+            Seconds to wait, or None if the header is missing or invalid
+        """
+        value = response.headers.get('Retry-After')
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            retry_at = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+    def request(
+        self,
+        send: Callable[..., requests.Response],
+        *args: Any,
+        **kwargs: Any
+    ) -> requests.Response:
+        """Send a request through the scheduler, retrying when needed.
+
+        Parameters
+        ----------
+        send : Callable[..., requests.Response]
+            Function performing the request, e.g. ``session.get``
+        *args : Any
+            Positional arguments for ``send``
+        **kwargs : Any
+            Keyword arguments for ``send``
+
+        Returns
+        -------
+        requests.Response
+            The first non-retryable response, or the last one once the
+            retries are used up
+
+        Raises
+        ------
+        requests.exceptions.RequestException
+            If the connection keeps failing after all retries
+        """
+        attempt = 0
+        while True:
+            self._acquire()
+            with self._condition:
+                self._requests += 1
+            try:
+                response = send(*args, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                self._release(throttled=False, succeeded=False)
+                with self._condition:
+                    self._errors += 1
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                logger.warning(
+                    "Request failed (%s), retrying in %.1f s (attempt %d of %d)",
+                    e, delay, attempt + 1, self.max_retries
+                )
+            except Exception:
+                self._release(throttled=False, succeeded=False)
+                raise
+            else:
+                status = response.status_code
+                if status not in RETRY_STATUSES:
+                    self._release(throttled=False, succeeded=True)
+                    return response
+
+                throttled = status in THROTTLE_STATUSES
+                self._release(throttled=throttled, succeeded=False)
+                retry_after = self._retry_after(response)
+                with self._condition:
+                    if throttled:
+                        self._throttles += 1
+                    else:
+                        self._errors += 1
+                if retry_after is not None:
+                    self._pause(retry_after)
+                if attempt >= self.max_retries:
+                    return response
+
+                delay = max(self._backoff(attempt), retry_after or 0.0)
+                logger.warning(
+                    "Request to %s returned %d, retrying in %.1f s (attempt %d of %d, concurrency limit %d)",
+                    response.url, status, delay, attempt + 1, self.max_retries, self.concurrency_limit
+                )
+                response.close()
+
+            with self._condition:
+                self._retries += 1
+            attempt += 1
+            time.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the scheduler counters.
+
+        Returns
+        -------
+        Dict[str, Any]
+            Request, retry, throttle and error counts together with the
+            current concurrency limit and the peak number of requests in flight
+        """
+        with self._condition:
+            return {
+                'requests': self._requests,
+                'retries': self._retries,
+                'throttles': self._throttles,
+                'errors': self._errors,
+                'concurrency_limit': self.concurrency_limit,
+                'peak_in_flight': self._peak_in_flight
+            }
+
+    def log_stats(self) -> None:
+        """Write the scheduler counters to the run log."""
+        stats = self.stats()
+        logger.info(
+            "AgileDay requests: %d sent, %d retries, %d throttled, %d errors, "
+            "concurrency limit %d, peak in flight %d",
+            stats['requests'],
+            stats['retries'],
+            stats['throttles'],
+            stats['errors'],
+            stats['concurrency_limit'],
+            stats['peak_in_flight']
+        )
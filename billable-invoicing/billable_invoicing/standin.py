@@ -0,0 +1,210 @@
+"""Local stand-in for the AgileDay API backed by synthetic data."""
+
+import hashlib
+import json
+import logging
+import random
+import re
+import threading
+import time
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qs, urlsplit
+
+from .synthetic import SyntheticDataset
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAGE_SIZE = 500
+PROJECT_PATH = re.compile(r'^/api/v1/project/id/(?P<project_id>[^/]+)$')
+TIME_REPORTING_PATH = '/api/v1/time_reporting'
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    """Request handler serving the AgileDay endpoints the client uses."""
+
+    protocol_version = 'HTTP/1.1'
+    server: '_StandInHTTPServer'
+
+    def log_message(self, format: str, *args: Any) -> None:
+        """Route request logging to the module logger."""
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    def _send_json(self, status: int, payload: Any, headers: Optional[Dict[str, str]] = None) -> None:
+        """Send a JSON response with a known length."""
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_chunk(self, data: bytes) -> None:
+        """Write one chunk of a chunked response."""
+        self.wfile.write(f"{len(data):X}\r\n".encode('ascii') + data + b"\r\n")
+
+    def do_GET(self) -> None:
+        """Authorize, delay or fail the request, then route it."""
+        standin = self.server.standin
+        if not self.headers.get('Authorization', '').startswith('Bearer '):
+            self._send_json(401, {'error': 'Unauthorized'})
+            return
+
+        if standin.latency:
+            time.sleep(standin.latency)
+        if standin.should_fail():
+            self._send_json(503, {'error': 'Service temporarily unavailable'}, {'Retry-After': '1'})
+            return
+
+        url = urlsplit(self.path)
+        if url.path == TIME_REPORTING_PATH:
+            self._time_reporting(parse_qs(url.query))
+            return
+        match = PROJECT_PATH.match(url.path)
+        if match:
+            self._project(match.group('project_id'))
+            return
+        self._send_json(404, {'error': f"Not found: {url.path}"})
+
+    def _time_reporting(self, query: Dict[str, Any]) -> None:
+        """Stream the time entries of the requested date range."""
+        try:
+            start_date = date.fromisoformat(query['startDate'][0])
+            end_date = date.fromisoformat(query['endDate'][0])
+        except (KeyError, ValueError):
+            self._send_json(400, {'error': 'startDate and endDate are required (YYYY-MM-DD)'})
+            return
+        status = query.get('status', ['Submitted'])[0]
+
+        # Stream the array in pages with chunked encoding, like a large API response
+        standin = self.server.standin
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        page = []
+        separator = b"["
+        for entry in standin.dataset.iter_time_entries(start_date, end_date, status):
+            page.append(json.dumps(entry))
+            if len(page) >= standin.page_size:
+                self._write_chunk(separator + ",".join(page).encode('utf-8'))
+                separator = b","
+                page = []
+        if page:
+            self._write_chunk(separator + ",".join(page).encode('utf-8'))
+            separator = b","
+        self._write_chunk(b"]" if separator == b"," else b"[]")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _project(self, project_id: str) -> None:
+        """Return a project, honouring If-None-Match."""
+        project = self.server.standin.dataset.get_project(project_id)
+        if project is None:
+            self._send_json(404, {'error': f"Project not found: {project_id}"})
+            return
+        etag = '"' + hashlib.sha1(json.dumps(project, sort_keys=True).encode('utf-8')).hexdigest() + '"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self._send_json(200, project, {'ETag': etag})
+
+
+class _StandInHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    standin: 'StandInServer'
+
+
+class StandInServer:
+    """HTTP server implementing the AgileDay endpoints used by ``AgileDayClient``.
+
+    Serves ``/api/v1/time_reporting`` and ``/api/v1/project/id/{id}`` from a
+    ``SyntheticDataset``. Any bearer token is accepted. Latency is added to
+    every request, a share of requests can fail with 503 and ``Retry-After``,
+    and time entries are streamed in chunks of ``page_size`` entries.
+    """
+
+    def __init__(
+        self,
+        dataset: SyntheticDataset,
+        host: str = '127.0.0.1',
+        port: int = 0,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        page_size: int = DEFAULT_PAGE_SIZE
+    ):
+        """Bind the server.
+
+        Parameters
+        ----------
+        dataset : SyntheticDataset
+            Data to serve
+        host : str, optional
+            Interface to listen on, defaults to 127.0.0.1
+        port : int, optional
+            Port to listen on, defaults to 0 which picks a free port
+        latency : float, optional
+            Seconds added to every request, defaults to 0
+        error_rate : float, optional
+            Share of requests answered with 503, between 0 and 1, defaults to 0
+        page_size : int, optional
+            Time entries written per response chunk, defaults to 500
+        """
+        if not 0 <= error_rate <= 1:
+            raise ValueError(f"error_rate must be between 0 and 1, got {error_rate}")
+
+        self.dataset = dataset
+        self.latency = latency
+        self.error_rate = error_rate
+        self.page_size = max(1, page_size)
+        self._rng = random.Random(dataset.seed)
+        self._rng_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+        self._httpd = _StandInHTTPServer((host, port), _StandInHandler)
+        self._httpd.standin = self
+
+    @property
+    def api_url(self) -> str:
+        """Base URL to pass to ``AgileDayClient`` or ``--api-url``."""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/api/v1"
+
+    def should_fail(self) -> bool:
+        """Decide whether the current request gets an error response."""
+        if not self.error_rate:
+            return False
+        with self._rng_lock:
+            return self._rng.random() < self.error_rate
+
+    def serve_forever(self) -> None:
+        """Serve requests until interrupted."""
+        logger.info("Stand-in AgileDay API listening on %s", self.api_url)
+        self._httpd.serve_forever()
+
+    def start(self) -> 'StandInServer':
+        """Serve requests on a background thread.
+
+        Returns
+        -------
+        StandInServer
+            The server itself, for chaining
+        """
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        logger.info("Stand-in AgileDay API listening on %s", self.api_url)
+        return self
+
+    def stop(self) -> None:
+        """Stop serving and release the port."""
+        if self._thread is not None:
+            self._httpd.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._httpd.server_close()
@@ -0,0 +1,372 @@
+"""Seeded synthetic AgileDay data for load tests and benchmarks."""
+
+import csv
+import datetime
+import hashlib
+import logging
+import random
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+ORANGIT_COMPANY = "Orangit Oy"
+SUBCONTRACTOR_COMPANY = "Subcontractor Oy"
+WORKDAY_HOURS = 7.5
+
+CUSTOMER_FIELDNAMES = [
+    'Client', 'Service name', 'AgileDay_projectId', 'Active', 'included_hours',
+    'Group invoice', 'Invoice Info A2 Ext Id', 'Account A2 Ext ID', 'hour_rates',
+    'Our Reference', 'CUSTOMER_REFERENCE', 'Contract number', 'Sales Item hours',
+    'Billable Description', 'Tax_Applicability', 'Tax_Code'
+]
+
+TASK_NAMES = [
+    'Development', 'Design', 'Project Management', 'Testing', 'Consulting',
+    'Support', 'Architecture', 'Data Engineering'
+]
+INTERNAL_TASK_NAMES = ['Internal Meeting', 'Training', 'Sales']
+TEAMS = ['Alpha', 'Beta', 'Gamma', 'Delta']
+FIRST_NAMES = [
+    'Aino', 'Eero', 'Helmi', 'Ilmari', 'Kaisa', 'Lauri', 'Mikko', 'Noora',
+    'Otto', 'Pihla', 'Sanna', 'Topias', 'Venla', 'Ville'
+]
+LAST_NAMES = [
+    'Korhonen', 'Virtanen', 'Mäkinen', 'Nieminen', 'Mäkelä', 'Hämäläinen',
+    'Laine', 'Heikkinen', 'Koskinen', 'Järvinen'
+]
+
+
+@dataclass
+class SyntheticCustomer:
+    """A generated customer."""
+    customer_id: str
+    name: str
+    external_id: str
+    business_id: str
+
+
+@dataclass
+class SyntheticProject:
+    """A generated project with its tasks and their hourly prices."""
+    project_id: str
+    name: str
+    customer: SyntheticCustomer
+    project_type: str
+    opening_price: float
+    tasks: List[Tuple[str, float]]
+    active: bool = True
+    included_hours: str = 'All'
+    hour_rates: str = 'agileday'
+
+
+@dataclass
+class SyntheticEmployee:
+    """A generated employee and the projects they book hours on."""
+    employee_id: str
+    name: str
+    email: str
+    company: str
+    team: str
+    cost_rate: float
+    projects: List[SyntheticProject] = field(default_factory=list)
+
+
+def _stable_uuid(rng: random.Random) -> str:
+    """Draw a UUID from a seeded random generator."""
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+class SyntheticDataset:
+    """Deterministic customers, projects, employees and time entries.
+
+    The same seed and sizes always produce the same data. Time entries are
+    generated per day from a generator seeded by the day, so any date range
+    or window split of it returns exactly the same entries.
+    """
+
+    def __init__(
+        self,
+        seed: int = 0,
+        employees: int = 50,
+        customers: int = 10,
+        projects_per_customer: int = 3,
+        entries_per_day: int = 2
+    ):
+        """Generate the reference data of the dataset.
+
+        Parameters
+        ----------
+        seed : int, optional
+            Seed of all random choices, defaults to 0
+        employees : int, optional
+            Number of employees booking hours, defaults to 50
+        customers : int, optional
+            Number of customers, defaults to 10
+        projects_per_customer : int, optional
+            Number of external projects per customer, defaults to 3
+        entries_per_day : int, optional
+            Time entries each employee books per working day, defaults to 2
+        """
+        self.seed = seed
+        self.entries_per_day = entries_per_day
+        rng = random.Random(seed)
+
+        self.customers: List[SyntheticCustomer] = []
+        self.projects: List[SyntheticProject] = []
+        for index in range(customers):
+            customer = SyntheticCustomer(
+                customer_id=_stable_uuid(rng),
+                name=f"Customer {index + 1:04d} Oy",
+                external_id=f"CUST-{index + 1:04d}",
+                business_id=f"{rng.randrange(1000000, 9999999)}-{rng.randrange(10)}"
+            )
+            self.customers.append(customer)
+            for project_index in range(projects_per_customer):
+                tasks = rng.sample(TASK_NAMES, rng.randint(1, 4))
+                self.projects.append(SyntheticProject(
+                    project_id=_stable_uuid(rng),
+                    name=f"{customer.name} - Project {project_index + 1}",
+                    customer=customer,
+                    project_type='External',
+                    opening_price=float(rng.randrange(80, 160, 5)),
+                    tasks=[(task, float(rng.randrange(80, 160, 5))) for task in tasks],
+                    active=rng.random() > 0.05,
+                    included_hours=rng.choice(['All', 'All', 'All', 'Orangit']),
+                    hour_rates=rng.choice(['agileday', 'agileday', 'internal'])
+                ))
+
+        internal_customer = SyntheticCustomer(
+            customer_id=_stable_uuid(rng),
+            name=ORANGIT_COMPANY,
+            external_id='ORANGIT',
+            business_id='0000000-0'
+        )
+        internal_project = SyntheticProject(
+            project_id=_stable_uuid(rng),
+            name='Internal',
+            customer=internal_customer,
+            project_type='Internal',
+            opening_price=0.0,
+            tasks=[(task, 0.0) for task in INTERNAL_TASK_NAMES]
+        )
+        self.projects.append(internal_project)
+        self._projects_by_id = {project.project_id: project for project in self.projects}
+
+        external_projects = [p for p in self.projects if p.project_type == 'External']
+        self.employees: List[SyntheticEmployee] = []
+        for index in range(employees):
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            employee = SyntheticEmployee(
+                employee_id=_stable_uuid(rng),
+                name=f"{first} {last}",
+                email=f"{first.lower()}.{last.lower()}.{index + 1}@example.com",
+                company=ORANGIT_COMPANY if rng.random() > 0.1 else SUBCONTRACTOR_COMPANY,
+                team=rng.choice(TEAMS),
+                cost_rate=float(rng.randrange(40, 80, 5))
+            )
+            if external_projects:
+                employee.projects = rng.sample(external_projects, min(len(external_projects), rng.randint(1, 3)))
+            employee.projects.append(internal_project)
+            self.employees.append(employee)
+
+        logger.debug(
+            "Generated %d customers, %d projects and %d employees (seed %d)",
+            len(self.customers),
+            len(self.projects),
+            len(self.employees),
+            seed
+        )
+
+    def get_project(self, project_id: str) -> Optional[Dict[str, Any]]:
+        """Return a project as the AgileDay project endpoint would.
+
+        Parameters
+        ----------
+        project_id : str
+            ID of the project
+
+        Returns
+        -------
+        Optional[Dict[str, Any]]
+            Project details, or None if the project does not exist
+        """
+        project = self._projects_by_id.get(project_id)
+        if project is None:
+            return None
+        return {
+            'id': project.project_id,
+            'name': project.name,
+            'type': project.project_type,
+            'commercialModel': 'Time and materials',
+            'company': {
+                'id': project.customer.customer_id,
+                'name': project.customer.name
+            }
+        }
+
+    def iter_time_entries(
+        self,
+        start_date: datetime.date,
+        end_date: datetime.date,
+        status: str = "Submitted"
+    ) -> Iterator[Dict[str, Any]]:
+        """Generate the time entries of a date range.
+
+        Entries are booked on working days only, ordered by date.
+
+        Parameters
+        ----------
+        start_date : datetime.date
+            First day of the range (inclusive)
+        end_date : datetime.date
+            Last day of the range (inclusive)
+        status : str, optional
+            Status set on every entry, defaults to "Submitted"
+
+        Yields
+        ------
+        Dict[str, Any]
+            Time entries with the fields of ``TimeEntryTransformer.fieldnames``
+        """
+        day = start_date
+        while day <= end_date:
+            if day.weekday() < 5:
+                yield from self._day_entries(day, status)
+            day += datetime.timedelta(days=1)
+
+    def _day_entries(self, day: datetime.date, status: str) -> Iterator[Dict[str, Any]]:
+        """Generate the entries of one working day."""
+        rng = random.Random(f"{self.seed}:{day.isoformat()}")
+        date = day.isoformat()
+        for employee in self.employees:
+            for _ in range(self.entries_per_day):
+                project = rng.choice(employee.projects)
+                task, task_price = rng.choice(project.tasks)
+                minutes = rng.randrange(30, 481, 30)
+                allocated = rng.choice([minutes, minutes, 0, 240, 450])
+                billable = project.project_type == 'External' and rng.random() > 0.05
+                price = task_price if billable else 0.0
+                hours = minutes / 60
+                entry_id = _stable_uuid(rng)
+                yield {
+                    'customerName': project.customer.name,
+                    'customerExternalId': project.customer.external_id,
+                    'customerId': project.customer.customer_id,
+                    'projectType': project.project_type,
+                    'projectSubtype': None,
+                    'projectName': project.name,
+                    'projectId': project.project_id,
+                    'projectExternalId': None,
+                    'projectTask': task,
+                    'entryType': 'TIME_ENTRY',
+                    'OpeningName': None,
+                    'openingId': None,
+                    'date': date,
+                    'employeeName': employee.name,
+                    'employeeEmail': employee.email,
+                    'employeeExternalId': None,
+                    'employeeId': employee.employee_id,
+                    'billable': billable,
+                    'actualMinutes': minutes,
+                    'actualHours': hours,
+                    'actualDays': hours / WORKDAY_HOURS,
+                    'allocatedMinutes': allocated,
+                    'allocatedHours': allocated / 60,
+                    'allocatedDays': allocated / 60 / WORKDAY_HOURS,
+                    'deviationMinutes': minutes - allocated,
+                    'deviationHours': (minutes - allocated) / 60,
+                    'deviationDays': (minutes - allocated) / 60 / WORKDAY_HOURS,
+                    'notes': None,
+                    'status': status,
+                    'openingHourlyPrice': project.opening_price if billable else None,
+                    'openingBasedRevenue': hours * project.opening_price if billable else None,
+                    'openingCurrency': 'EUR',
+                    'taskHourlyPrice': price if billable else None,
+                    'taskBasedRevenue': hours * price if billable else None,
+                    'taskCurrency': 'EUR',
+                    'standardCostRate': employee.cost_rate,
+                    'standardCosts': hours * employee.cost_rate,
+                    'standardCostCurrency': 'EUR',
+                    'employeePrimaryTeam': employee.team,
+                    'employeePrimaryTeamExternalId': None,
+                    'employeePrimaryTeamId': None,
+                    'employeeBusinessUnit': None,
+                    'employeeBusinessUnitExternalId': None,
+                    'employeeBusinessUnitId': None,
+                    'employeeCompany': employee.company,
+                    'employeeCompanyExternalId': None,
+                    'employeeCompanyId': None,
+                    'employeeCountry': 'FI',
+                    'projectCommercialModel': 'Time and materials',
+                    'taskId': hashlib.md5(f"{project.project_id}:{task}".encode()).hexdigest(),
+                    'taskExternalId': None,
+                    'timeEntryId': entry_id,
+                    'timeEntryExternalId': None,
+                    'customerBusinessId': project.customer.business_id,
+                    'customerFinancialId': None
+                }
+
+    def write_customer_csv(self, path: Path) -> None:
+        """Write a customer.csv matching the generated projects.
+
+        Every external project gets a row. Customers with several projects
+        are grouped onto one invoice through the ``Group invoice`` column.
+
+        Parameters
+        ----------
+        path : Path
+            Path of the CSV file to write
+        """
+        with path.open('w', newline='') as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=CUSTOMER_FIELDNAMES)
+            writer.writeheader()
+            for index, project in enumerate(self.projects):
+                if project.project_type != 'External':
+                    continue
+                customer = project.customer
+                writer.writerow({
+                    'Client': customer.name,
+                    'Service name': project.name.split(' - ')[-1],
+                    'AgileDay_projectId': project.project_id,
+                    'Active': 'yes' if project.active else 'no',
+                    'included_hours': project.included_hours,
+                    'Group invoice': f"GRP-{customer.external_id}",
+                    'Invoice Info A2 Ext Id': f"INV-{index + 1:05d}",
+                    'Account A2 Ext ID': f"ACC-{customer.external_id}",
+                    'hour_rates': project.hour_rates,
+                    'Our Reference': f"REF-{index + 1:05d}",
+                    'CUSTOMER_REFERENCE': f"CREF-{customer.external_id}",
+                    'Contract number': f"CNT-{index + 1:05d}",
+                    'Sales Item hours': 'SI-HOURS',
+                    'Billable Description': 'Consulting services',
+                    'Tax_Applicability': 'Standard',
+                    'Tax_Code': '25.5%'
+                })
+        logger.info("Wrote synthetic customer data to %s", path)
+
+    def write_rates_csv(self, path: Path) -> None:
+        """Write a rates.csv for the projects using internal hour rates.
+
+        Like the exported sheet, the file has no header row. Roughly one
+        task in ten is left out so that missing-rate handling is exercised
+        as well.
+
+        Parameters
+        ----------
+        path : Path
+            Path of the CSV file to write
+        """
+        rng = random.Random(f"{self.seed}:rates")
+        with path.open('w', newline='') as csvfile:
+            writer = csv.writer(csvfile)
+            for project in self.projects:
+                if project.hour_rates != 'internal':
+                    continue
+                for task, price in project.tasks:
+                    if rng.random() < 0.1:
+                        continue
+                    writer.writerow([project.project_id, task, f"{price + 10:.2f}"])
+        logger.info("Wrote synthetic rates to %s", path)
@@ -0,0 +1,222 @@
+"""Compact typed representation of AgileDay time entries."""
+
+import datetime
+import functools
+import logging
+import sys
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Raw hours fields in CSV column order
+RAW_FIELDNAMES: Tuple[str, ...] = (
+    'customerName', 'customerExternalId', 'customerId', 'projectType',
+    'projectSubtype', 'projectName', 'projectId', 'projectExternalId',
+    'projectTask', 'entryType', 'OpeningName', 'openingId', 'date',
+    'employeeName', 'employeeEmail', 'employeeExternalId', 'employeeId',
+    'billable', 'actualMinutes', 'actualHours', 'actualDays',
+    'allocatedMinutes', 'allocatedHours', 'allocatedDays',
+    'deviationMinutes', 'deviationHours', 'deviationDays', 'notes',
+    'status', 'openingHourlyPrice', 'openingBasedRevenue',
+    'openingCurrency', 'taskHourlyPrice', 'taskBasedRevenue',
+    'taskCurrency', 'standardCostRate', 'standardCosts',
+    'standardCostCurrency', 'employeePrimaryTeam',
+    'employeePrimaryTeamExternalId', 'employeePrimaryTeamId',
+    'employeeBusinessUnit', 'employeeBusinessUnitExternalId',
+    'employeeBusinessUnitId', 'employeeCompany',
+    'employeeCompanyExternalId', 'employeeCompanyId', 'employeeCountry',
+    'projectCommercialModel', 'taskId', 'taskExternalId', 'timeEntryId',
+    'timeEntryExternalId', 'customerBusinessId', 'customerFinancialId'
+)
+_FIELD_INDEX: Dict[str, int] = {name: index for index, name in enumerate(RAW_FIELDNAMES)}
+_PROJECT_TYPE_INDEX = _FIELD_INDEX['projectType']
+
+# Fields that are unique per entry; every other string value is interned
+_UNIQUE_FIELDS = frozenset({'timeEntryId', 'timeEntryExternalId', 'notes'})
+_INTERNED_INDEXES = tuple(
+    index for index, name in enumerate(RAW_FIELDNAMES) if name not in _UNIQUE_FIELDS
+)
+
+
+def _parse_float(value: Any) -> Optional[float]:
+    """Parse an optional numeric API or CSV value.
+
+    Returns None for missing and empty values.
+
+    Raises
+    ------
+    ValueError
+        If the value is not a number
+    """
+    if value is None or value == '':
+        return None
+    return float(value)
+
+
+def _parse_bool(value: Any) -> bool:
+    """Parse the billable flag, a bool from the API or "True"/"False" from CSV."""
+    if isinstance(value, str):
+        return value == 'True'
+    return value == True  # noqa: E712 - the API may send 1/0 as well
+
+
+@functools.lru_cache(maxsize=4096)
+def _parse_date(value: str) -> Optional[datetime.date]:
+    """Parse a YYYY-MM-DD date, returning None if it is invalid."""
+    try:
+        return datetime.datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+
+@dataclass(slots=True)
+class TimeEntry:
+    """A time entry parsed once into typed fields.
+
+    The values used for invoicing and utilization are parsed when the entry
+    is created: ``actualMinutes``, ``actualHours``, the hourly prices,
+    ``billable`` and ``date``. All raw fields are kept in a tuple in
+    ``RAW_FIELDNAMES`` order, with repeated strings such as customer,
+    project, task and employee interned, so an entry can still be written
+    back to the raw hours CSV unchanged.
+
+    Use ``TimeEntry.from_dict`` to build an entry from an AgileDay API
+    response or a raw hours CSV row.
+    """
+    project_id: str
+    project_name: str
+    project_task: str
+    customer_name: str
+    employee_email: str
+    employee_company: str
+    date: Optional[datetime.date]
+    minutes: float
+    hours: float
+    billable: bool
+    task_hourly_price: Optional[float]
+    opening_hourly_price: Optional[float]
+    values: Tuple[Any, ...]
+    extra: Optional[Dict[str, Any]] = None
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any]) -> 'TimeEntry':
+        """Parse an entry from an API response item or a raw hours CSV row.
+
+        Invalid numbers are logged and treated as missing.
+
+        Parameters
+        ----------
+        data : Mapping[str, Any]
+            Entry fields; API items carry typed values, CSV rows strings
+
+        Returns
+        -------
+        TimeEntry
+            Parsed entry
+        """
+        values = [data.get(name) for name in RAW_FIELDNAMES]
+        for index in _INTERNED_INDEXES:
+            value = values[index]
+            if type(value) is str:
+                values[index] = sys.intern(value)
+
+        extra = {key: value for key, value in data.items() if key not in _FIELD_INDEX} or None
+
+        try:
+            minutes = _parse_float(data.get('actualMinutes')) or 0.0
+            hours = _parse_float(data.get('actualHours')) or 0.0
+            task_hourly_price = _parse_float(data.get('taskHourlyPrice'))
+            opening_hourly_price = _parse_float(data.get('openingHourlyPrice'))
+        except (ValueError, TypeError) as e:
+            logger.warning("Failed to convert numeric fields for entry %s: %s", data.get('timeEntryId'), e)
+            minutes = hours = 0.0
+            task_hourly_price = opening_hourly_price = None
+
+        date_str = data.get('date')
+        return cls(
+            project_id=values[_FIELD_INDEX['projectId']] or '',
+            project_name=values[_FIELD_INDEX['projectName']] or '',
+            project_task=values[_FIELD_INDEX['projectTask']] or '',
+            customer_name=values[_FIELD_INDEX['customerName']] or '',
+            employee_email=values[_FIELD_INDEX['employeeEmail']] or '',
+            employee_company=values[_FIELD_INDEX['employeeCompany']] or '',
+            date=_parse_date(date_str) if date_str else None,
+            minutes=minutes,
+            hours=hours,
+            billable=_parse_bool(data.get('billable')),
+            task_hourly_price=task_hourly_price,
+            opening_hourly_price=opening_hourly_price,
+            values=tuple(values),
+            extra=extra
+        )
+
+    @property
+    def hours_from_minutes(self) -> float:
+        """Hours derived from ``actualMinutes``, as used for invoicing."""
+        return self.minutes / 60.0
+
+    @property
+    def project_type(self) -> Optional[str]:
+        """Raw ``projectType``, e.g. "External"."""
+        return self.values[_PROJECT_TYPE_INDEX]
+
+    @property
+    def hourly_rate(self) -> float:
+        """Task rate, falling back to the opening rate, or 0 if neither is set."""
+        return self.task_hourly_price or self.opening_hourly_price or 0.0
+
+    def get(self, name: str, default: Any = None) -> Any:
+        """Return a raw field value, like ``dict.get`` on the original entry.
+
+        Missing and null values both return the default.
+
+        Parameters
+        ----------
+        name : str
+            Field name
+        default : Any, optional
+            Value returned when the field is missing, defaults to None
+
+        Returns
+        -------
+        Any
+            Raw value as received
+        """
+        index = _FIELD_INDEX.get(name)
+        if index is not None:
+            value = self.values[index]
+            return default if value is None else value
+        if self.extra is not None:
+            return self.extra.get(name, default)
+        return default
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the raw fields as a dictionary.
+
+        Returns
+        -------
+        Dict[str, Any]
+            Raw fields, including any fields outside ``RAW_FIELDNAMES``
+        """
+        data = dict(zip(RAW_FIELDNAMES, self.values))
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+
+def parse_time_entries(entries: Iterable[Mapping[str, Any]]) -> List[TimeEntry]:
+    """Parse a batch of API items or CSV rows into time entries.
+
+    Parameters
+    ----------
+    entries : Iterable[Mapping[str, Any]]
+        API response items or raw hours CSV rows
+
+    Returns
+    -------
+    List[TimeEntry]
+        Parsed entries in input order
+    """
+    return [TimeEntry.from_dict(entry) for entry in entries]
+
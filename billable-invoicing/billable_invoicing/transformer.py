@@ -2,12 +2,13 @@
 
 import csv
 import logging
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict, List, TypedDict, TypeVar
+from typing import Any, Dict, Iterable, List, Set, Tuple, TypedDict
 
-logger = logging.getLogger(__name__)
+from .time_entry import RAW_FIELDNAMES, TimeEntry
 
-T = TypeVar('T', bound=Dict[str, Any])
+logger = logging.getLogger(__name__)
 
 class ProjectSummary(TypedDict):
     """Type definition for project summary data."""
@@ -15,35 +16,220 @@ class ProjectSummary(TypedDict):
     projectName: str
     projectTask: str
     projectId: str
-    billable: str
+    billable: bool
     totalHours: float
     hourlyRate: float
     totalAmount: float
 
+def _new_summary(entry: TimeEntry) -> ProjectSummary:
+    """Start an empty summary described by its first entry."""
+    return ProjectSummary(
+        customerName=entry.customer_name,
+        projectName=entry.project_name,
+        projectTask=entry.project_task,
+        projectId=entry.project_id,
+        billable=entry.billable,
+        totalHours=0.0,
+        hourlyRate=0.0,
+        totalAmount=0.0
+    )
+
+class _SummaryGroup:
+    """Running totals of a summary, described by its first entry."""
+    
+    __slots__ = ('entry', 'total_hours', 'hourly_rate', 'total_amount')
+    
+    def __init__(self, entry: TimeEntry):
+        self.entry = entry
+        self.total_hours = 0.0
+        self.hourly_rate = 0.0
+        self.total_amount = 0.0
+    
+    def add(self, hours: float, rate: float, amount: float) -> None:
+        """Add the hours and amount of an entry, updating the weighted hourly rate."""
+        total = self.total_hours = self.total_hours + hours
+        if rate > 0:
+            # Weighted average for hourly rate
+            self.hourly_rate = ((total - hours) * self.hourly_rate + amount) / total if total > 0 else 0
+        self.total_amount += amount
+    
+    def summary(self) -> ProjectSummary:
+        """Return the totals as a project summary."""
+        summary = _new_summary(self.entry)
+        summary['totalHours'] = self.total_hours
+        summary['hourlyRate'] = self.hourly_rate
+        summary['totalAmount'] = self.total_amount
+        return summary
+
+@dataclass
+class Rollup:
+    """Project summaries of a set of entries."""
+    project_summaries: List[ProjectSummary]
+    task_summaries: List[ProjectSummary]
+    projects_with_hours: Set[str]
+
+class SummaryAggregator:
+    """
+    Compute every rollup of a fetch-hours run in a single pass over the entries.
+    
+    One traversal collects the entry counts, the project IDs and the
+    customer/project and customer/project/task summaries of all entries.
+    The same pass aggregates the billable entries with a project ID, which
+    are the filtered entries whenever the data of all their projects could
+    be fetched; only when some project is missing are the filtered
+    summaries recomputed from the remaining entries.
+    
+    Summaries are in order of first appearance and hold exactly the values
+    that summarizing the entries one rollup at a time produces.
+    """
+    
+    def __init__(self):
+        """Initialize empty rollups."""
+        self.total_count = 0
+        self.external_count = 0
+        self.billable_count = 0
+        self.project_ids: Set[str] = set()
+        self._projects: Dict[Tuple[str, ...], _SummaryGroup] = {}
+        self._tasks: Dict[Tuple[str, ...], _SummaryGroup] = {}
+        self._candidates: List[TimeEntry] = []
+        self._candidate_projects: Dict[Tuple[str, ...], _SummaryGroup] = {}
+        self._candidate_tasks: Dict[Tuple[str, ...], _SummaryGroup] = {}
+    
+    def consume(self, entries: Iterable[TimeEntry]) -> 'SummaryAggregator':
+        """
+        Add entries to the rollups.
+        
+        Parameters
+        ----------
+        entries : Iterable[TimeEntry]
+            Parsed time entries, consumed in a single pass
+            
+        Returns
+        -------
+        SummaryAggregator
+            The aggregator itself, for chaining
+        """
+        projects = self._projects
+        tasks = self._tasks
+        candidates = self._candidates
+        candidate_projects = self._candidate_projects
+        candidate_tasks = self._candidate_tasks
+        project_ids = self.project_ids
+        total_count = external_count = billable_count = 0
+        
+        for entry in entries:
+            total_count += 1
+            if entry.project_type == 'External':
+                external_count += 1
+            
+            project_id = entry.project_id
+            if project_id:
+                project_ids.add(project_id)
+            
+            hours = entry.hours
+            rate = entry.hourly_rate
+            amount = hours * rate
+            project_key = (entry.customer_name, entry.project_name)
+            task_key = (entry.customer_name, entry.project_name, entry.project_task, project_id)
+            
+            group = projects.get(project_key)
+            if group is None:
+                group = projects[project_key] = _SummaryGroup(entry)
+            group.add(hours, rate, amount)
+            
+            group = tasks.get(task_key)
+            if group is None:
+                group = tasks[task_key] = _SummaryGroup(entry)
+            group.add(hours, rate, amount)
+            
+            if not entry.billable:
+                continue
+            billable_count += 1
+            if not project_id:
+                continue
+            
+            # Billable entries with a project are the filtered entries if their project is known
+            candidates.append(entry)
+            group = candidate_projects.get(project_key)
+            if group is None:
+                group = candidate_projects[project_key] = _SummaryGroup(entry)
+            group.add(hours, rate, amount)
+            
+            group = candidate_tasks.get(task_key)
+            if group is None:
+                group = candidate_tasks[task_key] = _SummaryGroup(entry)
+            group.add(hours, rate, amount)
+        
+        self.total_count += total_count
+        self.external_count += external_count
+        self.billable_count += billable_count
+        return self
+    
+    @staticmethod
+    def _summaries(groups: Dict[Tuple[str, ...], _SummaryGroup]) -> List[ProjectSummary]:
+        """Convert running group totals to summaries."""
+        return [group.summary() for group in groups.values()]
+    
+    def complete(self) -> Rollup:
+        """
+        Return the summaries of all entries.
+        
+        Returns
+        -------
+        Rollup
+            Customer/project and customer/project/task summaries of all entries
+        """
+        return Rollup(
+            project_summaries=self._summaries(self._projects),
+            task_summaries=self._summaries(self._tasks),
+            projects_with_hours=set(self.project_ids)
+        )
+    
+    def filtered(self, project_data: Dict[str, Dict[str, Any]]) -> Tuple[List[TimeEntry], Rollup]:
+        """
+        Return the billable entries of known projects and their summaries.
+        
+        Selects the same entries as ``TimeEntryTransformer.filter_entries``.
+        
+        Parameters
+        ----------
+        project_data : Dict[str, Dict[str, Any]]
+            Dictionary of project data keyed by project ID
+            
+        Returns
+        -------
+        Tuple[List[TimeEntry], Rollup]
+            Filtered entries in their original order, and their summaries
+        """
+        candidate_ids = {key[3] for key in self._candidate_tasks}
+        unknown_ids = candidate_ids - project_data.keys()
+        
+        if not unknown_ids:
+            filtered = self._candidates
+            rollup = Rollup(
+                project_summaries=self._summaries(self._candidate_projects),
+                task_summaries=self._summaries(self._candidate_tasks),
+                projects_with_hours=candidate_ids
+            )
+        else:
+            for project_id in sorted(unknown_ids):
+                logger.debug("Skipping entries - no project data found for ID: %s", project_id)
+            filtered = [entry for entry in self._candidates if entry.project_id not in unknown_ids]
+            rollup = SummaryAggregator().consume(filtered).complete()
+        
+        logger.info(
+            "Filtered %d entries down to %d billable entries",
+            self.total_count,
+            len(filtered)
+        )
+        return filtered, rollup
+
 class TimeEntryTransformer:
     """Transform time entries to CSV format."""
     
     def __init__(self):
         """Initialize the transformer with the raw data field names."""
-        self.fieldnames = [
-            'customerName', 'customerExternalId', 'customerId', 'projectType',
-            'projectSubtype', 'projectName', 'projectId', 'projectExternalId',
-            'projectTask', 'entryType', 'OpeningName', 'openingId', 'date',
-            'employeeName', 'employeeEmail', 'employeeExternalId', 'employeeId',
-            'billable', 'actualMinutes', 'actualHours', 'actualDays',
-            'allocatedMinutes', 'allocatedHours', 'allocatedDays',
-            'deviationMinutes', 'deviationHours', 'deviationDays', 'notes',
-            'status', 'openingHourlyPrice', 'openingBasedRevenue',
-            'openingCurrency', 'taskHourlyPrice', 'taskBasedRevenue',
-            'taskCurrency', 'standardCostRate', 'standardCosts',
-            'standardCostCurrency', 'employeePrimaryTeam',
-            'employeePrimaryTeamExternalId', 'employeePrimaryTeamId',
-            'employeeBusinessUnit', 'employeeBusinessUnitExternalId',
-            'employeeBusinessUnitId', 'employeeCompany',
-            'employeeCompanyExternalId', 'employeeCompanyId', 'employeeCountry',
-            'projectCommercialModel', 'taskId', 'taskExternalId', 'timeEntryId',
-            'timeEntryExternalId', 'customerBusinessId', 'customerFinancialId'
-        ]
+        self.fieldnames = list(RAW_FIELDNAMES)
         
         self.summary_fieldnames = [
             'customerName',
@@ -70,59 +256,104 @@ class TimeEntryTransformer:
         """
         self.customer_data = customer_data
     
-    def calculate_project_summaries(self, entries: List[Dict[str, Any]]) -> None:
+    def aggregate(self, entries: Iterable[TimeEntry]) -> SummaryAggregator:
         """
-        Calculate and display project-wise summaries.
+        Compute every rollup of the entries in a single pass.
         
         Parameters
         ----------
-        entries : List[Dict[str, Any]]
-            List of time entries from AgileDay
+        entries : Iterable[TimeEntry]
+            Parsed time entries from AgileDay
+            
+        Returns
+        -------
+        SummaryAggregator
+            Counts, project IDs and summaries of the entries
         """
-        # Group entries by customer and project
-        summaries: Dict[tuple[str, str], ProjectSummary] = {}
+        return SummaryAggregator().consume(entries)
+    
+    def _summarize(
+        self,
+        entries: Iterable[TimeEntry],
+        by_task: bool
+    ) -> Tuple[List[ProjectSummary], Set[str]]:
+        """
+        Aggregate entries into project summaries.
         
-        for entry in entries:
-            key = (entry.get('customerName', ''), entry.get('projectName', ''))
-            if key not in summaries:
-                summaries[key] = ProjectSummary(
-                    customerName=entry.get('customerName', ''),
-                    projectName=entry.get('projectName', ''),
-                    projectTask=entry.get('projectTask', ''),
-                    projectId=entry.get('projectId', ''),
-                    billable=entry.get('billable', ''),
-                    totalHours=0.0,
-                    hourlyRate=0.0,
-                    totalAmount=0.0
-                )
-            
-            summary = summaries[key]
+        The entries are consumed in a single pass, so entries parsed lazily
+        from ``AgileDayClient.iter_time_entries`` can be passed directly.
+        
+        Parameters
+        ----------
+        entries : Iterable[TimeEntry]
+            Parsed time entries from AgileDay
+        by_task : bool
+            Group by customer, project, task and project ID instead of
+            customer and project
             
-            # Add hours
-            hours = float(entry.get('actualHours', 0) or 0)
-            summary['totalHours'] += hours
+        Returns
+        -------
+        Tuple[List[ProjectSummary], Set[str]]
+            Summaries in order of first appearance, and the IDs of the
+            projects that have entries
+        """
+        groups: Dict[Tuple[str, ...], _SummaryGroup] = {}
+        
+        # Track which projects have hours
+        projects_with_hours: Set[str] = set()
+        
+        for entry in entries:
+            project_id = entry.project_id
+            if project_id:
+                projects_with_hours.add(project_id)
             
-            # Get hourly rate (prefer task rate over opening rate)
-            rate = float(entry.get('taskHourlyPrice', 0) or entry.get('openingHourlyPrice', 0) or 0)
-            if rate > 0:
-                # Weighted average for hourly rate
-                old_total = summary['totalHours'] - hours
-                summary['hourlyRate'] = (
-                    (old_total * summary['hourlyRate'] + hours * rate) / 
-                    summary['totalHours'] if summary['totalHours'] > 0 else 0
-                )
+            if by_task:
+                key = (entry.customer_name, entry.project_name, entry.project_task, project_id)
+            else:
+                key = (entry.customer_name, entry.project_name)
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = _SummaryGroup(entry)
             
-            # Calculate amount
-            summary['totalAmount'] += hours * rate
+            # Prefer task rate over opening rate
+            hours = entry.hours
+            rate = entry.hourly_rate
+            group.add(hours, rate, hours * rate)
         
-        # Print summaries
+        return [group.summary() for group in groups.values()], projects_with_hours
+    
+    def calculate_project_summaries(self, entries: Iterable[TimeEntry]) -> None:
+        """
+        Calculate and display project-wise summaries.
+        
+        The entries are consumed in a single pass, so entries parsed lazily
+        from ``AgileDayClient.iter_time_entries`` can be passed directly.
+        
+        Parameters
+        ----------
+        entries : Iterable[TimeEntry]
+            Parsed time entries from AgileDay
+        """
+        # Group entries by customer and project
+        summaries, _ = self._summarize(entries, by_task=False)
+        self.log_project_summaries(summaries)
+    
+    def log_project_summaries(self, summaries: List[ProjectSummary]) -> None:
+        """
+        Display customer/project summaries, highest amount first.
+        
+        Parameters
+        ----------
+        summaries : List[ProjectSummary]
+            Summaries grouped by customer and project
+        """
         if not summaries:
             logger.info("No entries to summarize")
             return
         
         # Calculate totals
-        total_hours = sum(s['totalHours'] for s in summaries.values())
-        total_amount = sum(s['totalAmount'] for s in summaries.values())
+        total_hours = sum(s['totalHours'] for s in summaries)
+        total_amount = sum(s['totalAmount'] for s in summaries)
         
         # Print header
         logger.info("\nProject Summaries:")
@@ -134,7 +365,7 @@ class TimeEntryTransformer:
         logger.info("-" * 100)
         
         # Print each project
-        for summary in sorted(summaries.values(), key=lambda x: (-x['totalAmount'], x['customerName'])):
+        for summary in sorted(summaries, key=lambda x: (-x['totalAmount'], x['customerName'])):
             logger.info(
                 "%-30s %-30s %10.2f %12.2f %15.2f",
                 summary['customerName'][:30],
@@ -157,68 +388,47 @@ class TimeEntryTransformer:
     
     def write_summaries_to_csv(
         self,
-        entries: List[Dict[str, Any]],
+        entries: Iterable[TimeEntry],
         output_path: str | Path
     ) -> None:
         """
         Write project summaries to CSV, grouped by customer, project, and task.
         Also logs warnings for projects with no hours.
         
+        The entries are consumed in a single pass, so entries parsed lazily
+        from ``AgileDayClient.iter_time_entries`` can be passed directly.
+        
         Parameters
         ----------
-        entries : List[Dict[str, Any]]
-            List of time entries from AgileDay
+        entries : Iterable[TimeEntry]
+            Parsed time entries from AgileDay
         output_path : str | Path
             Path to save the CSV file
         """
         # Group entries by customer, project, and task
-        summaries: Dict[tuple[str, str, str, str], ProjectSummary] = {}
-        
-        # Track which projects have hours
-        projects_with_hours: set[str] = set()
-        
-        for entry in entries:
-            project_id = entry.get('projectId', '')
-            if project_id:
-                projects_with_hours.add(project_id)
-            
-            key = (
-                entry.get('customerName', ''),
-                entry.get('projectName', ''),
-                entry.get('projectTask', ''),
-                project_id
-            )
-            if key not in summaries:
-                summaries[key] = ProjectSummary(
-                    customerName=entry.get('customerName', ''),
-                    projectName=entry.get('projectName', ''),
-                    projectTask=entry.get('projectTask', ''),
-                    projectId=project_id,
-                    billable=entry.get('billable', ''),
-                    totalHours=0.0,
-                    hourlyRate=0.0,
-                    totalAmount=0.0
-                )
-            
-            summary = summaries[key]
-            
-            # Add hours
-            hours = float(entry.get('actualHours', 0) or 0)
-            summary['totalHours'] += hours
-            
-            # Get hourly rate (prefer task rate over opening rate)
-            rate = float(entry.get('taskHourlyPrice', 0) or entry.get('openingHourlyPrice', 0) or 0)
-            if rate > 0:
-                # Weighted average for hourly rate
-                old_total = summary['totalHours'] - hours
-                summary['hourlyRate'] = (
-                    (old_total * summary['hourlyRate'] + hours * rate) / 
-                    summary['totalHours'] if summary['totalHours'] > 0 else 0
-                )
-            
-            # Calculate amount
-            summary['totalAmount'] += hours * rate
+        summaries, projects_with_hours = self._summarize(entries, by_task=True)
+        self.write_rollup_to_csv(summaries, projects_with_hours, output_path)
+    
+    def write_rollup_to_csv(
+        self,
+        summaries: List[ProjectSummary],
+        projects_with_hours: Set[str],
+        output_path: str | Path
+    ) -> None:
+        """
+        Write customer/project/task summaries to CSV.
+        Also logs warnings for active projects with no hours.
         
+        Parameters
+        ----------
+        summaries : List[ProjectSummary]
+            Summaries grouped by customer, project, task and project ID,
+            in order of first appearance
+        projects_with_hours : Set[str]
+            IDs of the projects that have entries
+        output_path : str | Path
+            Path to save the CSV file
+        """
         # Log warnings for projects without hours
         for project_id, project in self.customer_data.items():
             if project.get('Active', '').lower() == 'yes' and project_id not in projects_with_hours:
@@ -240,7 +450,7 @@ class TimeEntryTransformer:
             
             # Write sorted summaries
             for summary in sorted(
-                summaries.values(),
+                summaries,
                 key=lambda x: (
                     x['customerName'],
                     x['projectName'],
@@ -250,8 +460,8 @@ class TimeEntryTransformer:
                 writer.writerow(summary)
             
             # Write total row
-            total_hours = sum(s['totalHours'] for s in summaries.values())
-            total_amount = sum(s['totalAmount'] for s in summaries.values())
+            total_hours = sum(s['totalHours'] for s in summaries)
+            total_amount = sum(s['totalAmount'] for s in summaries)
             
             writer.writerow({
                 'customerName': 'TOTAL',
@@ -266,17 +476,17 @@ class TimeEntryTransformer:
     
     def filter_entries(
         self,
-        entries: List[T],
+        entries: Iterable[TimeEntry],
         company: str,
         project_data: Dict[str, Dict[str, Any]]
-    ) -> List[T]:
+    ) -> List[TimeEntry]:
         """
         Filter time entries based on billable status.
         
         Parameters
         ----------
-        entries : List[Dict[str, Any]]
-            List of time entries from AgileDay
+        entries : Iterable[TimeEntry]
+            Parsed time entries from AgileDay
         company : str
             Unused parameter, kept for backward compatibility
         project_data : Dict[str, Dict[str, Any]]
@@ -284,13 +494,15 @@ class TimeEntryTransformer:
             
         Returns
         -------
-        List[Dict[str, Any]]
+        List[TimeEntry]
             Filtered list of time entries
         """
-        filtered: List[T] = []
+        filtered: List[TimeEntry] = []
+        total = 0
         
         for entry in entries:
-            project_id = entry.get('projectId')
+            total += 1
+            project_id = entry.project_id
             if not project_id or project_id not in project_data:
                 logger.debug(
                     "Skipping entry - no project data found for ID: %s",
@@ -299,48 +511,56 @@ class TimeEntryTransformer:
                 continue
             
             # Only include billable entries
-            if entry.get('billable') == True:
+            if entry.billable:
                 filtered.append(entry)
         
         logger.info(
             "Filtered %d entries down to %d billable entries",
-            len(entries),
+            total,
             len(filtered)
         )
         return filtered
     
     def transform_to_csv(
         self,
-        entries: List[Dict[str, Any]],
+        entries: Iterable[TimeEntry],
         output_path: str | Path
-    ) -> None:
+    ) -> int:
         """
         Write raw time entries to CSV format.
         
+        Entries are written as they are consumed, so entries parsed lazily
+        from ``AgileDayClient.iter_time_entries`` are streamed straight to disk.
+        
         Parameters
         ----------
-        entries : List[Dict[str, Any]]
-            List of time entries from AgileDay
+        entries : Iterable[TimeEntry]
+            Parsed time entries from AgileDay
         output_path : str | Path
             Path to save the CSV file
             
+        Returns
+        -------
+        int
+            Number of entries written
+            
         Raises
         ------
         IOError
             If there's an error writing to the file
         """
         output_path = Path(output_path)
-        logger.info("Writing %d entries to %s", len(entries), output_path)
+        logger.info("Writing entries to %s", output_path)
+        count = 0
         
         with output_path.open('w', newline='') as csvfile:
-            writer = csv.DictWriter(
-                csvfile,
-                fieldnames=self.fieldnames,
-                extrasaction='ignore'
-            )
-            writer.writeheader()
+            writer = csv.writer(csvfile)
+            writer.writerow(self.fieldnames)
             
+            # Raw values are kept in field order, so rows need no dict lookups
             for entry in entries:
-                writer.writerow(entry)
+                writer.writerow(entry.values)
+                count += 1
         
-        logger.debug("Successfully wrote entries to CSV file") 
\ No newline at end of file
+        logger.debug("Successfully wrote %d entries to CSV file", count)
+        return count 
\ No newline at end of file
@@ -0,0 +1,344 @@
+"""Utilization fact cube: hours and euros of time entries by dimension."""
+
+import datetime
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .time_entry import TimeEntry
+
+# Dimensions of a cube cell, in key order
+DIMENSIONS = ('project', 'task', 'employee', 'role', 'week', 'billable')
+
+# Week of entries without a date
+NO_WEEK = -1
+
+
+def week_of(day: Optional[datetime.date]) -> int:
+    """Return the ISO week of a date as the ordinal of its Monday.
+
+    Parameters
+    ----------
+    day : Optional[datetime.date]
+        Date of an entry
+
+    Returns
+    -------
+    int
+        Ordinal of the Monday starting the week, or ``NO_WEEK`` without a date
+    """
+    if day is None:
+        return NO_WEEK
+    return day.toordinal() - day.weekday()
+
+
+@dataclass
+class UtilizationCube:
+    """Hours and euros of time entries by project, task, employee, role,
+    ISO week and billability.
+
+    The cube is sparse: there is one cell per combination of dimension
+    values that has entries, stored column-wise in arrays of equal length.
+    The project, task, employee and role columns hold codes into the
+    label lists, ``week`` the ordinal of the Monday of the ISO week
+    (``NO_WEEK`` for entries without a date), and ``billable`` the
+    billability of the entries. The measures are the summed ``minutes``,
+    kept in minutes so that sums are exact, and ``euros``, the billable
+    hours times the rate of the project task.
+
+    Reports are roll-ups over some of the dimensions, see ``rollup``. The
+    project and project task attributes keep what the reports show of the
+    first entry: the project name and rate of every project, including
+    projects without included hours, and the name and rate of every
+    project task in the cube.
+    """
+    projects: List[str]
+    project_names: List[str]
+    project_rates: List[float]
+    tasks: List[str]
+    employees: List[str]
+    roles: List[str]
+    project_tasks: List[Tuple[int, int]]
+    project_task_names: List[str]
+    project_task_rates: List[float]
+    project: np.ndarray
+    task: np.ndarray
+    employee: np.ndarray
+    role: np.ndarray
+    week: np.ndarray
+    billable: np.ndarray
+    minutes: np.ndarray
+    euros: np.ndarray
+    first_day: Optional[datetime.date] = None
+    last_day: Optional[datetime.date] = None
+
+    def __len__(self) -> int:
+        return len(self.minutes)
+
+    @property
+    def hours(self) -> np.ndarray:
+        """Hours of each cell."""
+        return self.minutes / 60.0
+
+    def rollup(
+        self,
+        dimensions: Sequence[str],
+        measure: str = 'minutes',
+        where: Optional[np.ndarray] = None
+    ) -> Dict[Tuple[int, ...], float]:
+        """Sum a measure over all dimensions but the given ones.
+
+        Parameters
+        ----------
+        dimensions : Sequence[str]
+            Dimensions to keep, from ``DIMENSIONS``
+        measure : str, optional
+            ``minutes``, ``hours`` or ``euros``, defaults to ``minutes``
+        where : Optional[np.ndarray]
+            Boolean mask of the cells to include, defaults to all cells
+
+        Returns
+        -------
+        Dict[Tuple[int, ...], float]
+            Sums keyed by the codes of the kept dimensions, for the
+            combinations that have cells
+        """
+        values = getattr(self, measure)
+        keys = np.stack([getattr(self, name).astype(np.int64) for name in dimensions], axis=1)
+        if where is not None:
+            values = values[where]
+            keys = keys[where]
+        if not len(values):
+            return {}
+        groups, inverse = np.unique(keys, axis=0, return_inverse=True)
+        sums = np.bincount(inverse.ravel(), weights=values, minlength=len(groups))
+        return {tuple(group): total for group, total in zip(groups.tolist(), sums.tolist())}
+
+
+class CubeBuilder:
+    """Build a ``UtilizationCube`` from time entries in one pass.
+
+    Entries are summed into their cell as they are added, so memory
+    grows with the number of cells, not of entries::
+
+        builder = CubeBuilder()
+        project = builder.add_project(project_id, first_entry)
+        builder.add(project, entry, email, role)
+        cube = builder.build()
+    """
+
+    def __init__(self) -> None:
+        self._codes: Dict[str, Dict[str, int]] = {
+            'project': {}, 'task': {}, 'employee': {}, 'role': {}
+        }
+        self._project_names: List[str] = []
+        self._project_rates: List[float] = []
+        self._project_tasks: Dict[Tuple[int, int], int] = {}
+        self._project_task_names: List[str] = []
+        self._project_task_rates: List[float] = []
+        self._cells: Dict[Tuple[int, int, int, int, int, bool], int] = {}
+        self._cell_pairs: List[int] = []
+        self._minutes: List[float] = []
+        self.first_day: Optional[datetime.date] = None
+        self.last_day: Optional[datetime.date] = None
+
+    def _code(self, dimension: str, label: str) -> int:
+        codes = self._codes[dimension]
+        code = codes.get(label)
+        if code is None:
+            code = codes[label] = len(codes)
+        return code
+
+    def add_project(self, project_id: str, first_entry: TimeEntry) -> int:
+        """Register a project with the attributes of its first entry.
+
+        Parameters
+        ----------
+        project_id : str
+            AgileDay project ID
+        first_entry : TimeEntry
+            First entry of the project, included or not
+
+        Returns
+        -------
+        int
+            Project code to pass to ``add``
+        """
+        project = self._code('project', project_id)
+        if project == len(self._project_names):
+            self._project_names.append(first_entry.get('projectName', 'Unknown'))
+            self._project_rates.append(first_entry.task_hourly_price or 0.0)
+        return project
+
+    def add(self, project: int, entry: TimeEntry, email: str, role: str) -> None:
+        """Add an included entry to its cell.
+
+        Parameters
+        ----------
+        project : int
+            Project code from ``add_project``
+        entry : TimeEntry
+            Time entry of the project
+        email : str
+            Employee email, empty if the entry has none
+        role : str
+            Role of the employee, empty without an email
+        """
+        task = self._code('task', entry.project_task)
+        pair = (project, task)
+        if pair not in self._project_tasks:
+            self._project_tasks[pair] = len(self._project_tasks)
+            self._project_task_names.append(entry.project_name)
+            self._project_task_rates.append(entry.task_hourly_price or 0.0)
+
+        key = (
+            project,
+            task,
+            self._code('employee', email),
+            self._code('role', role),
+            week_of(entry.date),
+            entry.billable
+        )
+        cell = self._cells.get(key)
+        if cell is None:
+            cell = self._cells[key] = len(self._cells)
+            self._cell_pairs.append(self._project_tasks[pair])
+            self._minutes.append(0.0)
+        self._minutes[cell] += entry.minutes
+
+        day = entry.date
+        if day:
+            if self.first_day is None or day < self.first_day:
+                self.first_day = day
+            if self.last_day is None or day > self.last_day:
+                self.last_day = day
+
+    def build(self) -> UtilizationCube:
+        """Return the cube of the added entries.
+
+        Returns
+        -------
+        UtilizationCube
+            Cube with one cell per combination of dimension values
+        """
+        keys = np.array(list(self._cells), dtype=np.int64).reshape(len(self._cells), len(DIMENSIONS))
+        billable = keys[:, 5].astype(bool)
+        minutes = np.array(self._minutes, dtype=np.float64)
+        rates = np.array(self._project_task_rates, dtype=np.float64)[np.array(self._cell_pairs, dtype=np.int64)]
+        return UtilizationCube(
+            projects=list(self._codes['project']),
+            project_names=self._project_names,
+            project_rates=self._project_rates,
+            tasks=list(self._codes['task']),
+            employees=list(self._codes['employee']),
+            roles=list(self._codes['role']),
+            project_tasks=list(self._project_tasks),
+            project_task_names=self._project_task_names,
+            project_task_rates=self._project_task_rates,
+            project=keys[:, 0].astype(np.int32),
+            task=keys[:, 1].astype(np.int32),
+            employee=keys[:, 2].astype(np.int32),
+            role=keys[:, 3].astype(np.int32),
+            week=keys[:, 4].astype(np.int32),
+            billable=billable,
+            minutes=minutes,
+            euros=np.where(billable, minutes / 60.0 * rates, 0.0),
+            first_day=self.first_day,
+            last_day=self.last_day
+        )
+
+
+# Label list of each coded dimension
+_LABELS = {'project': 'projects', 'task': 'tasks', 'employee': 'employees', 'role': 'roles'}
+
+
+def merge_cubes(cubes: Sequence[UtilizationCube]) -> UtilizationCube:
+    """Combine cubes, e.g. of consecutive months, into one.
+
+    Labels are matched by value and cells with the same dimension values
+    are summed, so a week spanning two months becomes one cell again.
+    Project and project task attributes are taken from the first cube
+    that has the project or project task, so pass the cubes in date order.
+    Euros are recomputed at the rates of the combined project tasks, so
+    the result is the cube of the whole range of the cubes.
+
+    Parameters
+    ----------
+    cubes : Sequence[UtilizationCube]
+        Cubes to combine
+
+    Returns
+    -------
+    UtilizationCube
+        Cube with the cells of all cubes
+    """
+    codes: Dict[str, Dict[str, int]] = {dimension: {} for dimension in _LABELS}
+    project_names: List[str] = []
+    project_rates: List[float] = []
+    project_tasks: Dict[Tuple[int, int], int] = {}
+    project_task_names: List[str] = []
+    project_task_rates: List[float] = []
+    keys: List[np.ndarray] = [np.empty((0, len(DIMENSIONS)), dtype=np.int64)]
+    minutes: List[np.ndarray] = [np.empty(0)]
+    first_days = [cube.first_day for cube in cubes if cube.first_day is not None]
+    last_days = [cube.last_day for cube in cubes if cube.last_day is not None]
+
+    for cube in cubes:
+        # Map the codes of the cube to the combined codes
+        mappings: Dict[str, np.ndarray] = {}
+        for dimension, labels_name in _LABELS.items():
+            dimension_codes = codes[dimension]
+            mappings[dimension] = np.array(
+                [dimension_codes.setdefault(label, len(dimension_codes)) for label in getattr(cube, labels_name)],
+                dtype=np.int64
+            )
+        project_map = mappings['project'].tolist()
+        task_map = mappings['task'].tolist()
+        for project, name, rate in zip(project_map, cube.project_names, cube.project_rates):
+            if project == len(project_names):
+                project_names.append(name)
+                project_rates.append(rate)
+        for (project, task), name, rate in zip(cube.project_tasks, cube.project_task_names, cube.project_task_rates):
+            pair = (project_map[project], task_map[task])
+            if pair not in project_tasks:
+                project_tasks[pair] = len(project_tasks)
+                project_task_names.append(name)
+                project_task_rates.append(rate)
+
+        keys.append(np.stack([
+            mappings['project'][cube.project],
+            mappings['task'][cube.task],
+            mappings['employee'][cube.employee],
+            mappings['role'][cube.role],
+            cube.week.astype(np.int64),
+            cube.billable.astype(np.int64)
+        ], axis=1))
+        minutes.append(cube.minutes)
+
+    cells, inverse = np.unique(np.concatenate(keys), axis=0, return_inverse=True)
+    billable = cells[:, 5].astype(bool)
+    cell_minutes = np.bincount(inverse.ravel(), weights=np.concatenate(minutes), minlength=len(cells))
+    cell_pairs = np.array([project_tasks[(project, task)] for project, task in cells[:, :2].tolist()], dtype=np.int64)
+    rates = np.array(project_task_rates, dtype=np.float64)[cell_pairs]
+    return UtilizationCube(
+        projects=list(codes['project']),
+        project_names=project_names,
+        project_rates=project_rates,
+        tasks=list(codes['task']),
+        employees=list(codes['employee']),
+        roles=list(codes['role']),
+        project_tasks=list(project_tasks),
+        project_task_names=project_task_names,
+        project_task_rates=project_task_rates,
+        project=cells[:, 0].astype(np.int32),
+        task=cells[:, 1].astype(np.int32),
+        employee=cells[:, 2].astype(np.int32),
+        role=cells[:, 3].astype(np.int32),
+        week=cells[:, 4].astype(np.int32),
+        billable=billable,
+        minutes=cell_minutes,
+        euros=np.where(billable, cell_minutes / 60.0 * rates, 0.0),
+        first_day=min(first_days) if first_days else None,
+        last_day=max(last_days) if last_days else None
+    )
@@ -2,31 +2,66 @@
 
 import csv
 import datetime
+import hashlib
 import logging
 from collections import defaultdict
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+
+import numpy as np
 
 from .agileday import AgileDayClient
-from .config import ROLE_EMAILS
+from .encoding import open_text
+from .external_grouping import ExternalGrouping
+from .monthly_cubes import DEFAULT_SETTLE_DAYS, MonthlyCubeStore, is_settled, month_key, trailing_months
+from .reference_data import ReferenceDataStore, default_store
+from .roles import ROLE_ORDER, RoleIndex
+from .time_entry import RAW_FIELDNAMES, TimeEntry, parse_time_entries
+from .utilization_cube import CubeBuilder, UtilizationCube, merge_cubes
+from .week_index import WeekIndex
 
 logger = logging.getLogger(__name__)
 
 class UtilizationTransformer:
     """Transform time entries to utilization metrics."""
 
-    def __init__(self):
-        """Initialize the transformer."""
+    def __init__(
+        self,
+        agileday_client: Optional[AgileDayClient] = None,
+        reference_data: Optional[ReferenceDataStore] = None,
+        memory_budget_mb: Optional[float] = None,
+        roles_file: Optional[Path] = None
+    ):
+        """Initialize the transformer.
+        
+        Parameters
+        ----------
+        agileday_client : Optional[AgileDayClient]
+            Client used to fetch hours, defaults to a new client
+        reference_data : Optional[ReferenceDataStore]
+            Store the customer file is loaded from, defaults to the shared
+            store with snapshots in the default cache directory
+        memory_budget_mb : Optional[float]
+            Group raw hours files out of core, buffering at most this many
+            megabytes of entries, defaults to None (group in memory)
+        roles_file : Optional[Path]
+            CSV file with Role and Email columns mapping employees to roles,
+            defaults to None (use ``ROLE_EMAILS`` in config.py)
+        """
         self.company_code = "263"
         self.source_system = "Orangit"
-        self.agileday_client = AgileDayClient()
+        self.agileday_client = agileday_client or AgileDayClient()
+        self.reference_data = reference_data or default_store()
+        self.memory_budget_mb = memory_budget_mb
+        self.roles_file = roles_file
+        self.role_index: Optional[RoleIndex] = None
 
     def _fetch_hours(
         self,
         start_date: datetime.date,
         end_date: datetime.date,
         status: str = "Submitted"
-    ) -> List[Dict[str, Any]]:
+    ) -> List[TimeEntry]:
         """Fetch time entries from AgileDay.
         
         Parameters
@@ -40,8 +75,8 @@ class UtilizationTransformer:
             
         Returns
         -------
-        List[Dict[str, Any]]
-            List of time entries matching the criteria
+        List[TimeEntry]
+            List of parsed time entries matching the criteria
         """
         logger.info(
             "Fetching time entries between %s and %s with status %s",
@@ -51,38 +86,16 @@ class UtilizationTransformer:
         )
         
         try:
-            entries = self.agileday_client.get_time_entries(
+            # Minutes, rates and dates are parsed once here
+            entries = parse_time_entries(self.agileday_client.get_time_entries(
                 start_date=datetime.datetime.combine(start_date, datetime.time.min),
                 end_date=datetime.datetime.combine(end_date, datetime.time.max),
                 status=status
-            )
+            ))
             
-            # Convert minutes to hours and get hourly rate
             for entry in entries:
-                if entry.get('actualMinutes'):
-                    try:
-                        entry['actualHours'] = float(entry['actualMinutes']) / 60.0
-                    except (ValueError, TypeError) as e:
-                        logger.warning(f"Failed to convert minutes to hours for entry {entry}: {e}")
-                        entry['actualHours'] = 0.0
-                else:
-                    entry['actualHours'] = 0.0
-                
-                # Get hourly rate from taskHourlyPrice only
-                task_rate = entry.get('taskHourlyPrice', '')
-                if task_rate:
-                    entry['hourlyRate'] = float(task_rate)
-                else:
-                    entry['hourlyRate'] = 0.0
-                
-                # Log the entry to see what fields we have
-                logger.debug(f"Entry fields: {list(entry.keys())}")
-                if 'employeeEmail' in entry:
-                    logger.debug(f"Found employeeEmail: {entry['employeeEmail']}")
-                elif 'employeeEmailAddress' in entry:
-                    logger.debug(f"Found employeeEmailAddress: {entry['employeeEmailAddress']}")
-                else:
-                    logger.warning(f"No email field found in entry: {entry}")
+                if not (entry.employee_email or entry.get('employeeEmailAddress')):
+                    logger.warning(f"No email field found in entry: {entry.to_dict()}")
             
             logger.info("Fetched %d time entries from AgileDay", len(entries))
             return entries
@@ -119,179 +132,191 @@ class UtilizationTransformer:
         Dict[str, Dict[str, Any]]
             Dictionary of customer data keyed by AgileDay project ID
         """
-        customer_data: Dict[str, Dict[str, Any]] = {}
-        encodings = ['utf-8', 'latin1', 'iso-8859-1', 'cp1252']
-        
-        for encoding in encodings:
-            try:
-                with customer_data_path.open('r', newline='', encoding=encoding) as csvfile:
-                    reader = csv.DictReader(csvfile)
-                    # Log the available fields from CSV
-                    logger.info("Customer CSV fields: %s", reader.fieldnames)
-                    for row in reader:
-                        agileday_project_id = row.get('AgileDay_projectId')
-                        if agileday_project_id:
-                            # Log each mapping we create
-                            logger.debug(
-                                "Mapping project ID %s to client '%s', service '%s'",
-                                agileday_project_id,
-                                row.get('Client', 'Unknown'),
-                                row.get('Service name', 'Unknown Service')
-                            )
-                            customer_data[agileday_project_id] = row
-                logger.info("Successfully read customer data with encoding: %s", encoding)
-                break
-            except UnicodeDecodeError:
-                logger.debug("Failed to read with encoding %s, trying next", encoding)
-                continue
-            except Exception as e:
-                logger.error("Failed to read customer data: %s", str(e))
-                raise
+        try:
+            data = self.reference_data.customer_data(customer_data_path)
+        except Exception as e:
+            logger.error("Failed to read customer data: %s", str(e))
+            raise
+        # Log the available fields from CSV
+        logger.info("Customer CSV fields: %s", data.fieldnames)
+        customer_data = dict(data.by_project_id)
+        if logger.isEnabledFor(logging.DEBUG):
+            for agileday_project_id, row in customer_data.items():
+                logger.debug(
+                    "Mapping project ID %s to client '%s', service '%s'",
+                    agileday_project_id,
+                    row.get('Client', 'Unknown'),
+                    row.get('Service name', 'Unknown Service')
+                )
+        logger.info("Successfully read customer data with encoding: %s", data.encoding)
         
         if not customer_data:
-            raise ValueError(f"Failed to read customer data with any of the attempted encodings: {encodings}")
+            raise ValueError(f"No customer records with an AgileDay_projectId in {customer_data_path}")
         
         logger.info("Loaded %d customer records", len(customer_data))
         return customer_data
 
-    def _process_hours(
+    @staticmethod
+    def _group_hours_by_project(entries: Iterable[TimeEntry]) -> Dict[str, List[TimeEntry]]:
+        """Group entries by project ID, skipping entries without a project.
+
+        Parameters
+        ----------
+        entries : Iterable[TimeEntry]
+            Parsed time entries
+
+        Returns
+        -------
+        Dict[str, List[TimeEntry]]
+            Entries by project ID, in order of first appearance
+        """
+        hours_by_project: Dict[str, List[TimeEntry]] = defaultdict(list)
+        for entry in entries:
+            project_id = entry.project_id
+            if project_id:
+                hours_by_project[project_id].append(entry)
+        return hours_by_project
+
+    def _build_cube(
         self,
         customer_data: Dict[str, Dict[str, Any]],
-        entries: List[Dict[str, Any]]
-    ) -> Tuple[Dict[str, List[Dict[str, Any]]], List[Dict[str, Any]]]:
-        """Process hours for all projects.
+        hours_by_project: Mapping[str, Iterable[TimeEntry]]
+    ) -> UtilizationCube:
+        """Aggregate the included hours of all projects into a fact cube.
+
+        Projects in the customer data include the hours given by their
+        ``included_hours`` setting, other projects the hours of Orangit Oy.
 
         Parameters
         ----------
         customer_data : Dict[str, Dict[str, Any]]
             Dictionary of customer data
-        entries : List[Dict[str, Any]]
-            List of time entries from AgileDay
+        hours_by_project : Mapping[str, Iterable[TimeEntry]]
+            Parsed time entries grouped by project ID, in memory or out of
+            core
 
         Returns
         -------
-        Tuple[Dict[str, List[Dict[str, Any]]], List[Dict[str, Any]]]
-            Tuple containing:
-            - Dictionary of processed entries grouped by task
-            - List of projects not found in customer data
+        UtilizationCube
+            Hours and euros of the included entries
         """
-        processed_entries: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
-        projects_not_found: List[Dict[str, Any]] = []
-        
-        # Group entries by project
-        hours_by_project: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
-        for entry in entries:
-            project_id = entry.get('projectId')
-            if project_id:
-                hours_by_project[project_id].append(entry)
-        
-        # Process each project
+        builder = CubeBuilder()
         for project_id, project_entries in hours_by_project.items():
             customer_info = customer_data.get(project_id, {})
-            
-            # Filter hours based on included_hours setting
-            included_hours = customer_info.get('included_hours', '').strip()
-            filtered_entries = []
-            
+            # Projects not in customer data include all Orangit Oy hours
+            included_hours = customer_info.get('included_hours', '').strip().lower() if customer_info else 'orangit'
+            project = None
             for entry in project_entries:
-                # If project is in customer data, check included_hours setting
-                if customer_info:
-                    if included_hours.lower() == 'all':
-                        filtered_entries.append(entry)
-                    elif included_hours.lower() == 'orangit':
-                        employee_company = entry.get('employeeCompany', '')
-                        if employee_company.lower() == 'orangit oy'.lower():
-                            filtered_entries.append(entry)
-                else:
-                    # If project is not in customer data, include all Orangit Oy hours
-                    employee_company = entry.get('employeeCompany', '')
-                    if employee_company.lower() == 'orangit oy'.lower():
-                        filtered_entries.append(entry)
-            
-            # Group entries by task
-            hours_by_task: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
-            for entry in filtered_entries:
-                task_name = entry.get('projectTask', '')
-                hours_by_task[task_name].append(entry)
-            
-            # Process each task
-            for task_name, task_entries in hours_by_task.items():
-                try:
-                    total_hours = sum(float(entry.get('actualHours', 0)) for entry in task_entries)
-                    billable_hours = sum(
-                        float(entry.get('actualHours', 0))
-                        for entry in task_entries
-                        if entry.get('billable') == 'True'
-                    )
-                    
-                    # Get project details from the first entry
-                    first_entry = task_entries[0]
-                    hourly_rate = float(first_entry.get('hourlyRate', 0))
-                    
-                    # Only calculate euro amounts for billable hours
-                    euro_amount = billable_hours * hourly_rate
-                    billable_euro_amount = euro_amount  # Same as euro_amount since we only count billable
-                    
-                    # Get email from the first entry that has it
-                    email = None
-                    for entry in task_entries:
-                        email = entry.get('employeeEmail') or entry.get('employeeEmailAddress')
-                        if email:
-                            break
-                    
-                    processed_entry = {
-                        'projectId': project_id,
-                        'projectName': first_entry.get('projectName', ''),
-                        'projectTask': task_name,
-                        'actualHours': total_hours,
-                        'billable': billable_hours > 0,  # Mark as billable if any hours are billable
-                        'hourlyRate': hourly_rate,
-                        'euroAmount': euro_amount,
-                        'billableEuroAmount': billable_euro_amount,
-                        'customer_info': customer_info,
-                        'date': first_entry.get('date', ''),
-                        'employeeEmail': email  # Add the email to the processed entry
-                    }
-                    
-                    # Add to processed entries
-                    processed_entries[task_name].append(processed_entry)
-                    
-                except (ValueError, TypeError) as e:
-                    logger.warning(
-                        f"Failed to process task {task_name} for project {project_id}: {e}"
-                    )
+                if project is None:
+                    project = builder.add_project(project_id, entry)
+                if included_hours == 'all' or (
+                    included_hours == 'orangit' and entry.employee_company.lower() == 'orangit oy'
+                ):
+                    email = entry.employee_email or entry.get('employeeEmailAddress') or ''
+                    builder.add(project, entry, email, self._get_role(email) if email else '')
+        
+        cube = builder.build()
+        logger.info(
+            "Aggregated hours of %d projects into %d cells of %d tasks, %d employees and %d roles",
+            len(cube.projects),
+            len(cube),
+            len(cube.tasks),
+            len(cube.employees),
+            len(cube.roles)
+        )
+        return cube
+
+    def _project_task_rows(
+        self,
+        cube: UtilizationCube,
+        customer_data: Dict[str, Dict[str, Any]]
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """Roll the cube up to project tasks for the utilization summary.
+
+        A project task is billable if any of its hours are, and its euro
+        amount is that of its billable hours.
+
+        Parameters
+        ----------
+        cube : UtilizationCube
+            Utilization fact cube
+        customer_data : Dict[str, Dict[str, Any]]
+            Dictionary of customer data
+
+        Returns
+        -------
+        Dict[str, List[Dict[str, Any]]]
+            Project task totals grouped by task, in order of first entry
+        """
+        minutes = cube.rollup(('project', 'task'))
+        billable_minutes = cube.rollup(('project', 'task'), where=cube.billable)
+        euros = cube.rollup(('project', 'task'), 'euros')
+        
+        rows: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for pair_id, pair in enumerate(cube.project_tasks):
+            project, task = pair
+            project_id = cube.projects[project]
+            billable_hours = billable_minutes.get(pair, 0.0) / 60.0
+            euro_amount = euros.get(pair, 0.0)
+            rows[cube.tasks[task]].append({
+                'projectId': project_id,
+                'projectName': cube.project_task_names[pair_id],
+                'projectTask': cube.tasks[task],
+                'actualHours': minutes.get(pair, 0.0) / 60.0,
+                'billable': billable_hours > 0,  # Mark as billable if any hours are billable
+                'hourlyRate': cube.project_task_rates[pair_id],
+                'euroAmount': euro_amount,
+                'billableEuroAmount': euro_amount,  # Only billable hours have a euro amount
+                'customer_info': customer_data.get(project_id, {})
+            })
+        return rows
+
+    def _projects_not_found(
+        self,
+        cube: UtilizationCube,
+        customer_data: Dict[str, Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Roll the cube up to the projects not in customer data.
+
+        Parameters
+        ----------
+        cube : UtilizationCube
+            Utilization fact cube
+        customer_data : Dict[str, Dict[str, Any]]
+            Dictionary of customer data
+
+        Returns
+        -------
+        List[Dict[str, Any]]
+            Orangit Oy hours and euros of each project not found
+        """
+        minutes = cube.rollup(('project',))
+        billable_minutes = cube.rollup(('project',), where=cube.billable)
+        
+        def hours(project_minutes: Dict[Tuple[int, ...], float], project: int) -> float:
+            # Without included entries the hours are an integer 0, as summing no entries gives
+            total = project_minutes.get((project,))
+            return total / 60.0 if total is not None else 0
+        
+        projects_not_found: List[Dict[str, Any]] = []
+        for project, project_id in enumerate(cube.projects):
+            if customer_data.get(project_id):
+                continue
+            billable_hours = hours(billable_minutes, project)
+            hourly_rate = cube.project_rates[project]
             
-            # If project not found in customer data, add to projects_not_found
-            if not customer_info and project_entries:
-                first_entry = project_entries[0]
-                total_hours = sum(
-                    float(entry.get('actualHours', 0))
-                    for entry in project_entries
-                    if entry.get('employeeCompany', '').lower() == 'orangit oy'.lower()
-                )
-                billable_hours = sum(
-                    float(entry.get('actualHours', 0))
-                    for entry in project_entries
-                    if entry.get('employeeCompany', '').lower() == 'orangit oy'.lower()
-                    and entry.get('billable') == 'True'
-                )
-                hourly_rate = float(first_entry.get('hourlyRate', 0))
-                
-                # Only calculate euro amounts for billable hours
-                euro_amount = billable_hours * hourly_rate
-                billable_euro_amount = euro_amount  # Same as euro_amount since we only count billable
-                
-                projects_not_found.append({
-                    'projectId': project_id,
-                    'projectName': first_entry.get('projectName', 'Unknown'),
-                    'totalHours': total_hours,
-                    'billableHours': billable_hours,
-                    'hourlyRate': hourly_rate,
-                    'euroAmount': euro_amount,
-                    'billableEuroAmount': billable_euro_amount
-                })
-        
-        return processed_entries, projects_not_found
+            # Only calculate euro amounts for billable hours, at the rate of the project
+            euro_amount = billable_hours * hourly_rate
+            projects_not_found.append({
+                'projectId': project_id,
+                'projectName': cube.project_names[project],
+                'totalHours': hours(minutes, project),
+                'billableHours': billable_hours,
+                'hourlyRate': hourly_rate,
+                'euroAmount': euro_amount,
+                'billableEuroAmount': euro_amount
+            })
+        return projects_not_found
 
     def _write_utilization_summary(
         self,
@@ -307,7 +332,7 @@ class UtilizationTransformer:
         Parameters
         ----------
         processed_entries : Dict[str, List[Dict[str, Any]]]
-            Dictionary of processed entries grouped by task
+            Project task totals grouped by task, from ``_project_task_rows``
         result_file_path : Path
             Path to the result file, used to determine summary file path
         first_day : Optional[datetime.date]
@@ -476,9 +501,41 @@ class UtilizationTransformer:
                 writer.writerow(project)
         logger.info("Wrote %d projects not found to %s", len(projects_not_found), not_found_file)
 
+    def _week_index(
+        self,
+        cube: UtilizationCube,
+        start_date: Optional[datetime.date],
+        end_date: Optional[datetime.date]
+    ) -> Optional[WeekIndex]:
+        """Return the week columns of the weekly reports.
+
+        Parameters
+        ----------
+        cube : UtilizationCube
+            Utilization fact cube
+        start_date : Optional[datetime.date]
+            Start date used for filtering
+        end_date : Optional[datetime.date]
+            End date used for filtering
+
+        Returns
+        -------
+        Optional[WeekIndex]
+            Weeks from start to end date, or spanning the entry dates when
+            no range was given; None when there are no dates
+        """
+        # Determine date range for columns
+        if start_date and end_date:
+            return WeekIndex(start_date, end_date)
+        
+        if cube.first_day is None or cube.last_day is None:
+            logger.warning("No valid dates found in entries")
+            return None
+        return WeekIndex(cube.first_day, cube.last_day)
+
     def _write_weekly_summary(
         self,
-        processed_entries: Dict[str, List[Dict[str, Any]]],
+        cube: UtilizationCube,
         result_file_path: Path,
         start_date: Optional[datetime.date],
         end_date: Optional[datetime.date]
@@ -487,8 +544,8 @@ class UtilizationTransformer:
         
         Parameters
         ----------
-        processed_entries : Dict[str, List[Dict[str, Any]]]
-            Dictionary of processed entries grouped by task
+        cube : UtilizationCube
+            Utilization fact cube
         result_file_path : Path
             Path to the result file, used to determine summary file path
         start_date : Optional[datetime.date]
@@ -496,70 +553,28 @@ class UtilizationTransformer:
         end_date : Optional[datetime.date]
             End date used for filtering
         """
-        # Determine date range for columns
-        if start_date and end_date:
-            current_date = start_date
-            end = end_date
-        else:
-            # Find min and max dates from entries
-            all_dates = []
-            for entries in processed_entries.values():
-                for entry in entries:
-                    date_str = entry.get('date', '')
-                    if date_str:
-                        try:
-                            entry_date = datetime.datetime.strptime(date_str, '%Y-%m-%d').date()
-                            all_dates.append(entry_date)
-                        except ValueError:
-                            continue
-            if not all_dates:
-                logger.warning("No valid dates found in entries")
-                return
-            current_date = min(all_dates)
-            end = max(all_dates)
-        
-        # Generate week columns
-        weeks = []
-        while current_date <= end:
-            week_start = current_date - datetime.timedelta(days=current_date.weekday())
-            week_end = week_start + datetime.timedelta(days=6)
-            weeks.append((week_start, week_end))
-            current_date += datetime.timedelta(days=7)
-        
-        # Prepare data for CSV
-        weekly_data = []
-        for task_name, entries in sorted(processed_entries.items()):
-            row_data = {'Task': task_name}
-            
-            # Initialize hours for each week
-            for week_start, week_end in weeks:
-                week_key = f"{week_start.strftime('%Y-%m-%d')} to {week_end.strftime('%Y-%m-%d')}"
-                row_data[week_key] = 0.0
-            
-            # Sum hours for each week
-            for entry in entries:
-                date_str = entry.get('date', '')
-                if date_str:
-                    try:
-                        entry_date = datetime.datetime.strptime(date_str, '%Y-%m-%d').date()
-                        for week_start, week_end in weeks:
-                            if week_start <= entry_date <= week_end:
-                                week_key = f"{week_start.strftime('%Y-%m-%d')} to {week_end.strftime('%Y-%m-%d')}"
-                                row_data[week_key] += float(entry.get('actualHours', 0))
-                                break
-                    except ValueError:
-                        continue
-            
-            weekly_data.append(row_data)
+        week_index = self._week_index(cube, start_date, end_date)
+        if week_index is None:
+            return
+        
+        # Roll the cube up to task and week, with rows sorted by task name
+        task_order = np.argsort(np.array(cube.tasks, dtype=str), kind='stable')
+        task_names = [cube.tasks[task_id] for task_id in task_order.tolist()]
+        task_rows = np.empty(len(cube.tasks), dtype=np.int64)
+        task_rows[task_order] = np.arange(len(task_names))
+        task_hours = week_index.bucket(
+            week_index.columns(cube.week), task_rows[cube.task], cube.hours, len(task_names)
+        )
         
         # Write to CSV
         weekly_file = result_file_path.with_stem(f"{result_file_path.stem}_weekly")
         with weekly_file.open('w', newline='') as csvfile:
-            fieldnames = ['Task'] + [f"{start.strftime('%Y-%m-%d')} to {end.strftime('%Y-%m-%d')}" 
-                                  for start, end in weeks]
+            fieldnames = ['Task'] + week_index.keys
             writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
             writer.writeheader()
-            for row in weekly_data:
+            for task_id, task_name in enumerate(task_names):
+                row = {'Task': task_name}
+                row.update(zip(week_index.keys, task_hours[task_id].tolist()))
                 writer.writerow(row)
         
         logger.info("Wrote weekly summary to %s", weekly_file)
@@ -569,7 +584,7 @@ class UtilizationTransformer:
         raw_hours_path: Path,
         start_date: Optional[datetime.date],
         end_date: Optional[datetime.date]
-    ) -> List[Dict[str, Any]]:
+    ) -> List[TimeEntry]:
         """Read raw hours from CSV file.
 
         Parameters
@@ -583,67 +598,21 @@ class UtilizationTransformer:
 
         Returns
         -------
-        List[Dict[str, Any]]
-            List of time entries
+        List[TimeEntry]
+            List of parsed time entries
         """
-        entries: List[Dict[str, Any]] = []
-        total_entries = 0
-        filtered_entries = 0
-        encodings = ['utf-8', 'latin1', 'iso-8859-1', 'cp1252']
-        
-        for encoding in encodings:
-            try:
-                with raw_hours_path.open('r', newline='', encoding=encoding) as csvfile:
-                    reader = csv.DictReader(csvfile)
-                    for row in reader:
-                        total_entries += 1
-                        
-                        # Check date if filtering is enabled
-                        if start_date or end_date:
-                            date_str = row.get('date', '')
-                            if date_str:
-                                try:
-                                    entry_date = datetime.datetime.strptime(date_str, '%Y-%m-%d').date()
-                                    if start_date and entry_date < start_date:
-                                        continue
-                                    if end_date and entry_date > end_date:
-                                        continue
-                                except ValueError:
-                                    logger.warning(f"Invalid date format in entry: {date_str}")
-                                    continue
-                        
-                        # Convert numeric fields
-                        try:
-                            if row.get('actualMinutes'):
-                                # Convert minutes to hours
-                                row['actualHours'] = float(row['actualMinutes']) / 60.0
-                            else:
-                                row['actualHours'] = 0.0
-                                
-                            # Get hourly rate from taskHourlyPrice only
-                            task_rate = row.get('taskHourlyPrice', '')
-                            if task_rate:
-                                row['hourlyRate'] = float(task_rate)
-                            else:
-                                row['hourlyRate'] = 0.0
-                        except (ValueError, TypeError) as e:
-                            logger.warning(f"Failed to convert numeric fields for entry {row}: {e}")
-                            row['actualHours'] = 0.0
-                            row['hourlyRate'] = 0.0
-                        
-                        entries.append(row)
-                        filtered_entries += 1
-                logger.info("Successfully read raw hours with encoding: %s", encoding)
-                break
-            except UnicodeDecodeError:
-                logger.debug("Failed to read with encoding %s, trying next", encoding)
-                continue
-            except Exception as e:
-                logger.error("Failed to read raw hours: %s", str(e))
-                raise
+        entries: List[TimeEntry] = []
+        try:
+            with open_text(raw_hours_path) as csvfile:
+                total_entries, filtered_entries = self._read_raw_rows(
+                    csv.DictReader(csvfile), start_date, end_date, entries.append
+                )
+        except Exception as e:
+            logger.error("Failed to read raw hours: %s", str(e))
+            raise
         
         if not entries:
-            raise ValueError(f"Failed to read raw hours with any of the attempted encodings: {encodings}")
+            raise ValueError(f"No raw hour entries within the dates in {raw_hours_path}")
         
         logger.info(
             "Processed %d raw hour entries, %d entries after date filtering",
@@ -652,13 +621,115 @@ class UtilizationTransformer:
         )
         return entries
 
-    def transform_to_csv(self, entries: List[Dict[str, Any]], output_path: Path) -> None:
+    def _read_raw_hours_external(
+        self,
+        raw_hours_path: Path,
+        start_date: Optional[datetime.date],
+        end_date: Optional[datetime.date]
+    ) -> ExternalGrouping:
+        """Stream raw hours from CSV file into an out-of-core grouping by project.
+
+        Same as ``_read_raw_hours`` followed by grouping by project, with
+        memory bounded by ``memory_budget_mb``.
+
+        Parameters
+        ----------
+        raw_hours_path : Path
+            Path to raw hours CSV file
+        start_date : Optional[datetime.date]
+            Start date for filtering hours (inclusive)
+        end_date : Optional[datetime.date]
+            End date for filtering hours (inclusive)
+
+        Returns
+        -------
+        ExternalGrouping
+            Entries with a project ID grouped by project; close it to
+            remove the temporary files
+        """
+        hours_by_project = ExternalGrouping(self.memory_budget_mb)
+        try:
+            with open_text(raw_hours_path) as csvfile:
+                total_entries, filtered_entries = self._read_raw_rows(
+                    csv.DictReader(csvfile),
+                    start_date,
+                    end_date,
+                    lambda entry: hours_by_project.add(entry) if entry.project_id else None
+                )
+            hours_by_project.finish()
+        except Exception as e:
+            hours_by_project.close()
+            logger.error("Failed to read raw hours: %s", str(e))
+            raise
+        
+        if not filtered_entries:
+            hours_by_project.close()
+            raise ValueError(f"No raw hour entries within the dates in {raw_hours_path}")
+        
+        logger.info(
+            "Processed %d raw hour entries, %d entries after date filtering",
+            total_entries,
+            filtered_entries
+        )
+        return hours_by_project
+
+    @staticmethod
+    def _read_raw_rows(
+        reader: Iterable[Dict[str, Any]],
+        start_date: Optional[datetime.date],
+        end_date: Optional[datetime.date],
+        add: Callable[[TimeEntry], Any]
+    ) -> Tuple[int, int]:
+        """Parse raw hours rows and pass the ones within the dates to ``add``.
+
+        Parameters
+        ----------
+        reader : Iterable[Dict[str, Any]]
+            Raw hours rows, e.g. a ``csv.DictReader``
+        start_date : Optional[datetime.date]
+            Start date for filtering hours (inclusive)
+        end_date : Optional[datetime.date]
+            End date for filtering hours (inclusive)
+        add : Callable[[TimeEntry], Any]
+            Called with each entry within the dates
+
+        Returns
+        -------
+        Tuple[int, int]
+            Number of rows read and number of entries passed to ``add``
+        """
+        total_entries = 0
+        filtered_entries = 0
+        for row in reader:
+            total_entries += 1
+            
+            # Numeric fields and the date are parsed once here
+            entry = TimeEntry.from_dict(row)
+            date_str = row.get('date', '')
+            if date_str and entry.date is None:
+                logger.warning(f"Invalid date format in entry: {date_str}")
+                # Entries without a valid date cannot be filtered by date
+                if start_date or end_date:
+                    continue
+            
+            # Check date if filtering is enabled
+            if entry.date:
+                if start_date and entry.date < start_date:
+                    continue
+                if end_date and entry.date > end_date:
+                    continue
+            
+            add(entry)
+            filtered_entries += 1
+        return total_entries, filtered_entries
+
+    def transform_to_csv(self, entries: List[TimeEntry], output_path: Path) -> None:
         """Transform entries to CSV format.
 
         Parameters
         ----------
-        entries : List[Dict[str, Any]]
-            List of time entries to transform
+        entries : List[TimeEntry]
+            List of parsed time entries to transform
         output_path : Path
             Path to write the CSV file
         """
@@ -667,16 +738,17 @@ class UtilizationTransformer:
             return
             
         # Get all possible field names from all entries
-        fieldnames = sorted(set(
+        fieldnames = sorted(set(RAW_FIELDNAMES).union(
             field
             for entry in entries
-            for field in entry.keys()
+            if entry.extra
+            for field in entry.extra
         ))
         
         with output_path.open('w', newline='') as csvfile:
             writer = csv.DictWriter(csvfile, fieldnames=fieldnames, extrasaction='ignore')
             writer.writeheader()
-            writer.writerows(entries)
+            writer.writerows(entry.to_dict() for entry in entries)
             
         logger.info("Wrote %d entries to %s", len(entries), output_path)
 
@@ -693,15 +765,25 @@ class UtilizationTransformer:
         str
             Role of the employee
         """
-        email = email.lower()
-        for role, emails in ROLE_EMAILS.items():
-            if email in [e.lower() for e in emails]:
-                return role
-        return 'Engineer'
+        if self.role_index is None:
+            self.role_index = self._load_role_index()
+        return self.role_index.role(email)
+
+    def _load_role_index(self) -> RoleIndex:
+        """Index the role mapping from the roles file or config.py.
+
+        Returns
+        -------
+        RoleIndex
+            Email to role index
+        """
+        if self.roles_file is not None:
+            return RoleIndex.from_file(self.roles_file)
+        return RoleIndex.from_config()
 
     def _write_role_summary(
         self,
-        processed_entries: Dict[str, List[Dict[str, Any]]],
+        cube: UtilizationCube,
         result_file_path: Path,
         start_date: Optional[datetime.date],
         end_date: Optional[datetime.date]
@@ -710,8 +792,8 @@ class UtilizationTransformer:
         
         Parameters
         ----------
-        processed_entries : Dict[str, List[Dict[str, Any]]]
-            Dictionary of processed entries grouped by task
+        cube : UtilizationCube
+            Utilization fact cube
         result_file_path : Path
             Path to the result file, used to determine summary file path
         start_date : Optional[datetime.date]
@@ -719,89 +801,56 @@ class UtilizationTransformer:
         end_date : Optional[datetime.date]
             End date used for filtering
         """
-        # Determine date range for columns
-        if start_date and end_date:
-            current_date = start_date
-            end = end_date
-        else:
-            # Find min and max dates from entries
-            all_dates = []
-            for entries in processed_entries.values():
-                for entry in entries:
-                    date_str = entry.get('date', '')
-                    if date_str:
-                        try:
-                            entry_date = datetime.datetime.strptime(date_str, '%Y-%m-%d').date()
-                            all_dates.append(entry_date)
-                        except ValueError:
-                            continue
-            if not all_dates:
-                logger.warning("No valid dates found in entries")
-                return
-            current_date = min(all_dates)
-            end = max(all_dates)
-        
-        # Generate week columns
-        weeks = []
-        while current_date <= end:
-            week_start = current_date - datetime.timedelta(days=current_date.weekday())
-            week_end = week_start + datetime.timedelta(days=6)
-            weeks.append((week_start, week_end))
-            current_date += datetime.timedelta(days=7)
-        
-        # Group entries by role and task
-        role_task_data: Dict[str, Dict[str, Dict[str, float]]] = {}
-        for task_name, entries in processed_entries.items():
-            for entry in entries:
-                # Try both email fields
-                email = entry.get('employeeEmail') or entry.get('employeeEmailAddress', '')
-                if not email:
-                    logger.warning(f"No email found for entry: {entry}")
-                    continue
-                    
-                role = self._get_role(email)
-                logger.debug(f"Assigned role {role} to email {email}")
-                
-                if role not in role_task_data:
-                    role_task_data[role] = {}
-                if task_name not in role_task_data[role]:
-                    role_task_data[role][task_name] = {}
-                
-                # Initialize hours for each week
-                for week_start, week_end in weeks:
-                    week_key = f"{week_start.strftime('%Y-%m-%d')} to {week_end.strftime('%Y-%m-%d')}"
-                    if week_key not in role_task_data[role][task_name]:
-                        role_task_data[role][task_name][week_key] = 0.0
-                
-                # Add hours to appropriate week
-                date_str = entry.get('date', '')
-                if date_str:
-                    try:
-                        entry_date = datetime.datetime.strptime(date_str, '%Y-%m-%d').date()
-                        for week_start, week_end in weeks:
-                            if week_start <= entry_date <= week_end:
-                                week_key = f"{week_start.strftime('%Y-%m-%d')} to {week_end.strftime('%Y-%m-%d')}"
-                                role_task_data[role][task_name][week_key] += float(entry.get('actualHours', 0))
-                                break
-                    except ValueError:
-                        continue
+        week_index = self._week_index(cube, start_date, end_date)
+        if week_index is None:
+            return
+        
+        # Hours without an employee email have no role
+        with_email = np.ones(len(cube), dtype=bool)
+        if '' in cube.roles:
+            with_email = cube.role != cube.roles.index('')
+            missing = ~with_email
+            if missing.any():
+                logger.warning(
+                    "No email found for %.2f hours, leaving them out of the role summary",
+                    float(cube.hours[missing].sum())
+                )
+        
+        # Roll the cube up to role, task and week
+        role_tasks = cube.role[with_email].astype(np.int64) * len(cube.tasks) + cube.task[with_email]
+        row_keys, row_ids = np.unique(role_tasks, return_inverse=True)
+        role_task_hours = week_index.bucket(
+            week_index.columns(cube.week[with_email]),
+            row_ids.ravel(),
+            cube.hours[with_email],
+            len(row_keys)
+        )
+        rows = {
+            (cube.roles[key // len(cube.tasks)], cube.tasks[key % len(cube.tasks)]): row_id
+            for row_id, key in enumerate(row_keys.tolist())
+        }
         
         # Write to CSV
         role_file = result_file_path.with_stem(f"{result_file_path.stem}_roles")
         with role_file.open('w', newline='') as csvfile:
-            fieldnames = ['Role', 'Task'] + [f"{start.strftime('%Y-%m-%d')} to {end.strftime('%Y-%m-%d')}" 
-                                           for start, end in weeks]
+            fieldnames = ['Role', 'Task'] + week_index.keys
             writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
             writer.writeheader()
             
-            # Write data for each role and task
-            for role in ['Backoffice', 'Service Lead', 'Team Lead', 'Engineer']:
-                if role in role_task_data:
-                    for task_name, week_data in sorted(role_task_data[role].items()):
-                        row = {'Role': role, 'Task': task_name}
-                        # Convert float values to strings for CSV
-                        row.update({k: str(v) for k, v in week_data.items()})
-                        writer.writerow(row)
+            # Write data for each role and task, the known roles first
+            roles = [role for role in ROLE_ORDER if role in cube.roles]
+            roles += sorted(role for role in cube.roles if role and role not in ROLE_ORDER)
+            for role in roles:
+                for (row_role, task_name), row_id in sorted(rows.items()):
+                    if row_role != role:
+                        continue
+                    row = {'Role': role, 'Task': task_name}
+                    # Convert float values to strings for CSV
+                    row.update(
+                        (week_key, str(value))
+                        for week_key, value in zip(week_index.keys, role_task_hours[row_id].tolist())
+                    )
+                    writer.writerow(row)
         
         logger.info("Wrote role-based summary to %s", role_file)
 
@@ -835,61 +884,201 @@ class UtilizationTransformer:
             raise ValueError(f"Raw hours file not found: {raw_hours_path}")
 
         try:
+            # Index the roles once per run
+            self.role_index = self._load_role_index()
+            
             # Read customer data
             customer_data = self._read_customer_data(customer_data_path)
             logger.info("Successfully read customer data from %s", customer_data_path)
             
             # Get hours either from file or AgileDay
+            hours_by_project: Mapping[str, Iterable[TimeEntry]]
             if raw_hours_path:
                 logger.info("Reading hours from file: %s", raw_hours_path)
-                entries = self._read_raw_hours(raw_hours_path, start_date, end_date)
+                if self.memory_budget_mb is not None:
+                    hours_by_project = self._read_raw_hours_external(raw_hours_path, start_date, end_date)
+                else:
+                    hours_by_project = self._group_hours_by_project(
+                        self._read_raw_hours(raw_hours_path, start_date, end_date)
+                    )
             else:
                 if not start_date or not end_date:
                     raise ValueError("Both start_date and end_date are required when fetching from AgileDay")
                 logger.info("Fetching hours from AgileDay")
-                entries = self._fetch_hours(start_date, end_date)
+                hours_by_project = self._group_hours_by_project(self._fetch_hours(start_date, end_date))
             
-            if not entries:
+            if not hours_by_project:
                 logger.warning("No time entries found for the specified period")
                 # Write empty summary
                 self._write_utilization_summary({}, result_file_path, None, None, start_date, end_date)
                 return
             
-            # Track first and last day of hours
-            first_day = None
-            last_day = None
-            
-            # Process hours
-            processed_entries, projects_not_found = self._process_hours(customer_data, entries)
-            
-            # Find first and last day
-            for entries in processed_entries.values():
-                for entry in entries:
-                    date_str = entry.get('date', '')
-                    if date_str:
-                        try:
-                            entry_date = datetime.datetime.strptime(date_str, '%Y-%m-%d').date()
-                            if first_day is None or entry_date < first_day:
-                                first_day = entry_date
-                            if last_day is None or entry_date > last_day:
-                                last_day = entry_date
-                        except ValueError:
-                            logger.warning(f"Invalid date format in entry: {date_str}")
+            # Aggregate the hours once, the reports are roll-ups of the cube
+            try:
+                cube = self._build_cube(customer_data, hours_by_project)
+            finally:
+                if isinstance(hours_by_project, ExternalGrouping):
+                    hours_by_project.close()
             
-            # Write utilization summary
-            self._write_utilization_summary(processed_entries, result_file_path, first_day, last_day, start_date, end_date)
+            self._write_reports(cube, customer_data, result_file_path, start_date, end_date)
             
-            # Write weekly summary
-            self._write_weekly_summary(processed_entries, result_file_path, start_date, end_date)
+        except Exception as e:
+            logger.error("Failed to process data: %s", str(e))
+            raise
+
+    def _write_reports(
+        self,
+        cube: UtilizationCube,
+        customer_data: Dict[str, Dict[str, Any]],
+        result_file_path: Path,
+        start_date: Optional[datetime.date],
+        end_date: Optional[datetime.date]
+    ) -> None:
+        """Write the utilization reports of a cube.
+
+        Parameters
+        ----------
+        cube : UtilizationCube
+            Utilization fact cube
+        customer_data : Dict[str, Dict[str, Any]]
+            Dictionary of customer data
+        result_file_path : Path
+            Path to the result file, used to determine the report paths
+        start_date : Optional[datetime.date]
+            Start date of the reported period
+        end_date : Optional[datetime.date]
+            End date of the reported period
+        """
+        # Write utilization summary
+        self._write_utilization_summary(
+            self._project_task_rows(cube, customer_data),
+            result_file_path,
+            cube.first_day,
+            cube.last_day,
+            start_date,
+            end_date
+        )
+        
+        # Write weekly summary
+        self._write_weekly_summary(cube, result_file_path, start_date, end_date)
+        
+        # Write role-based summary
+        self._write_role_summary(cube, result_file_path, start_date, end_date)
+        
+        # Write projects not found
+        self._write_projects_not_found(self._projects_not_found(cube, customer_data), result_file_path)
+        
+        logger.info("Successfully wrote result file: %s", result_file_path)
+
+    def _cube_context(self, customer_data_path: Path, context: str) -> str:
+        """Digest the inputs a cube depends on besides the hours.
+
+        Parameters
+        ----------
+        customer_data_path : Path
+            Path to customer data CSV file
+        context : str
+            Further settings, e.g. the status of the fetched entries
+
+        Returns
+        -------
+        str
+            Digest of the customer data, the roles and ``context``
+        """
+        if self.role_index is None:
+            self.role_index = self._load_role_index()
+        digest = hashlib.sha256(customer_data_path.read_bytes())
+        digest.update(self.role_index.digest().encode('utf-8'))
+        digest.update(context.encode('utf-8'))
+        return digest.hexdigest()
+
+    def transform_rolling_utilization(
+        self,
+        customer_data_path: Path,
+        result_file_path: Path,
+        end_date: datetime.date,
+        months: int,
+        store: MonthlyCubeStore,
+        fetch_hours: Optional[Callable[[datetime.date, datetime.date], Iterable[TimeEntry]]] = None,
+        context: str = '',
+        settle_days: int = DEFAULT_SETTLE_DAYS,
+        rebuild: bool = False,
+        today: Optional[datetime.date] = None
+    ) -> None:
+        """Write utilization metrics of the trailing months up to a date.
+
+        Months that ended more than ``settle_days`` days ago are settled,
+        so their cubes are read from ``store``, or fetched, aggregated and
+        stored once. The other months, including the month of ``end_date``
+        when it is not over, are fetched on every run, so late hours
+        reported during month close are included. The reports are written
+        from the combined cubes, as for the whole range with
+        ``transform_to_utilization``.
+
+        Parameters
+        ----------
+        customer_data_path : Path
+            Path to customer data CSV file
+        result_file_path : Path
+            Path to write the result file
+        end_date : datetime.date
+            Last day of the report
+        months : int
+            Number of calendar months, including the month of ``end_date``
+        store : MonthlyCubeStore
+            Store of the cubes of complete months
+        fetch_hours : Optional[Callable[[datetime.date, datetime.date], Iterable[TimeEntry]]]
+            Called with the first and last day of a month to fetch its
+            entries, defaults to fetching from AgileDay
+        context : str, optional
+            Settings that change the fetched entries, e.g. their status and
+            the API source; stored months fetched with other settings are
+            rebuilt
+        settle_days : int, optional
+            Days after the end of a month during which its hours may still
+            change, defaults to ``DEFAULT_SETTLE_DAYS``
+        rebuild : bool, optional
+            Fetch settled months again and replace their stored cubes,
+            defaults to False
+        today : Optional[datetime.date]
+            Date the settle window is measured from, defaults to today
+        """
+        if not customer_data_path.is_file():
+            raise ValueError(f"Customer data file not found: {customer_data_path}")
+        fetch_hours = fetch_hours or self._fetch_hours
+        today = today or datetime.date.today()
+
+        try:
+            # Index the roles once per run
+            self.role_index = self._load_role_index()
             
-            # Write role-based summary
-            self._write_role_summary(processed_entries, result_file_path, start_date, end_date)
+            customer_data = self._read_customer_data(customer_data_path)
+            cube_context = self._cube_context(customer_data_path, context)
             
-            # Write projects not found
-            self._write_projects_not_found(projects_not_found, result_file_path)
+            month_ranges = trailing_months(end_date, months)
+            cubes: List[UtilizationCube] = []
+            reused = 0
+            for month_start, month_end in month_ranges:
+                month = month_key(month_start)
+                settled = is_settled(month_end, today, settle_days)
+                cube = store.load(month, cube_context) if settled and not rebuild else None
+                if cube is not None:
+                    reused += 1
+                else:
+                    logger.info("Fetching hours of %s", month)
+                    cube = self._build_cube(
+                        customer_data,
+                        self._group_hours_by_project(fetch_hours(month_start, month_end))
+                    )
+                    if settled:
+                        store.save(month, cube_context, cube)
+                    else:
+                        logger.info("Not storing %s, its hours may still change", month)
+                cubes.append(cube)
+            logger.info("Reused %d of %d months from %s", reused, len(month_ranges), store.directory)
             
-            logger.info("Successfully wrote result file: %s", result_file_path)
+            self._write_reports(merge_cubes(cubes), customer_data, result_file_path, month_ranges[0][0], end_date)
             
         except Exception as e:
             logger.error("Failed to process data: %s", str(e))
-            raise 
\ No newline at end of file
+            raise
@@ -0,0 +1,102 @@
+"""Weekly report columns indexed by date ordinal."""
+
+import datetime
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+
+class WeekIndex:
+    """Week columns of a reporting range with constant-time lookup.
+
+    The columns are the Monday to Sunday weeks from the week of ``start``
+    to the week of ``end``, as in the weekly utilization reports. A week is
+    mapped to its column with integer arithmetic on the ordinal of its
+    Monday, so the cost does not depend on the number of weeks. ``bucket`` sums
+    hours into a (group, week) matrix with a single ``numpy.bincount``.
+    """
+
+    def __init__(self, start: datetime.date, end: datetime.date):
+        """Create the index.
+
+        Parameters
+        ----------
+        start : datetime.date
+            First day of the reporting range
+        end : datetime.date
+            Last day of the reporting range
+        """
+        first_monday = start - datetime.timedelta(days=start.weekday())
+        last_monday = end - datetime.timedelta(days=end.weekday())
+        week_count = (last_monday - first_monday).days // 7 + 1 if start <= end else 0
+        self.first_ordinal = first_monday.toordinal()
+        self.weeks: List[Tuple[datetime.date, datetime.date]] = [
+            (
+                first_monday + datetime.timedelta(days=7 * week),
+                first_monday + datetime.timedelta(days=7 * week + 6)
+            )
+            for week in range(week_count)
+        ]
+        self.keys: List[str] = [
+            f"{week_start.isoformat()} to {week_end.isoformat()}"
+            for week_start, week_end in self.weeks
+        ]
+
+    def __len__(self) -> int:
+        return len(self.weeks)
+
+    def columns(self, weeks: np.ndarray) -> np.ndarray:
+        """Return the columns of weeks given by the ordinal of their Monday.
+
+        Parameters
+        ----------
+        weeks : np.ndarray
+            Ordinals of Mondays, e.g. the ``week`` of a utilization cube
+
+        Returns
+        -------
+        np.ndarray
+            Index of the week column of each week, or -1 outside the columns
+        """
+        offsets = np.asarray(weeks, dtype=np.int64) - self.first_ordinal
+        columns = offsets // 7
+        return np.where((offsets >= 0) & (columns < len(self.weeks)), columns, -1)
+
+    def bucket(
+        self,
+        week_ids: Sequence[int],
+        group_ids: Sequence[int],
+        hours: Sequence[float],
+        group_count: int
+    ) -> np.ndarray:
+        """Sum hours per group and week.
+
+        Hours with a week id of -1 are left out. The hours of each cell
+        are added in input order, as a loop over the entries would.
+
+        Parameters
+        ----------
+        week_ids : Sequence[int]
+            Week column of each entry, from ``columns``
+        group_ids : Sequence[int]
+            Row of each entry, e.g. the index of its task
+        hours : Sequence[float]
+            Hours of each entry
+        group_count : int
+            Number of rows
+
+        Returns
+        -------
+        np.ndarray
+            Hours with shape (group_count, number of weeks)
+        """
+        week_count = len(self.weeks)
+        week_array = np.asarray(week_ids, dtype=np.int64)
+        valid = week_array >= 0
+        cells = np.asarray(group_ids, dtype=np.int64)[valid] * week_count + week_array[valid]
+        totals = np.bincount(
+            cells,
+            weights=np.asarray(hours, dtype=np.float64)[valid],
+            minlength=group_count * week_count
+        )
+        return totals.reshape(group_count, week_count)
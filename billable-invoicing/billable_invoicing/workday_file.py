@@ -0,0 +1,190 @@
+"""Streaming writer for Workday invoice transfer files."""
+
+import logging
+import os
+from pathlib import Path
+from types import TracebackType
+from typing import BinaryIO, Iterable, Optional, Type
+
+logger = logging.getLogger(__name__)
+
+ENCODING = 'cp1252'
+
+# Width reserved for the invoicing total on the second line. The total is
+# zero-padded to this width so it can be patched in place once it is known.
+TOTAL_FIELD_WIDTH = 12
+
+TITLE_LINE = "Invoice transfer into Workday;;;Company code:;{company_code};;;Invoicing total;;;;;;;;;;;;;"
+TOTAL_LINE_PREFIX = "Title information/Row information;;;Reply-to-email:;{reply_email};;;"
+TOTAL_LINE_SUFFIX = ";;;;;;;;;;;;;"
+HEADER_COLUMNS_LINE = (
+    "Row type H= Title;ConnectID;Invoice A2 ID;Account A2 ID;Free text;"
+    "Accounting date[YYYY-MM-DD];Invoicing date[YYYY-MM-DD];Our reference;"
+    "Customer reference;Period Start date [YYYY-MM-DD];Period End date [YYYY-MM-DD];"
+    "Contract number;PO number;Appendix 1;Appendix 2;Appendix 3;Appendix 4;;;Source System;"
+)
+ROW_COLUMNS_LINE = (
+    "Row type R= Row;ConnectID;Grouping info (Memo);Sales Item;Description;Quantity;"
+    "Unit of measure;Unit price;Dim 1: Cost center;Dim 2: Business line (Function);"
+    "Dim 3: Area;Dim 4: Service;Dim 5: Project;Dim 7: Counter company;Dim 8: Work type;"
+    "Dim 10: Official;Dim 11: Employee;Dim 13: Company;Tax_Applicability;Tax_Code;"
+)
+
+
+def format_total(total: float) -> str:
+    """Format the invoicing total as a fixed-width field.
+
+    Parameters
+    ----------
+    total : float
+        Sum of all invoice amounts
+
+    Returns
+    -------
+    str
+        Total with two decimals, zero-padded to ``TOTAL_FIELD_WIDTH``
+
+    Raises
+    ------
+    ValueError
+        If the total does not fit in the reserved width
+    """
+    value = f"{total:0{TOTAL_FIELD_WIDTH}.2f}"
+    if len(value) > TOTAL_FIELD_WIDTH:
+        raise ValueError(f"Invoicing total {total:.2f} does not fit in {TOTAL_FIELD_WIDTH} characters")
+    return value
+
+
+class WorkdayFileWriter:
+    """Write a Workday invoice transfer file row by row.
+
+    The four title lines are written when the writer is opened, with a blank
+    fixed-width field for the invoicing total. H and R rows go straight to a
+    temporary file next to the result, so memory use does not depend on the
+    number of invoices. ``commit`` seeks back to fill in the total and then
+    renames the temporary file over the result. A writer that is closed
+    without ``commit``, e.g. after an exception, removes the temporary file.
+
+    Use it as a context manager::
+
+        with WorkdayFileWriter(path) as writer:
+            writer.write_header(header_fields)
+            writer.write_row(row_fields)
+            writer.commit(total_amount)
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        company_code: str = "263",
+        reply_email: str = "laskutus@barona.fi",
+        final_newline: bool = False
+    ):
+        """Create the temporary file and write the title lines.
+
+        Parameters
+        ----------
+        path : Path
+            Path of the result file
+        company_code : str, optional
+            Company code on the first line, defaults to "263"
+        reply_email : str, optional
+            Reply-to email on the second line, defaults to laskutus@barona.fi
+        final_newline : bool, optional
+            End the file with a newline after the last row, defaults to False
+        """
+        self.path = Path(path)
+        self.temp_path = self.path.with_suffix('.tmp')
+        self.final_newline = final_newline
+        self.header_count = 0
+        self.row_count = 0
+        self._committed = False
+
+        self._file: Optional[BinaryIO] = open(self.temp_path, 'wb')
+        try:
+            self._write(TITLE_LINE.format(company_code=company_code))
+            self._write_separator()
+            self._write(TOTAL_LINE_PREFIX.format(reply_email=reply_email))
+            self._total_offset = self._file.tell()
+            self._write(" " * TOTAL_FIELD_WIDTH + TOTAL_LINE_SUFFIX)
+            self._write_separator()
+            self._write(HEADER_COLUMNS_LINE)
+            self._write_separator()
+            self._write(ROW_COLUMNS_LINE)
+        except BaseException:
+            self.close()
+            raise
+
+    def __enter__(self) -> 'WorkdayFileWriter':
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType]
+    ) -> None:
+        self.close()
+
+    def _write(self, text: str) -> None:
+        """Encode and write text to the temporary file."""
+        self._file.write(text.encode(ENCODING, errors='replace'))
+
+    def _write_separator(self) -> None:
+        """Write the line separator."""
+        self._file.write(b"\n")
+
+    def write_header(self, fields: Iterable[str]) -> None:
+        """Write an H row starting a new invoice.
+
+        Parameters
+        ----------
+        fields : Iterable[str]
+            Row fields, starting with "H"
+        """
+        self._write_separator()
+        self._write(";".join(fields))
+        self.header_count += 1
+
+    def write_row(self, fields: Iterable[str]) -> None:
+        """Write an R row of the current invoice.
+
+        Parameters
+        ----------
+        fields : Iterable[str]
+            Row fields, starting with "R"
+        """
+        self._write_separator()
+        self._write(";".join(fields))
+        self.row_count += 1
+
+    def commit(self, total: float) -> None:
+        """Fill in the invoicing total and move the file into place.
+
+        Parameters
+        ----------
+        total : float
+            Invoicing total for the second line
+        """
+        if self.final_newline:
+            self._write_separator()
+        self._file.seek(self._total_offset)
+        self._write(format_total(total))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        self._file = None
+        os.replace(self.temp_path, self.path)
+        self._committed = True
+        logger.debug(
+            "Wrote %d invoices with %d rows to %s",
+            self.header_count, self.row_count, self.path
+        )
+
+    def close(self) -> None:
+        """Close the writer, discarding the file unless it was committed."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if not self._committed:
+            self.temp_path.unlink(missing_ok=True)
@@ -2,11 +2,20 @@
 
 import csv
 import datetime
+import json
 import logging
-import uuid
 from collections import defaultdict
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Set, Tuple
+
+from .diagnostics import INTERNAL_RATE_NOT_FOUND, MissingRate, MissingRateCollector
+from .encoding import open_text
+from .external_grouping import ExternalGrouping
+from .invoice_builder import Invoice, InvoiceBatch, InvoiceLine, build_invoices, invoice_group_key, make_batch, merge_batches
+from .invoice_cache import CachedGroup, InvoiceCache, fingerprint_groups
+from .reference_data import ReferenceDataStore, default_store
+from .time_entry import TimeEntry
+from .workday_file import WorkdayFileWriter
 
 logger = logging.getLogger(__name__)
 
@@ -15,8 +24,35 @@ DECEMBER = 12
 class WorkdayTransformer:
     """Transform time entries and customer data to Workday invoice format."""
 
-    def __init__(self):
-        """Initialize the transformer."""
+    def __init__(
+        self,
+        reference_data: Optional[ReferenceDataStore] = None,
+        workers: int = 1,
+        incremental: bool = False,
+        memory_budget_mb: Optional[float] = None
+    ):
+        """Initialize the transformer.
+
+        Parameters
+        ----------
+        reference_data : Optional[ReferenceDataStore]
+            Store the customer and rates files are loaded from, defaults to
+            the shared store with snapshots in the default cache directory
+        workers : int, optional
+            Number of processes the invoice groups are built in, defaults
+            to 1 (build in this process)
+        incremental : bool, optional
+            Keep per-group fingerprints next to the result file and only
+            rebuild the invoice groups whose inputs changed since the last
+            run, defaults to False
+        memory_budget_mb : Optional[float]
+            Group raw hours files out of core, buffering at most this many
+            megabytes of entries, defaults to None (group in memory)
+        """
+        self.reference_data = reference_data or default_store()
+        self.workers = workers
+        self.incremental = incremental
+        self.memory_budget_mb = memory_budget_mb
         self.company_code = "263"
         self.reply_email = "laskutus@barona.fi"
         self.source_system = "Orangit"
@@ -43,7 +79,7 @@ class WorkdayTransformer:
         # Use a fixed format with exactly 2 decimal places
         return f"{value:.2f}".replace(',', '.')  # Ensure period is used as decimal separator
 
-    def _read_customer_data(self, customer_data_path: Path) -> Dict[str, Dict[str, Any]]:
+    def read_customer_data(self, customer_data_path: Path) -> Dict[str, Dict[str, Any]]:
         """Read customer data from CSV file and filter for active projects.
 
         Parameters
@@ -56,33 +92,28 @@ class WorkdayTransformer:
         Dict[str, Dict[str, Any]]
             Dictionary of active customer data keyed by AgileDay project ID
         """
-        customer_data: Dict[str, Dict[str, Any]] = {}
-        with customer_data_path.open('r', newline='') as csvfile:
-            reader = csv.DictReader(csvfile)
-            # Log the available fields from CSV
-            logger.info("Customer CSV fields: %s", reader.fieldnames)
-            for row in reader:
-                # Only process active customers
-                if row.get('Active', '').lower() != 'yes':
-                    continue
-                
-                agileday_project_id = row.get('AgileDay_projectId')
-                if agileday_project_id:
-                    # Log each mapping we create
-                    logger.debug(
-                        "Mapping project ID %s to client '%s', service '%s'",
-                        agileday_project_id,
-                        row.get('Client', 'Unknown'),
-                        row.get('Service name', 'Unknown Service')
-                    )
-                    customer_data[agileday_project_id] = row
+        data = self.reference_data.customer_data(customer_data_path)
+        # Log the available fields from CSV
+        logger.info("Customer CSV fields: %s", data.fieldnames)
+        customer_data = dict(data.active_by_project_id)
+        if logger.isEnabledFor(logging.DEBUG):
+            for agileday_project_id, row in customer_data.items():
+                logger.debug(
+                    "Mapping project ID %s to client '%s', service '%s'",
+                    agileday_project_id,
+                    row.get('Client', 'Unknown'),
+                    row.get('Service name', 'Unknown Service')
+                )
         
         logger.info("Loaded %d active customer records", len(customer_data))
         return customer_data
 
-    def _read_raw_hours(self, raw_hours_path: Path) -> Dict[str, List[Dict[str, Any]]]:
+    def _read_raw_hours(self, raw_hours_path: Path) -> Mapping[str, Iterable[TimeEntry]]:
         """Read raw hours from CSV file and group by project ID.
 
+        With ``memory_budget_mb`` set the file is streamed into an
+        ``ExternalGrouping``, which the caller must close.
+
         Parameters
         ----------
         raw_hours_path : Path
@@ -90,41 +121,31 @@ class WorkdayTransformer:
 
         Returns
         -------
-        Dict[str, List[Dict[str, Any]]]
-            Dictionary of hour entries grouped by project ID
+        Mapping[str, Iterable[TimeEntry]]
+            Parsed hour entries grouped by project ID
         """
-        hours_by_project: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
         total_entries = 0
+        if self.memory_budget_mb is not None:
+            grouping: Optional[ExternalGrouping] = ExternalGrouping(self.memory_budget_mb)
+            add = grouping.add
+        else:
+            grouping = None
+            in_memory: Dict[str, List[TimeEntry]] = defaultdict(list)
+            add = lambda entry: in_memory[entry.project_id].append(entry)
         
-        with raw_hours_path.open('r', newline='') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                total_entries += 1
-                project_id = row.get('projectId')
-                if project_id:
-                    # Convert numeric fields
-                    try:
-                        if row.get('actualMinutes'):
-                            # Convert minutes to hours
-                            row['actualHours'] = float(row['actualMinutes']) / 60.0
-                        else:
-                            row['actualHours'] = 0.0
-                            
-                        # Get hourly rate (prefer task rate over opening rate)
-                        task_rate = row.get('taskHourlyPrice', '')
-                        opening_rate = row.get('openingHourlyPrice', '')
-                        if task_rate:
-                            row['hourlyRate'] = float(task_rate)
-                        elif opening_rate:
-                            row['hourlyRate'] = float(opening_rate)
-                        else:
-                            row['hourlyRate'] = 0.0
-                    except (ValueError, TypeError) as e:
-                        logger.warning(f"Failed to convert numeric fields for entry {row}: {e}")
-                        row['actualHours'] = 0.0
-                        row['hourlyRate'] = 0.0
-                    
-                    hours_by_project[project_id].append(row)
+        try:
+            with open_text(raw_hours_path) as csvfile:
+                reader = csv.DictReader(csvfile)
+                for row in reader:
+                    total_entries += 1
+                    if row.get('projectId'):
+                        # Numeric fields and the date are parsed once here
+                        add(TimeEntry.from_dict(row))
+            hours_by_project = grouping.finish() if grouping is not None else in_memory
+        except BaseException:
+            if grouping is not None:
+                grouping.close()
+            raise
         
         logger.info(
             "Processed %d raw hour entries across %d projects",
@@ -133,183 +154,83 @@ class WorkdayTransformer:
         )
         return hours_by_project
 
-    def _process_customer_hours(
-        self,
-        customer_data: Dict[str, Dict[str, Any]],
-        hours_by_project: Dict[str, List[Dict[str, Any]]]
-    ) -> List[Dict[str, Any]]:
-        """Process hours for active customers.
+    def _group_hours_by_project(self, entries: Iterable[TimeEntry]) -> Dict[str, List[TimeEntry]]:
+        """Group parsed entries by project ID, skipping entries without a project.
 
         Parameters
         ----------
-        customer_data : Dict[str, Dict[str, Any]]
-            Dictionary of active customer data
-        hours_by_project : Dict[str, List[Dict[str, Any]]]
-            Dictionary of hour entries by project
+        entries : Iterable[TimeEntry]
+            Parsed time entries
 
         Returns
         -------
-        List[Dict[str, Any]]
-            List of processed entries ready for transformation
+        Dict[str, List[TimeEntry]]
+            Dictionary of hour entries grouped by project ID
         """
-        processed_entries: List[Dict[str, Any]] = []
-        projects_without_hours: List[str] = []
-        
-        # Process each active customer project
-        for project_id, customer_info in customer_data.items():
-            project_hours = hours_by_project.get(project_id, [])
-            
-            if not project_hours:
-                projects_without_hours.append(
-                    f"Project: {customer_info.get('projectName', 'Unknown')} "
-                    f"(ID: {project_id})"
-                )
-                continue
-            
-            # Filter hours based on included_hours setting
-            included_hours = customer_info.get('included_hours', '').strip()
-            filtered_hours = []
-            logger.debug(
-                "Processing hours for project - Client: %s, Service: %s (ID: %s), included_hours: %s, total entries: %d",
-                customer_info.get('Client', 'Unknown'),
-                customer_info.get('Service name', 'Unknown Service'),
-                project_id,
-                included_hours,
-                len(project_hours)
-            )
-            
-            for entry in project_hours:
-                if entry.get('billable') == 'True':  # Only process billable hours
-                    # If included_hours is 'All', include all billable hours
-                    # If included_hours is 'Orangit', only include hours from Orangit Oy
-                    if included_hours.lower() == 'all':
-                        filtered_hours.append(entry)
-                    elif included_hours.lower() == 'orangit':
-                        employee_company = entry.get('employeeCompany', '')
-                        logger.debug(
-                            "Checking employee company: '%s' for entry with project task: %s",
-                            employee_company,
-                            entry.get('projectTask', '')
-                        )
-                        # Case-insensitive comparison for company name
-                        if employee_company.lower() == 'orangit oy'.lower():
-                            filtered_hours.append(entry)
-                    else:
-                        logger.warning(
-                            "Unknown included_hours value '%s' for project - Client: %s, Service: %s (ID: %s)",
-                            included_hours,
-                            customer_info.get('Client', 'Unknown'),
-                            customer_info.get('Service name', 'Unknown Service'),
-                            project_id
-                        )
-            
-            logger.debug(
-                "After filtering - Client: %s, Service: %s (ID: %s), included_hours: %s, filtered entries: %d",
-                customer_info.get('Client', 'Unknown'),
-                customer_info.get('Service name', 'Unknown Service'),
-                project_id,
-                included_hours,
-                len(filtered_hours)
-            )
-            
-            if not filtered_hours:
-                logger.warning(
-                    "No matching hours after filtering - Client: %s, Service: %s (ID: %s), included_hours: %s",
-                    customer_info.get('Client', 'Unknown'),
-                    customer_info.get('Service name', 'Unknown Service'),
-                    project_id,
-                    included_hours
-                )
-                continue
-            
-            # Group filtered hours by task
-            hours_by_task: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
-            for entry in filtered_hours:
-                task_name = entry.get('projectTask', '')
-                hours_by_task[task_name].append(entry)
-            
-            # Process each task
-            for task_name, task_entries in hours_by_task.items():
-                if task_entries:
-                    try:
-                        total_hours = sum(float(entry.get('actualHours', 0)) for entry in task_entries)
-                        hourly_rate = float(task_entries[0].get('hourlyRate', 0))
-                        
-                        processed_entry = {
-                            'projectId': project_id,
-                            'projectName': task_entries[0].get('projectName', ''),
-                            'projectTask': task_name,
-                            'actualHours': total_hours,
-                            'hourlyRate': hourly_rate,
-                            'customer_info': customer_info
-                        }
-                        processed_entries.append(processed_entry)
-                    except (ValueError, TypeError) as e:
-                        logger.warning(
-                            f"Failed to process task {task_name} for project {project_id}: {e}"
-                        )
+        hours_by_project: Dict[str, List[TimeEntry]] = defaultdict(list)
+        total_entries = 0
         
-        # Log warnings for projects without hours
-        if projects_without_hours:
-            logger.warning(
-                "No hours found for %d active projects:\n%s",
-                len(projects_without_hours),
-                "\n".join(projects_without_hours)
-            )
+        for entry in entries:
+            total_entries += 1
+            if entry.project_id:
+                hours_by_project[entry.project_id].append(entry)
         
-        return processed_entries
+        logger.info(
+            "Processed %d raw hour entries across %d projects",
+            total_entries,
+            len(hours_by_project)
+        )
+        return hours_by_project
+
+    def _write_invoicing_summary(self, batch: InvoiceBatch, result_file_path: Path) -> None:
+        """Write a summary of invoicing data in both text and CSV formats.
+
+        The text summary groups the invoice lines by customer (Account A2 Ext
+        ID), then by service and task; the CSV summary has one row per
+        service and task of each invoice. Amounts are the invoice line
+        amounts, so both add up to the result file total.
+
+        Parameters
+        ----------
+        batch : InvoiceBatch
+            Invoices and totals written to the result file
+        result_file_path : Path
+            Path of the result file, the summaries are written next to it
+        """
+        # Group invoices by customer
+        invoices_by_customer: Dict[str, List[Invoice]] = defaultdict(list)
+        for invoice in batch.invoices:
+            invoices_by_customer[invoice.customer_info.get('Account A2 Ext ID', '')].append(invoice)
 
-    def _write_invoicing_summary(
-        self,
-        entries_by_customer: Dict[str, List[Dict[str, Any]]],
-        result_file_path: Path,
-        total_amount: float,
-        total_hours: float,
-        total_invoices: int,
-        total_lines: int,
-        first_day: Optional[datetime.date],
-        last_day: Optional[datetime.date]
-    ) -> None:
-        """Write a summary of invoicing data in both text and CSV formats."""
         # Write text summary
         summary_file = result_file_path.with_stem(f"{result_file_path.stem}_summary")
         
         try:
             with open(summary_file, 'w', encoding='utf-8', newline='') as f:
                 # Write customer details
-                for customer_id, entries in entries_by_customer.items():
-                    if not entries:
-                        continue
-                        
-                    customer_info = entries[0]['customer_info']
+                for invoices in invoices_by_customer.values():
+                    customer_info = invoices[0].customer_info
                     client_name = customer_info.get('Client', 'Unknown')
                     
                     # Write customer/client header
                     f.write(f"Customer: {client_name}\n")
                     f.write("-" * 80 + "\n")
                     
-                    # Group entries by service and task
-                    service_task_entries: Dict[tuple[str, str], List[Dict[str, Any]]] = defaultdict(list)
-                    for entry in entries:
-                        service = entry['customer_info'].get('Service name', 'Unknown Service')
-                        task = entry['projectTask']
-                        service_task_entries[(service, task)].append(entry)
-                    
-                    # Calculate and write totals for each service/task combination
+                    # Write totals for each service/task combination
                     customer_total = 0.0
                     customer_lines = 0
-                    for (service, task), task_entries in service_task_entries.items():
-                        task_hours = sum(entry['actualHours'] for entry in task_entries)
-                        # All entries in a task group should have the same rate
-                        hour_rate = task_entries[0]['hourlyRate']
-                        amount = task_hours * hour_rate
+                    for service, task, lines in self._service_task_lines(
+                        line for invoice in invoices for line in invoice.lines
+                    ):
+                        task_hours = sum(line.hours for line in lines)
+                        amount = sum(line.amount for line in lines)
                         customer_total += amount
                         customer_lines += 1
                         
                         f.write(f"Service: {service}\n")
                         f.write(f"Task: {task}\n")
                         f.write(f"Hours: {self._format_decimal(task_hours)}\n")
-                        f.write(f"Rate: {self._format_decimal(hour_rate)}\n")
+                        f.write(f"Rate: {self._format_decimal(lines[0].rate)}\n")
                         f.write(f"Amount: {self._format_decimal(amount)}\n")
                         f.write("\n")
                     
@@ -320,13 +241,13 @@ class WorkdayTransformer:
                 # Write overall summary at the end
                 f.write("\nOVERALL SUMMARY\n")
                 f.write("=" * 80 + "\n")
-                f.write(f"Total number of invoices: {total_invoices}\n")
-                f.write(f"Total number of invoice lines: {total_lines}\n")
-                f.write(f"Total amount across all invoices: {self._format_decimal(total_amount)}\n")
-                f.write(f"Total number of hours: {self._format_decimal(total_hours)}\n")
-                if first_day and last_day:
-                    f.write(f"First day of hours: {first_day.strftime('%Y-%m-%d')}\n")
-                    f.write(f"Last day of hours: {last_day.strftime('%Y-%m-%d')}\n")
+                f.write(f"Total number of invoices: {sum(1 for invoice in batch.invoices if invoice.rows)}\n")
+                f.write(f"Total number of invoice lines: {batch.row_count}\n")
+                f.write(f"Total amount across all invoices: {self._format_decimal(batch.total_amount)}\n")
+                f.write(f"Total number of hours: {self._format_decimal(batch.total_hours)}\n")
+                if batch.first_day and batch.last_day:
+                    f.write(f"First day of hours: {batch.first_day.strftime('%Y-%m-%d')}\n")
+                    f.write(f"Last day of hours: {batch.last_day.strftime('%Y-%m-%d')}\n")
                 f.write("=" * 80 + "\n")
                     
             logger.info("Wrote invoicing summary to %s", summary_file)
@@ -350,156 +271,108 @@ class WorkdayTransformer:
                     'Amount'
                 ])
                 
-                # Track CSV summary total and individual amounts
-                csv_total_amount = 0.0
-                csv_amounts = []  # List to store individual amounts
-                
                 # Write data rows
-                for customer_id, entries in entries_by_customer.items():
-                    if not entries:
-                        continue
-                        
-                    customer_info = entries[0]['customer_info']
-                    client_name = customer_info.get('Client', 'Unknown')
-                    
-                    # Generate a ConnectID for this customer group
-                    connect_id = str(uuid.uuid4())
-                    
-                    # Group entries by service and task
-                    service_task_entries: Dict[tuple[str, str], List[Dict[str, Any]]] = defaultdict(list)
-                    for entry in entries:
-                        service = entry['customer_info'].get('Service name', 'Unknown Service')
-                        task = entry['projectTask']
-                        service_task_entries[(service, task)].append(entry)
-                    
-                    # Write each service/task combination
-                    for (service, task), task_entries in service_task_entries.items():
-                        task_hours = sum(entry['actualHours'] for entry in task_entries)
-                        hour_rate = task_entries[0]['hourlyRate']
-                        amount = task_hours * hour_rate
-                        
-                        # Store the raw amount before formatting
-                        csv_amounts.append(amount)
-                        csv_total_amount += amount
-                        
-                        # Log detailed calculation for debugging
-                        logger.debug(
-                            "CSV Summary - Client: %s, Service: %s, Task: %s, Hours: %.2f, Rate: %.2f, Amount: %.2f",
-                            client_name, service, task, task_hours, hour_rate, amount
-                        )
+                for invoices in invoices_by_customer.values():
+                    for invoice in invoices:
+                        customer_info = invoice.customer_info
+                        client_name = customer_info.get('Client', 'Unknown')
                         
-                        description = (
-                            f"{task_entries[0].get('projectName', '')} - "
-                            f"{customer_info.get('Billable Description', '')} - "
-                            f"{task}"
-                        )
-                        
-                        # Format numeric values consistently
-                        formatted_hours = self._format_decimal(task_hours)
-                        formatted_rate = self._format_decimal(hour_rate)
-                        formatted_amount = self._format_decimal(amount)
-                        
-                        writer.writerow([
-                            client_name,  # Customer name as first column
-                            service,  # Service name as second column
-                            connect_id,  # Use generated ConnectID
-                            customer_info.get('Invoice Info A2 Ext Id', ''),
-                            customer_info.get('Account A2 Ext ID', ''),
-                            task_entries[0].get('projectName', ''),  # Grouping info
-                            customer_info.get('Sales Item hours', ''),
-                            description,
-                            formatted_hours,
-                            formatted_rate,
-                            formatted_amount
-                        ])
-                
-                # Calculate sum from individual amounts
-                sum_from_amounts = sum(csv_amounts)
-                
-                # Log detailed comparison
-                logger.info("Amount comparison details:")
-                logger.info("Main total: %.2f", total_amount)
-                logger.info("CSV running total: %.2f", csv_total_amount)
-                logger.info("Sum from individual amounts: %.2f", sum_from_amounts)
-                logger.info("Difference (Main - CSV): %.2f", total_amount - csv_total_amount)
-                logger.info("Difference (Main - Sum): %.2f", total_amount - sum_from_amounts)
-                logger.info("Difference (CSV - Sum): %.2f", csv_total_amount - sum_from_amounts)
-                
-                # Log individual amounts for verification
-                logger.info("Individual amounts in CSV:")
-                for i, amount in enumerate(csv_amounts, 1):
-                    logger.info("Row %d: %.2f", i, amount)
+                        # Write each service/task combination
+                        for service, task, lines in self._service_task_lines(invoice.lines):
+                            task_hours = sum(line.hours for line in lines)
+                            hour_rate = lines[0].rate
+                            amount = sum(line.amount for line in lines)
+                            
+                            logger.debug(
+                                "CSV Summary - Client: %s, Service: %s, Task: %s, Hours: %.2f, Rate: %.2f, Amount: %.2f",
+                                client_name, service, task, task_hours, hour_rate, amount
+                            )
+                            
+                            description = (
+                                f"{lines[0].project_name} - "
+                                f"{customer_info.get('Billable Description', '')} - "
+                                f"{task}"
+                            )
+                            
+                            writer.writerow([
+                                client_name,  # Customer name as first column
+                                service,  # Service name as second column
+                                invoice.connect_id,  # ConnectID of the invoice in the result file
+                                customer_info.get('Invoice Info A2 Ext Id', ''),
+                                customer_info.get('Account A2 Ext ID', ''),
+                                lines[0].project_name,  # Grouping info
+                                customer_info.get('Sales Item hours', ''),
+                                description,
+                                self._format_decimal(task_hours),
+                                self._format_decimal(hour_rate),
+                                self._format_decimal(amount)
+                            ])
             
             logger.info("Wrote CSV summary to %s", csv_summary_file)
             logger.info(
                 "Summary totals - Invoices: %d, Lines: %d, Amount: %.2f",
-                total_invoices, total_lines, total_amount
+                sum(1 for invoice in batch.invoices if invoice.rows), batch.row_count, batch.total_amount
             )
-            if first_day and last_day:
+            if batch.first_day and batch.last_day:
                 logger.info(
                     "Hours period - First day: %s, Last day: %s",
-                    first_day.strftime('%Y-%m-%d'),
-                    last_day.strftime('%Y-%m-%d')
+                    batch.first_day.strftime('%Y-%m-%d'),
+                    batch.last_day.strftime('%Y-%m-%d')
                 )
         except Exception as e:
             logger.error("Failed to write invoicing summary: %s", str(e))
             raise
 
+    @staticmethod
+    def _service_task_lines(lines: Iterable[InvoiceLine]) -> List[tuple[str, str, List[InvoiceLine]]]:
+        """Group invoice lines by service name and task, in order of appearance."""
+        grouped: Dict[tuple[str, str], List[InvoiceLine]] = {}
+        for line in lines:
+            service = line.customer_info.get('Service name', 'Unknown Service')
+            grouped.setdefault((service, line.task), []).append(line)
+        return [(service, task, task_lines) for (service, task), task_lines in grouped.items()]
+
     def _check_missing_orangit_projects(
         self,
-        hours_by_project: Dict[str, List[Dict[str, Any]]],
-        processed_entries: List[Dict[str, Any]],
-        result_file_path: Path
+        hours_by_project: Dict[str, List[TimeEntry]],
+        processed_project_ids: Set[str],
+        missing_rates: MissingRateCollector
     ) -> None:
-        """Check for missing Orangit projects and write them to a file.
+        """Check for missing Orangit projects and add them to the missing rates.
 
         Parameters
         ----------
-        hours_by_project : Dict[str, List[Dict[str, Any]]]
-            Dictionary of hour entries by project
-        processed_entries : List[Dict[str, Any]]
-            List of processed entries
-        result_file_path : Path
-            Path to the result file
+        hours_by_project : Dict[str, List[TimeEntry]]
+            Dictionary of parsed hour entries by project
+        processed_project_ids : Set[str]
+            IDs of the projects with invoice lines
+        missing_rates : MissingRateCollector
+            Missing rates of this run
         """
-        # Get the directory of the result file
-        output_dir = result_file_path.parent
-        
-        # Create missing rates file path in the same directory
-        missing_rates_path = output_dir / "missing_from_rates.txt"
-        
         # Get all project IDs from hours
         all_project_ids = set(hours_by_project.keys())
         
-        # Get processed project IDs
-        processed_project_ids = {entry['projectId'] for entry in processed_entries}
-        
         # Find missing projects
         missing_projects = all_project_ids - processed_project_ids
         
         if missing_projects:
             logger.warning(f"Found {len(missing_projects)} projects with missing rates")
             
-            # Write missing projects to file
-            with missing_rates_path.open('w') as f:
-                for project_id in missing_projects:
-                    # Get the first entry for this project to get client and service info
-                    project_entries = hours_by_project[project_id]
-                    if project_entries:
-                        first_entry = project_entries[0]
-                        client = first_entry.get('clientName', 'Unknown')
-                        service = first_entry.get('projectName', 'Unknown')
-                        task = first_entry.get('projectTask', 'Unknown')
-                        
-                        f.write(
-                            f"Internal rate not found - Client: {client}, "
-                            f"Service: {service}, Task: {task}, "
-                            f"Project ID: {project_id}\n"
-                        )
+            for project_id in missing_projects:
+                # Get the first entry for this project to get client and service info
+                project_entries = hours_by_project[project_id]
+                first_entry = next(iter(project_entries), None)
+                if first_entry is not None:
+                    missing_rates.add(
+                        INTERNAL_RATE_NOT_FOUND,
+                        project_id,
+                        first_entry.get('projectTask', 'Unknown'),
+                        client=first_entry.get('clientName', 'Unknown'),
+                        service=first_entry.get('projectName', 'Unknown'),
+                        count=len(project_entries)
+                    )
         else:
             logger.info("No projects with missing rates found")
-            # Create an empty file if no missing rates
-            missing_rates_path.touch()
 
     def transform_to_workday(
         self,
@@ -531,463 +404,420 @@ class WorkdayTransformer:
 
         try:
             # Load internal rates first
-            internal_rates = self._load_internal_rates(rates_file_path)
+            internal_rates = self.load_internal_rates(rates_file_path)
             logger.info("Successfully loaded internal rates from %s", rates_file_path)
             
             # Read active customer data (primary source)
-            customer_data = self._read_customer_data(customer_data_path)
+            customer_data = self.read_customer_data(customer_data_path)
             logger.info("Successfully read customer data from %s", customer_data_path)
             
             # Read and group raw hours
             hours_by_project = self._read_raw_hours(raw_hours_path)
             logger.info("Successfully read raw hours from %s", raw_hours_path)
+        except Exception as e:
+            logger.error("Failed to process data: %s", str(e))
+            raise
+        
+        try:
+            self._transform_hours(hours_by_project, customer_data, internal_rates, result_file_path)
+        finally:
+            if isinstance(hours_by_project, ExternalGrouping):
+                hours_by_project.close()
+
+    def transform_to_workday_from_entries(
+        self,
+        entries: Iterable[TimeEntry],
+        customer_data: Dict[str, Dict[str, Any]],
+        internal_rates: Dict[tuple[str, str], float],
+        result_file_path: Path
+    ) -> None:
+        """Transform already fetched time entries to Workday invoice format.
+
+        Same as ``transform_to_workday`` without writing the entries to a raw
+        hours CSV and parsing them back.
+
+        Parameters
+        ----------
+        entries : Iterable[TimeEntry]
+            Parsed time entries, e.g. the result of ``filter_entries``
+        customer_data : Dict[str, Dict[str, Any]]
+            Active customer data keyed by AgileDay project ID, as returned by
+            ``read_customer_data``
+        internal_rates : Dict[tuple[str, str], float]
+            Internal rates keyed by project ID and task name, as returned by
+            ``load_internal_rates``
+        result_file_path : Path
+            Path to write the result file
+        """
+        hours_by_project = self._group_hours_by_project(entries)
+        self._transform_hours(hours_by_project, customer_data, internal_rates, result_file_path)
+
+    def _transform_hours(
+        self,
+        hours_by_project: Dict[str, List[TimeEntry]],
+        customer_data: Dict[str, Dict[str, Any]],
+        internal_rates: Dict[tuple[str, str], float],
+        result_file_path: Path
+    ) -> None:
+        """Build the invoices from grouped hours and write the Workday result file.
+
+        Parameters
+        ----------
+        hours_by_project : Dict[str, List[TimeEntry]]
+            Dictionary of parsed hour entries grouped by project ID
+        customer_data : Dict[str, Dict[str, Any]]
+            Active customer data keyed by AgileDay project ID
+        internal_rates : Dict[tuple[str, str], float]
+            Internal rates keyed by project ID and task name
+        result_file_path : Path
+            Path to write the result file
+        """
+        try:
+            today = datetime.date.today()
+            period_start, _, _ = self._invoice_period(today)
+            period = period_start.strftime("%Y-%m")
+            missing_rates = MissingRateCollector()
             
-            # Calculate total hours from all billable hours
-            total_hours = 0.0
-            for project_hours in hours_by_project.values():
-                for entry in project_hours:
-                    if entry.get('billable') == 'True':
-                        total_hours += float(entry.get('actualHours', 0))
-            
-            # Process hours for active customers
-            processed_entries = []
-            projects_without_hours = []
-            
-            # Track first and last day of hours
-            first_day = None
-            last_day = None
+            # Ensure output directory exists
+            result_file_path = Path(result_file_path).resolve()
+            result_file_path.parent.mkdir(parents=True, exist_ok=True)
             
-            # Process each active customer project
-            for project_id, customer_info in customer_data.items():
-                project_hours = hours_by_project.get(project_id, [])
-                
-                if not project_hours:
-                    projects_without_hours.append(
-                        f"Project: {customer_info.get('projectName', 'Unknown')} "
-                        f"(ID: {project_id})"
-                    )
-                    continue
-                
-                # Filter hours based on included_hours setting
-                included_hours = customer_info.get('included_hours', '').strip()
-                filtered_hours = []
-                logger.debug(
-                    "Processing hours for project - Client: %s, Service: %s (ID: %s), included_hours: %s, total entries: %d",
-                    customer_info.get('Client', 'Unknown'),
-                    customer_info.get('Service name', 'Unknown Service'),
-                    project_id,
-                    included_hours,
-                    len(project_hours)
+            cache = InvoiceCache.for_result_file(result_file_path) if self.incremental else None
+            if cache is not None:
+                batch, groups = self._build_incremental(
+                    hours_by_project, customer_data, internal_rates, missing_rates, period, cache
                 )
-                
-                for entry in project_hours:
-                    if entry.get('billable') == 'True':  # Only process billable hours
-                        # Track first and last day
-                        date_str = entry.get('date', '')
-                        if date_str:
-                            try:
-                                entry_date = datetime.datetime.strptime(date_str, '%Y-%m-%d').date()
-                                if first_day is None or entry_date < first_day:
-                                    first_day = entry_date
-                                if last_day is None or entry_date > last_day:
-                                    last_day = entry_date
-                            except ValueError:
-                                logger.warning(f"Invalid date format in entry: {date_str}")
-                        
-                        # If included_hours is 'All', include all billable hours
-                        # If included_hours is 'Orangit', only include hours from Orangit Oy
-                        if included_hours.lower() == 'all':
-                            filtered_hours.append(entry)
-                        elif included_hours.lower() == 'orangit':
-                            employee_company = entry.get('employeeCompany', '')
-                            logger.debug(
-                                "Checking employee company: '%s' for entry with project task: %s",
-                                employee_company,
-                                entry.get('projectTask', '')
-                            )
-                            # Case-insensitive comparison for company name
-                            if employee_company.lower() == 'orangit oy'.lower():
-                                filtered_hours.append(entry)
-                        else:
-                            logger.warning(
-                                "Unknown included_hours value '%s' for project - Client: %s, Service: %s (ID: %s)",
-                                included_hours,
-                                customer_info.get('Client', 'Unknown'),
-                                customer_info.get('Service name', 'Unknown Service'),
-                                project_id
-                            )
-                
-                logger.debug(
-                    "After filtering - Client: %s, Service: %s (ID: %s), included_hours: %s, filtered entries: %d",
-                    customer_info.get('Client', 'Unknown'),
-                    customer_info.get('Service name', 'Unknown Service'),
-                    project_id,
-                    included_hours,
-                    len(filtered_hours)
+                rendered_rows: Optional[Dict[str, List[List[str]]]] = {
+                    group_key: group.rendered_rows for group_key, group in groups.items()
+                }
+            else:
+                batch = build_invoices(
+                    hours_by_project,
+                    customer_data,
+                    internal_rates,
+                    missing_rates,
+                    period=period,
+                    workers=self.workers
                 )
-                
-                if not filtered_hours:
-                    logger.warning(
-                        "No matching hours after filtering - Client: %s, Service: %s (ID: %s), included_hours: %s",
-                        customer_info.get('Client', 'Unknown'),
-                        customer_info.get('Service name', 'Unknown Service'),
-                        project_id,
-                        included_hours
-                    )
-                    continue
-                
-                # Group filtered hours by task
-                hours_by_task: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
-                for entry in filtered_hours:
-                    task_name = entry.get('projectTask', '')
-                    hours_by_task[task_name].append(entry)
-                
-                # Process each task
-                for task_name, task_entries in hours_by_task.items():
-                    if task_entries:
-                        try:
-                            total_hours = sum(float(entry.get('actualHours', 0)) for entry in task_entries)
-                            # Get hourly rate using the new rate logic
-                            hourly_rate = self._get_hour_rate(task_entries[0], project_id, customer_info, internal_rates)
-                            
-                            processed_entry = {
-                                'projectId': project_id,
-                                'projectName': task_entries[0].get('projectName', ''),
-                                'projectTask': task_name,
-                                'actualHours': total_hours,
-                                'hourlyRate': hourly_rate,
-                                'customer_info': customer_info,
-                                'date': task_entries[0].get('date', '')  # Add date to processed entry
-                            }
-                            processed_entries.append(processed_entry)
-                        except (ValueError, TypeError) as e:
-                            logger.warning(
-                                f"Failed to process task {task_name} for project {project_id}: {e}"
-                            )
-            
-            logger.info("Processed %d billable entries for active customers", len(processed_entries))
+                rendered_rows = None
             
-            # Check for missing OrangIT Oy projects
-            self._check_missing_orangit_projects(hours_by_project, processed_entries, result_file_path)
-            
-            # Calculate period dates
-            today = datetime.date.today()
-            # Calculate previous month
-            if today.month == 1:
-                period_start = datetime.date(today.year - 1, 12, 1)
-                period_end = datetime.date(today.year, 1, 1) - datetime.timedelta(days=1)
-            else:
-                period_start = datetime.date(today.year, today.month - 1, 1)
-                period_end = datetime.date(today.year, today.month, 1) - datetime.timedelta(days=1)
+            # Check for missing OrangIT Oy projects and report all missing rates
+            self._check_missing_orangit_projects(hours_by_project, batch.processed_project_ids, missing_rates)
+            missing_rates.log_summary()
+            missing_rates.write_report(result_file_path.parent / "missing_from_rates.txt")
 
-            # Ensure output directory exists
-            result_file_path = Path(result_file_path).resolve()
-            result_file_path.parent.mkdir(parents=True, exist_ok=True)
-
-            # Group entries by group invoice key (Group invoice or customer ID)
-            groups: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
-            group_to_customer_info: Dict[str, Dict[str, Any]] = {}
-            for entry in processed_entries:
-                customer_info = entry['customer_info']
-                group_invoice = customer_info.get('Group invoice') or customer_info.get('Invoice Info A2 Ext Id', '')
-                if group_invoice:
-                    groups[group_invoice].append(entry)
-                    # Always use the customer_info from the first entry in the group
-                    if group_invoice not in group_to_customer_info:
-                        group_to_customer_info[group_invoice] = customer_info
-
-            # Generate output file
-            temp_file = result_file_path.with_suffix('.tmp')
             try:
-                # First pass: calculate totals
-                total_amount = 0.0
-                total_hours = 0.0
-                header_count = 0
-                detail_count = 0
-
-                # Calculate totals from all entries
-                for group_key, entries in groups.items():
-                    # Group entries by task first
-                    task_entries: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
-                    for entry in entries:
-                        task_name = entry.get('projectTask', '')
-                        task_entries[task_name].append(entry)
-                    
-                    # Calculate totals using the same method as CSV
-                    for task_name, task_entries_list in task_entries.items():
-                        task_hours = sum(entry['actualHours'] for entry in task_entries_list)
-                        hourly_rate = task_entries_list[0]['hourlyRate']
-                        task_amount = task_hours * hourly_rate
-                        
-                        total_hours += task_hours
-                        total_amount += task_amount
-                        detail_count += len(task_entries_list)
-
-                # Log the total hours calculation
-                logger.info(f"Total hours calculation - Found {detail_count} entries with {total_hours:.2f} total hours")
-
-                # Add the constant header lines
-                file_content = [
-                    "Invoice transfer into Workday;;;Company code:;263;;;Invoicing total;;;;;;;;;;;;;",
-                    f"Title information/Row information;;;Reply-to-email:;{self.reply_email};;;0.00;;;;;;;;;;;;;",
-                    "Row type H= Title;ConnectID;Invoice A2 ID;Account A2 ID;Free text;Accounting date[YYYY-MM-DD];Invoicing date[YYYY-MM-DD];Our reference;Customer reference;Period Start date [YYYY-MM-DD];Period End date [YYYY-MM-DD];Contract number;PO number;Appendix 1;Appendix 2;Appendix 3;Appendix 4;;;Source System;",
-                    "Row type R= Row;ConnectID;Grouping info (Memo);Sales Item;Description;Quantity;Unit of measure;Unit price;Dim 1: Cost center;Dim 2: Business line (Function);Dim 3: Area;Dim 4: Service;Dim 5: Project;Dim 7: Counter company;Dim 8: Work type;Dim 10: Official;Dim 11: Employee;Dim 13: Company;Tax_Applicability;Tax_Code;"
-                ]
-
-                # Second pass: generate invoice rows
-                for group_key, entries in groups.items():
-                    connect_id = str(uuid.uuid4())
-                    customer_info = group_to_customer_info[group_key]
-                    
-                    # Group entries by task first
-                    task_entries: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
-                    for entry in entries:
-                        task_name = entry.get('projectTask', '')
-                        task_entries[task_name].append(entry)
-                    
-                    # Collect non-zero rows first
-                    invoice_rows = []
-                    invoice_total = 0.0
-                    
-                    # Process each task group
-                    for task_name, task_entries_list in task_entries.items():
-                        # Process each individual entry instead of combining them
-                        for entry in task_entries_list:
-                            task_hours = float(entry.get('actualHours', 0))
-                            hourly_rate = entry['hourlyRate']
-                            task_amount = task_hours * hourly_rate
-                            
-                            # Skip rows with zero amount
-                            if task_amount == 0:
-                                logger.debug(
-                                    "Skipping zero amount row - Project: %s, Task: %s, Hours: %.2f, Rate: %.2f",
-                                    entry['projectName'],
-                                    task_name,
-                                    task_hours,
-                                    hourly_rate
-                                )
-                                continue
-                                
-                            invoice_total += task_amount
-
-                            logger.info(
-                                "Project: %s, Task: %s, Hours: %.2f, Rate: %.2f, Amount: %.2f",
-                                entry['projectName'],
-                                task_name,
-                                task_hours,
-                                hourly_rate,
-                                task_amount
-                            )
-
-                            description = (
-                                f"{entry['projectName']} - "
-                                f"{customer_info.get('Billable Description', '')} - "
-                                f"{task_name}"
-                            )
-                            detail_row = [
-                                "R", connect_id, entry['projectName'],
-                                customer_info.get('Sales Item hours', ''),
-                                description, self._format_decimal(task_hours), "",
-                                self._format_decimal(hourly_rate),
-                                self.dimensions['cost_center'],
-                                self.dimensions['business_line'],
-                                self.dimensions['area'],
-                                self.dimensions['service'],
-                                "", "", "", "", "", "",
-                                customer_info.get('Tax_Applicability', ''),
-                                customer_info.get('Tax_Code', ''),
-                                ""
-                            ]
-                            invoice_rows.append(";".join(detail_row))
-
-                    # Only write invoice if it has non-zero rows
-                    if invoice_rows:
-                        header_count += 1
-                        # Add header row (always use customer_info fields, not group key)
-                        header_row = [
-                            "H", connect_id, customer_info.get('Invoice Info A2 Ext Id', ''),
-                            customer_info.get('Account A2 Ext ID', ''), "",
-                            datetime.date(today.year, today.month, 1).strftime("%Y-%m-%d"),  # Accounting date: 1st of current month
-                            today.strftime("%Y-%m-%d"),
-                            customer_info.get('Our Reference', ''),
-                            customer_info.get('CUSTOMER_REFERENCE', ''),
-                            period_start.strftime("%Y-%m-%d"),  # Period Start: 1st of previous month
-                            period_end.strftime("%Y-%m-%d"),    # Period End: last day of previous month
-                            customer_info.get('Contract number', ''),
-                            "", "", "", "", "", "", "",
-                            self.source_system, ""
-                        ]
-                        file_content.append(";".join(header_row))
-                        
-                        # Add all non-zero rows
-                        file_content.extend(invoice_rows)
-                    else:
-                        logger.info(
-                            "Skipping invoice for group %s - no non-zero amount rows",
-                            group_key
-                        )
-
-                # Log summary before writing file
-                logger.info(f"\nSummary:")
-                logger.info(f"Number of invoices (H rows): {header_count}")
-                logger.info(f"Number of invoice rows (R rows): {detail_count}")
-                logger.info(f"Total hours: {total_hours:.2f}")
-                logger.info(f"Total amount: {total_amount:.2f}")
-                if first_day and last_day:
-                    logger.info(f"Hours period - First day: {first_day.strftime('%Y-%m-%d')}, Last day: {last_day.strftime('%Y-%m-%d')}")
-
-                # Now that we have the total, update the second line
-                file_content[1] = f"Title information/Row information;;;Reply-to-email:;{self.reply_email};;;{self._format_decimal(total_amount)};;;;;;;;;;;;;"
-
-                # Write all content to file
-                with open(temp_file, mode='w', encoding='cp1252', errors='replace', newline='') as f:
-                    f.write("\n".join(file_content))
-
-                # Convert groups to entries_by_customer format
-                entries_by_customer: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
-                for group_key, entries in groups.items():
-                    customer_info = group_to_customer_info[group_key]
-                    customer_id = customer_info.get('Account A2 Ext ID', '')
-                    entries_by_customer[customer_id].extend(entries)
-
-                # Write the invoicing summary with the same totals
-                self._write_invoicing_summary(entries_by_customer, result_file_path, total_amount, total_hours, header_count, detail_count, first_day, last_day)
-
-                # Rename temp file to final file
-                temp_file.replace(result_file_path)
+                with WorkdayFileWriter(
+                    result_file_path,
+                    company_code=self.company_code,
+                    reply_email=self.reply_email
+                ) as writer:
+                    self._write_invoices(writer, batch, today, rendered_rows)
+
+                    # Log summary before writing file
+                    logger.info(f"\nSummary:")
+                    logger.info(f"Number of invoices (H rows): {writer.header_count}")
+                    logger.info(f"Number of invoice rows (R rows): {writer.row_count}")
+                    logger.info(f"Total hours: {batch.total_hours:.2f}")
+                    logger.info(f"Total amount: {batch.total_amount:.2f}")
+                    if batch.first_day and batch.last_day:
+                        logger.info(f"Hours period - First day: {batch.first_day.strftime('%Y-%m-%d')}, Last day: {batch.last_day.strftime('%Y-%m-%d')}")
+
+                    # Write the invoicing summary from the same invoices
+                    self._write_invoicing_summary(batch, result_file_path)
+
+                    # Fill in the total and rename the temp file to the final file
+                    writer.commit(batch.total_amount)
                 logger.info(f"\nSuccessfully wrote result file: {result_file_path}")
+                if cache is not None:
+                    cache.save(groups)
 
             except Exception as e:
                 logger.error("Failed to write result file: %s", str(e))
-                if temp_file.exists():
-                    temp_file.unlink()
                 raise
         except Exception as e:
             logger.error("Failed to process data: %s", str(e))
             raise
 
-    def _load_internal_rates(self, rates_file_path: Path) -> Dict[tuple[str, str], float]:
-        """Load internal rates from CSV file.
-        
+    @staticmethod
+    def _invoice_period(today: datetime.date) -> Tuple[datetime.date, datetime.date, str]:
+        """Return the invoicing period and accounting date for a run date.
+
         Parameters
         ----------
-        rates_file_path : Path
-            Path to rates CSV file containing project ID, task name, and rate
-            
+        today : datetime.date
+            Date of the run
+
         Returns
         -------
-        Dict[tuple[str, str], float]
-            Dictionary mapping (project_id, task_name) to hourly rate
+        Tuple[datetime.date, datetime.date, str]
+            First and last day of the previous month, and the accounting
+            date, the 1st of the current month, as YYYY-MM-DD
         """
-        internal_rates: Dict[tuple[str, str], float] = {}
-        
-        with rates_file_path.open('r', newline='') as csvfile:
-            reader = csv.reader(csvfile)
-            for row in reader:
-                if len(row) >= 3:  # Ensure we have all required columns
-                    try:
-                        project_id = row[0].strip()
-                        task_name = row[1].strip()
-                        rate = float(row[2].strip())
-                        internal_rates[(project_id, task_name)] = rate
-                        logger.debug(
-                            "Loaded internal rate %.2f for project %s, task %s",
-                            rate, project_id, task_name
-                        )
-                    except (ValueError, IndexError) as e:
-                        logger.warning(
-                            "Failed to parse rate from row %s: %s",
-                            row, str(e)
-                        )
-                        
-        logger.info("Loaded %d internal rates", len(internal_rates))
-        return internal_rates
+        # Calculate previous month
+        if today.month == 1:
+            period_start = datetime.date(today.year - 1, 12, 1)
+            period_end = datetime.date(today.year, 1, 1) - datetime.timedelta(days=1)
+        else:
+            period_start = datetime.date(today.year, today.month - 1, 1)
+            period_end = datetime.date(today.year, today.month, 1) - datetime.timedelta(days=1)
+        accounting_date = datetime.date(today.year, today.month, 1).strftime("%Y-%m-%d")  # 1st of current month
+        return period_start, period_end, accounting_date
 
-    def _get_hour_rate(
+    def _build_incremental(
         self,
-        entry: Dict[str, Any],
-        project_id: str,
-        customer_info: Dict[str, Any],
-        internal_rates: Dict[tuple[str, str], float]
-    ) -> float:
-        """Get the appropriate hour rate based on customer settings.
-        
+        hours_by_project: Dict[str, List[TimeEntry]],
+        customer_data: Dict[str, Dict[str, Any]],
+        internal_rates: Dict[tuple[str, str], float],
+        missing_rates: MissingRateCollector,
+        period: str,
+        cache: InvoiceCache
+    ) -> Tuple[InvoiceBatch, Dict[str, CachedGroup]]:
+        """Rebuild the invoice groups whose inputs changed since the last run.
+
+        Groups with the same fingerprint as in the cache are taken from it,
+        with their R rows already rendered; the others are built and
+        rendered. The changed, new and removed invoices are logged.
+
         Parameters
         ----------
-        entry : Dict[str, Any]
-            Time entry data
-        project_id : str
-            Project ID
-        customer_info : Dict[str, Any]
-            Customer information
+        hours_by_project : Dict[str, List[TimeEntry]]
+            Dictionary of parsed hour entries grouped by project ID
+        customer_data : Dict[str, Dict[str, Any]]
+            Active customer data keyed by AgileDay project ID
         internal_rates : Dict[tuple[str, str], float]
-            Dictionary of internal rates by project ID and task
-            
+            Internal rates keyed by project ID and task name
+        missing_rates : MissingRateCollector
+            Missing rates of this run, including those of reused groups
+        period : str
+            Invoicing period, e.g. "2025-03"
+        cache : InvoiceCache
+            Fingerprints and invoices of the previous run
+
         Returns
         -------
-        float
-            Hour rate to use
+        Tuple[InvoiceBatch, Dict[str, CachedGroup]]
+            All invoices, and every group as it should be cached
         """
-        hour_rates_type = customer_info.get('hour_rates', '').lower().strip()
-        task_name = entry.get('projectTask', '')
-        client_name = customer_info.get('Client', 'Unknown')
-        service_name = customer_info.get('Service name', 'Unknown Service')
-        
-        if hour_rates_type == 'internal':
-            # Try to get rate from internal rates
-            rate = internal_rates.get((project_id, task_name))
-            if rate is not None:
-                return rate
-            
-            # If not found, log warning and write to missing_from_rates.txt
-            warning_msg = (
-                f"Internal rate not found - Client: {client_name}, "
-                f"Service: {service_name}, Task: {task_name}, "
-                f"Project ID: {project_id}"
-            )
-            logger.warning(warning_msg)
-            
-            # Write to missing_from_rates.txt
-            try:
-                with open('missing_from_rates.txt', 'a') as f:
-                    f.write(f"{warning_msg}\n")
-            except Exception as e:
-                logger.error(f"Failed to write to missing_from_rates.txt: {e}")
-        
-        # Use AgileDay rate from taskHourlyPrice
-        task_rate = entry.get('taskHourlyPrice', '')
-        try:
-            if task_rate and task_rate != '':
-                return float(task_rate)
+        fingerprints = fingerprint_groups(
+            hours_by_project,
+            customer_data,
+            internal_rates,
+            context=json.dumps([period, self.dimensions], sort_keys=True)
+        )
+        previous = cache.load(customer_data)
+        reused = {
+            group_key: previous[group_key]
+            for group_key, fingerprint in fingerprints.items()
+            if group_key in previous and previous[group_key].fingerprint == fingerprint.fingerprint
+        }
+
+        changed_data = {
+            project_id: customer_info
+            for project_id, customer_info in customer_data.items()
+            if invoice_group_key(customer_info) not in reused
+        }
+        built_missing_rates = MissingRateCollector()
+        built = build_invoices(
+            hours_by_project,
+            changed_data,
+            internal_rates,
+            built_missing_rates,
+            period=period,
+            workers=self.workers
+        )
+        built_invoices = {invoice.group_key: invoice for invoice in built.invoices}
+        built_misses: Dict[str, List[MissingRate]] = {}
+        for miss in built_missing_rates.misses():
+            built_misses.setdefault(invoice_group_key(customer_data[miss.project_id]), []).append(miss)
+        missing_rates.merge(built_missing_rates)
+
+        groups: Dict[str, CachedGroup] = {}
+        for group_key, fingerprint in fingerprints.items():
+            group = reused.get(group_key)
+            if group is None:
+                invoice = built_invoices.get(group_key)
+                group = CachedGroup(
+                    fingerprint=fingerprint.fingerprint,
+                    invoice=invoice,
+                    rendered_rows=self._render_rows(invoice) if invoice else [],
+                    processed_project_ids=[
+                        project_id for project_id in fingerprint.project_ids
+                        if project_id in built.processed_project_ids
+                    ],
+                    misses=built_misses.get(group_key, [])
+                )
             else:
-                warning_msg = (
-                    f"No hourly rate found - Client: {client_name}, "
-                    f"Service: {service_name}, Task: {task_name}, "
-                    f"Project ID: {project_id}"
+                for miss in group.misses:
+                    missing_rates.add(
+                        miss.kind, miss.project_id, miss.task, miss.client, miss.service,
+                        count=miss.count, in_report=miss.in_report
+                    )
+            groups[group_key] = group
+
+        reused_days = [fingerprints[group_key] for group_key in reused]
+        first_days = [fingerprint.first_day for fingerprint in reused_days if fingerprint.first_day]
+        last_days = [fingerprint.last_day for fingerprint in reused_days if fingerprint.last_day]
+        reused_batch = make_batch(
+            [group.invoice for group in reused.values() if group.invoice],
+            {project_id for group in reused.values() for project_id in group.processed_project_ids},
+            min(first_days) if first_days else None,
+            max(last_days) if last_days else None
+        )
+        batch = merge_batches([built, reused_batch], customer_data)
+
+        # Report the invoices that differ from the previous run
+        changes = []
+        for group_key in fingerprints.keys() | previous.keys():
+            if not group_key or group_key in reused:
+                continue
+            invoice = groups[group_key].invoice if group_key in groups else None
+            old_invoice = previous[group_key].invoice if group_key in previous else None
+            if invoice is None and old_invoice is None:
+                continue
+            if old_invoice is None:
+                change = "new"
+            elif invoice is None:
+                change = "removed"
+            else:
+                change = "changed"
+            amount = invoice.amount if invoice else 0.0
+            old_amount = old_invoice.amount if old_invoice else 0.0
+            changes.append(
+                f"{group_key}: {change}, amount {self._format_decimal(old_amount)} -> {self._format_decimal(amount)}"
+            )
+        logger.info(
+            "Rebuilt %d of %d invoice groups, reused %d unchanged",
+            len(fingerprints) - len(reused), len(fingerprints), len(reused)
+        )
+        if changes:
+            logger.info("Invoices changed since the last run (%d):\n%s", len(changes), "\n".join(sorted(changes)))
+        else:
+            logger.info("No invoices changed since the last run")
+        return batch, groups
+
+    def _write_invoices(
+        self,
+        writer: WorkdayFileWriter,
+        batch: InvoiceBatch,
+        today: datetime.date,
+        rendered_rows: Optional[Dict[str, List[List[str]]]] = None
+    ) -> None:
+        """Write the H and R rows of all invoices with non-zero rows.
+
+        Parameters
+        ----------
+        writer : WorkdayFileWriter
+            Open result file writer
+        batch : InvoiceBatch
+            Invoices to write
+        today : datetime.date
+            Date of the run, the invoicing date
+        rendered_rows : Optional[Dict[str, List[List[str]]]]
+            R row fields by invoice group, rendered by an earlier run;
+            rendered here when not given
+        """
+        period_start, period_end, accounting_date = self._invoice_period(today)
+
+        for invoice in batch.invoices:
+            customer_info = invoice.customer_info
+            rows = invoice.rows
+            # Only write invoice if it has non-zero rows
+            if not rows:
+                logger.info(
+                    "Skipping invoice for group %s - no non-zero amount rows",
+                    invoice.group_key
                 )
-                logger.warning(warning_msg)
-                
-                # Write to missing_from_rates.txt if it's an internal rate case
-                if hour_rates_type == 'internal':
-                    try:
-                        with open('missing_from_rates.txt', 'a') as f:
-                            f.write(f"{warning_msg}\n")
-                    except Exception as e:
-                        logger.error(f"Failed to write to missing_from_rates.txt: {e}")
-                return 0.0
-        except (ValueError, TypeError) as e:
-            warning_msg = (
-                f"Invalid hourly rate - Client: {client_name}, "
-                f"Service: {service_name}, Task: {task_name}, "
-                f"Project ID: {project_id}, Error: {e}"
+                continue
+
+            # Add header row (always use customer_info fields, not group key)
+            writer.write_header([
+                "H", invoice.connect_id, customer_info.get('Invoice Info A2 Ext Id', ''),
+                customer_info.get('Account A2 Ext ID', ''), "",
+                accounting_date,
+                today.strftime("%Y-%m-%d"),
+                customer_info.get('Our Reference', ''),
+                customer_info.get('CUSTOMER_REFERENCE', ''),
+                period_start.strftime("%Y-%m-%d"),  # Period Start: 1st of previous month
+                period_end.strftime("%Y-%m-%d"),    # Period End: last day of previous month
+                customer_info.get('Contract number', ''),
+                "", "", "", "", "", "", "",
+                self.source_system, ""
+            ])
+
+            for line in invoice.rows:
+                logger.info(
+                    "Project: %s, Task: %s, Hours: %.2f, Rate: %.2f, Amount: %.2f",
+                    line.project_name,
+                    line.task,
+                    line.hours,
+                    line.rate,
+                    line.amount
+                )
+            if rendered_rows is not None and invoice.group_key in rendered_rows:
+                row_fields = rendered_rows[invoice.group_key]
+            else:
+                row_fields = self._render_rows(invoice)
+            for fields in row_fields:
+                writer.write_row(fields)
+
+    def _render_rows(self, invoice: Invoice) -> List[List[str]]:
+        """Render the R row fields of an invoice.
+
+        Parameters
+        ----------
+        invoice : Invoice
+            Invoice with its rows
+
+        Returns
+        -------
+        List[List[str]]
+            Fields of each R row, starting with "R"
+        """
+        customer_info = invoice.customer_info
+        row_fields = []
+        for line in invoice.rows:
+            description = (
+                f"{line.project_name} - "
+                f"{customer_info.get('Billable Description', '')} - "
+                f"{line.task}"
             )
-            logger.warning(warning_msg)
+            row_fields.append([
+                "R", invoice.connect_id, line.project_name,
+                customer_info.get('Sales Item hours', ''),
+                description, self._format_decimal(line.hours), "",
+                self._format_decimal(line.rate),
+                self.dimensions['cost_center'],
+                self.dimensions['business_line'],
+                self.dimensions['area'],
+                self.dimensions['service'],
+                "", "", "", "", "", "",
+                customer_info.get('Tax_Applicability', ''),
+                customer_info.get('Tax_Code', ''),
+                ""
+            ])
+        return row_fields
+
+    def load_internal_rates(self, rates_file_path: Path) -> Dict[tuple[str, str], float]:
+        """Load internal rates from CSV file.
+        
+        Parameters
+        ----------
+        rates_file_path : Path
+            Path to rates CSV file containing project ID, task name, and rate
             
-            # Write to missing_from_rates.txt if it's an internal rate case
-            if hour_rates_type == 'internal':
-                try:
-                    with open('missing_from_rates.txt', 'a') as f:
-                        f.write(f"{warning_msg}\n")
-                except Exception as e:
-                    logger.error(f"Failed to write to missing_from_rates.txt: {e}")
-            return 0.0
+        Returns
+        -------
+        Dict[tuple[str, str], float]
+            Dictionary mapping (project_id, task_name) to hourly rate
+        """
+        internal_rates = dict(self.reference_data.rates(rates_file_path).rates)
+        if logger.isEnabledFor(logging.DEBUG):
+            for (project_id, task_name), rate in internal_rates.items():
+                logger.debug(
+                    "Loaded internal rate %.2f for project %s, task %s",
+                    rate, project_id, task_name
+                )
+        
+        logger.info("Loaded %d internal rates", len(internal_rates))
+        return internal_rates
@@ -1,11 +1,15 @@
 import argparse
 import csv
 import datetime
+import os
 import re
 import sys
 import uuid
 from collections import defaultdict
 
+from billable_invoicing.reference_data import default_store
+from billable_invoicing.workday_file import WorkdayFileWriter
+
 # Column index constants
 PROCOUNTOR_FILE_CUSTOMER_ID_COLUMN: int = 4
 CONFIG_BUSINESS_ID: int = 0
@@ -87,6 +91,15 @@ def previous_month(year, month):
         return (year, month - 1)
 
 
+def read_config_rows(config_path):
+    """
+    Read all rows of the config file.
+    Uses the billable_invoicing reference data snapshot, so the file is only
+    parsed again after it changes.
+    """
+    return default_store().customer_data(config_path).rows
+
+
 def read_config(config_path):
     """
     Read the config file (CP-1252).
@@ -94,41 +107,39 @@ def read_config(config_path):
     Returns a list (or dict) with one entry per config row.
     """
     config_data = []
-    with open(config_path, mode="r", encoding="utf-8", errors="replace") as cf:
-        reader = csv.reader(cf, delimiter=",")  # or your actual delimiter
-        for row in reader:
-            value = re.sub(r"[^0-9.-]", "", row[CONFIG_MONTHLY_FIXED_FEE])
-            if value == "":
-                value = "0.0"
-            unit_price = float(value)
-            if row[CONFIG_ACTIVE] == "Yes":
-                conf_record = {
-                    "business_id": row[CONFIG_BUSINESS_ID],
-                    "client": row[CONFIG_CLIENT],
-                    "service_name": row[CONFIG_SERVICE_NAME],
-                    "start_date": row[CONFIG_START_DATE],
-                    "end_date": row[CONFIG_END_DATE],
-                    "active": row[CONFIG_ACTIVE],
-                    "group_invoice": row[CONFIG_GROUP_INVOICE],
-                    "harvest_id": row[CONFIG_HARVEST_ID],
-                    "monthly_fixed_fee": row[CONFIG_MONTHLY_FIXED_FEE],
-                    "invoice_contact_person": row[CONFIG_INVOICING_CONTACT_PERSON],
-                    "contact_email": row[CONFIG_CONTACT_EMAIL],
-                    "tax_applicability": row[CONFIG_TAX_APPLICABILITY],
-                    "tax_code": row[CONFIG_TAX_CODE_FIXED],
-                    "fixed_fee_description": row[CONFIG_FIXED_FEE_DESCRIPTION],
-                    "billable_description": row[CONFIG_BILLABLE_DESCRIPTION],
-                    "sales_item_fixed": row[CONFIG_SALES_ITEM_FIXED],
-                    "contract_number": row[CONFIG_CONTRACT_NUMBER],
-                    "invoice_info_a2_ext_id": row[CONFIG_INVOICE_INFO_A2_EXT_ID],
-                    "account_a2_ext_id": row[CONFIG_ACCOUNT_A2_EXT_ID],
-                    "config_id": row[CONFIG_ID],
-                    "contract_number": row[CONFIG_CONTRACT_NUMBER],
-                    "customer_reference": row[CONFIG_CUSTOMER_REFERENCE],
-                    "our_reference": row[CONFIG_OUR_REFERENCE],
-                    "period": row[CONFIG_PERIOD] if len(row) > CONFIG_PERIOD else "post",  # Default to "post" if column doesn't exist
-                }
-                config_data.append(conf_record)
+    for row in read_config_rows(config_path):
+        value = re.sub(r"[^0-9.-]", "", row[CONFIG_MONTHLY_FIXED_FEE])
+        if value == "":
+            value = "0.0"
+        unit_price = float(value)
+        if row[CONFIG_ACTIVE] == "Yes":
+            conf_record = {
+                "business_id": row[CONFIG_BUSINESS_ID],
+                "client": row[CONFIG_CLIENT],
+                "service_name": row[CONFIG_SERVICE_NAME],
+                "start_date": row[CONFIG_START_DATE],
+                "end_date": row[CONFIG_END_DATE],
+                "active": row[CONFIG_ACTIVE],
+                "group_invoice": row[CONFIG_GROUP_INVOICE],
+                "harvest_id": row[CONFIG_HARVEST_ID],
+                "monthly_fixed_fee": row[CONFIG_MONTHLY_FIXED_FEE],
+                "invoice_contact_person": row[CONFIG_INVOICING_CONTACT_PERSON],
+                "contact_email": row[CONFIG_CONTACT_EMAIL],
+                "tax_applicability": row[CONFIG_TAX_APPLICABILITY],
+                "tax_code": row[CONFIG_TAX_CODE_FIXED],
+                "fixed_fee_description": row[CONFIG_FIXED_FEE_DESCRIPTION],
+                "billable_description": row[CONFIG_BILLABLE_DESCRIPTION],
+                "sales_item_fixed": row[CONFIG_SALES_ITEM_FIXED],
+                "contract_number": row[CONFIG_CONTRACT_NUMBER],
+                "invoice_info_a2_ext_id": row[CONFIG_INVOICE_INFO_A2_EXT_ID],
+                "account_a2_ext_id": row[CONFIG_ACCOUNT_A2_EXT_ID],
+                "config_id": row[CONFIG_ID],
+                "contract_number": row[CONFIG_CONTRACT_NUMBER],
+                "customer_reference": row[CONFIG_CUSTOMER_REFERENCE],
+                "our_reference": row[CONFIG_OUR_REFERENCE],
+                "period": row[CONFIG_PERIOD] if len(row) > CONFIG_PERIOD else "post",  # Default to "post" if column doesn't exist
+            }
+            config_data.append(conf_record)
     print(f"Read {len(config_data)} active config rows.")
     return config_data
 
@@ -220,55 +231,115 @@ def generate_output(
     execution_date,
 ):
     """
-    Build the result file.
+    Build the result file and its summary.
+
+    The result file is streamed with WorkdayFileWriter: the static starting
+    lines are written first with a reserved field for the total sum, the
+    invoice lines follow as they are built (see write_invoices), and the
+    total is filled in at the end. The summary file is written alongside.
+    """
+    summary_path = output_path.rsplit(".", 1)[0] + "_summary.csv"
+    try:
+        with WorkdayFileWriter(output_path, final_newline=True) as writer, open(
+            summary_path, mode="w", encoding="utf-8", newline=""
+        ) as summary_file:
+            print("Static lines are written ...")
+            # Write header
+            summary_writer = csv.writer(summary_file)
+            summary_writer.writerow([
+                "Customer Name",
+                "Service Name",
+                "ConnectID",
+                "Invoice A2 ID",
+                "Account A2 ID",
+                "Grouping info (Memo)",
+                "Sales Item",
+                "Description",
+                "Quantity",
+                "Unit price",
+                "Amount"
+            ])
+
+            total_amount, invoice_count, invoice_line_count = write_invoices(
+                writer,
+                summary_writer,
+                config_data,
+                pass_through_data,
+                invoice_year,
+                invoice_month,
+                execution_date,
+            )
+
+            # Now we have the total amount, fill it in on the second line
+            writer.commit(total_amount)
+    except BaseException:
+        if os.path.exists(summary_path):
+            os.remove(summary_path)
+        raise
+
+    print(f"Total amount of invoices {invoice_count}")
+    print(f"Total amount of lines in the invoices  {invoice_line_count}")
+    print(f"Total count of units  {invoice_line_count}")
+    print(f"Total euros without VAT {total_amount:.2f}")
+    print(f"Summary file written to {summary_path}")
+
+
+def write_summary_rows(summary_writer, grouped_config, row_fields):
+    """
+    Write the summary row(s) for an R line of the result file.
+    """
+    connect_id = row_fields[1]
+    grouping_info = row_fields[2]
+    sales_item = row_fields[3]
+    description = row_fields[4]
+    quantity = row_fields[5]
+    unit_price = row_fields[7]
+
+    # Find the corresponding config row to get customer name and service name
+    for group_id, rows in grouped_config.items():
+        for crow in rows:
+            if crow["service_name"] == grouping_info:
+                summary_writer.writerow([
+                    crow["client"],  # Customer Name
+                    crow["service_name"],  # Service Name
+                    connect_id,  # ConnectID
+                    crow["invoice_info_a2_ext_id"],  # Invoice A2 ID
+                    crow["account_a2_ext_id"],  # Account A2 ID
+                    grouping_info,  # Grouping info (Memo)
+                    sales_item,  # Sales Item
+                    description,  # Description
+                    quantity,  # Quantity
+                    unit_price,  # Unit price
+                    unit_price  # Amount (same as unit price since quantity is 1)
+                ])
+                break
+
 
-    1) Write the static starting lines (header with total sum placeholder).
-    2) For each group_invoice in config_data, create:
+def write_invoices(
+    writer,
+    summary_writer,
+    config_data,
+    pass_through_data,
+    invoice_year,
+    invoice_month,
+    execution_date,
+):
+    """
+    Write the invoice lines to the result and summary files.
+
+    For each group_invoice in config_data, create:
        - A single 'Header' (H) line
        - Potentially multiple 'Row' (R) lines: one for the fixed fee from config,
          plus any pass-through lines from pass_through_data if applicable.
-    3) Sum up all row amounts for the second line's big total (65656.95).
+    Returns the sum of all row amounts for the second line's big total, and the
+    invoice and line counts.
     """
-
-    # We'll collect all lines in a list; then we'll compute the sum, fill it in,
-    # and finally write them all out.
-    output_lines = []
-
     # We'll gather row amounts here to compute the total for the second line.
     total_amount = 0.0
     invoice_count = 0
     invoice_line_count = 0
 
-    # 1) The top lines (static text). We'll fill in the total later, so let's put a
-    # placeholder for now. E.g. "##TOTAL##"
-    line1 = "Invoice transfer into Workday;;;Company code:;263;;;Invoicing total;;;;;;;;;;;;;"
-    # The second line has "Title information/Row information;;;Reply-to-email:;laskutus@barona.fi;;;65656.95;;;;;;;;;;;;;"
-    # We'll replace "65656.95" with something after we sum up everything.
-    line2_template = (
-        "Title information/Row information;;;Reply-to-email:;laskutus@barona.fi;;;"
-        "##TOTAL##;;;;;;;;;;;;;"
-    )
-
-    # The next two lines describing columns:
-    line3 = (
-        "Row type H= Title;ConnectID;Invoice A2 ID;Account A2 ID;Free text;"
-        "Accounting date[YYYY-MM-DD];Invoicing date[YYYY-MM-DD];Our reference;"
-        "Customer reference;Period Start date [YYYY-MM-DD];Period End date [YYYY-MM-DD];"
-        "Contract number;PO number;Appendix 1;Appendix 2;Appendix 3;Appendix 4;;;Source System;"
-    )
-    line4 = (
-        "Row type R= Row;ConnectID;Grouping info (Memo);Sales Item;Description;Quantity;"
-        "Unit of measure;Unit price;Dim 1: Cost center;Dim 2: Business line (Function);"
-        "Dim 3: Area;Dim 4: Service;Dim 5: Project;Dim 7: Counter company;Dim 8: Work type;"
-        "Dim 10: Official;Dim 11: Employee;Dim 13: Company;Tax_Applicability;Tax_Code;"
-    )
-
-    output_lines.append(line1)
-    output_lines.append(line2_template)
-    output_lines.append(line3)
-    output_lines.append(line4)
-    print("Static lines are written ...")
-    # 2) Build the invoice lines for each group_invoice. We group config_data by column 17.
+    # Build the invoice lines for each group_invoice. We group config_data by column 17.
     # Let's build a dictionary: group_id -> list of config rows
 
     grouped_config = defaultdict(list)
@@ -403,9 +474,8 @@ def generate_output(
             "",  # (unused column?), if needed
         ]
 
-        # Build the CSV-like string. We'll separate by semicolon.
-        header_line = ";".join(header_fields)
-        output_lines.append(header_line)
+        # The writer separates the fields by semicolon.
+        writer.write_header(header_fields)
         invoice_count += 1
 
         # Now, for each row in the group, we add the "fixed fee" row
@@ -453,8 +523,8 @@ def generate_output(
                     crow["tax_code"],  # Tax_Code
                     "",  # Dim 13 (Company)
                 ]
-                row_line = ";".join(row_fields)
-                output_lines.append(row_line)
+                writer.write_row(row_fields)
+                write_summary_rows(summary_writer, grouped_config, row_fields)
                 invoice_line_count += 1
 
             # Always process pass-through lines, regardless of amount
@@ -493,80 +563,14 @@ def generate_output(
                         crow["tax_code"],
                         "",
                     ]
-                    row_line_pt = ";".join(row_fields_pt)
-                    output_lines.append(row_line_pt)
+                    writer.write_row(row_fields_pt)
+                    write_summary_rows(summary_writer, grouped_config, row_fields_pt)
                     invoice_line_count += 1
 
         # End for each row in that group
     # End for each group
 
-    # Now we have the total amount. We need to replace "##TOTAL##" in line2_template.
-    line2_filled = line2_template.replace("##TOTAL##", f"{total_amount:.2f}")
-    output_lines[1] = line2_filled  # place it back in the second line
-
-    # Finally, write everything to the output file
-    with open(
-        output_path, mode="w", encoding="cp1252", errors="replace", newline=""
-    ) as out:
-        for line in output_lines:
-            out.write(line + "\n")
-
-    print(f"Total amount of invoices {invoice_count}")
-    print(f"Total amount of lines in the invoices  {invoice_line_count}")
-    print(f"Total count of units  {invoice_line_count}")
-    print(f"Total euros without VAT {total_amount:.2f}")
-
-    # Generate summary file
-    summary_path = output_path.rsplit(".", 1)[0] + "_summary.csv"
-    with open(summary_path, mode="w", encoding="utf-8", newline="") as summary_file:
-        # Write header
-        summary_writer = csv.writer(summary_file)
-        summary_writer.writerow([
-            "Customer Name",
-            "Service Name",
-            "ConnectID",
-            "Invoice A2 ID",
-            "Account A2 ID",
-            "Grouping info (Memo)",
-            "Sales Item",
-            "Description",
-            "Quantity",
-            "Unit price",
-            "Amount"
-        ])
-
-        # Write data rows - only process rows that start with "R"
-        for line in output_lines:
-            if line.startswith("R;"):
-                fields = line.split(";")
-                # Extract the relevant fields from the row
-                connect_id = fields[1]
-                grouping_info = fields[2]
-                sales_item = fields[3]
-                description = fields[4]
-                quantity = fields[5]
-                unit_price = fields[7]
-
-                # Find the corresponding config row to get customer name and service name
-                for group_id, rows in grouped_config.items():
-                    for crow in rows:
-                        if crow["service_name"] == grouping_info:
-                            summary_writer.writerow([
-                                crow["client"],  # Customer Name
-                                crow["service_name"],  # Service Name
-                                connect_id,  # ConnectID
-                                crow["invoice_info_a2_ext_id"],  # Invoice A2 ID
-                                crow["account_a2_ext_id"],  # Account A2 ID
-                                grouping_info,  # Grouping info (Memo)
-                                sales_item,  # Sales Item
-                                description,  # Description
-                                quantity,  # Quantity
-                                unit_price,  # Unit price
-                                unit_price  # Amount (same as unit price since quantity is 1)
-                            ])
-                            break
-
-    print(f"Summary file written to {summary_path}")
+    return total_amount, invoice_count, invoice_line_count
 
 
 def main():